@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
+import os
 
 class Settings(BaseSettings):
     GEMINI_API_KEY: str  
@@ -7,6 +9,89 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENAI_LLM_MODEL: str
 
+    # LLM client layer
+    OPENAI_BASE_URL: Optional[str] = None
+    GEMINI_BASE_URL: Optional[str] = None
+    OPENAI_MAX_CONCURRENCY: int = 32
+    GEMINI_MAX_CONCURRENCY: int = 32
+    LLM_HTTP2: bool = True
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = 8.0
+    LLM_SINGLE_FLIGHT: bool = True  # identical concurrent prompts share one provider call
+
+    # LLM routing, hedging and circuit breaking
+    LLM_STATS_WINDOW: int = 200
+    LLM_ROUTING_MIN_SAMPLES: int = 20
+    LLM_HEDGE_REQUESTS: bool = True
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS: float = 2.0
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+
+    # USD per million tokens, used for per-request cost accounting.
+    # Defaults are gpt-4o-mini and gemini-2.0-flash list prices; match them to the configured models.
+    OPENAI_PRICE_INPUT_PER_MTOK: float = 0.15
+    OPENAI_PRICE_CACHED_INPUT_PER_MTOK: float = 0.075
+    OPENAI_PRICE_OUTPUT_PER_MTOK: float = 0.60
+    GEMINI_PRICE_INPUT_PER_MTOK: float = 0.10
+    GEMINI_PRICE_CACHED_INPUT_PER_MTOK: float = 0.025
+    GEMINI_PRICE_OUTPUT_PER_MTOK: float = 0.40
+    LLM_USAGE_HISTORY: int = 200
+
+    # Session store
+    # "memory", "disk" or "shared" (required for uvicorn --workers N: every worker maps the same session files)
+    SESSION_BACKEND: str = "memory"
+    SESSION_MAX_BYTES: int = 2 * 1024 ** 3
+    SESSION_TTL_SECONDS: float = 3600.0
+    SESSION_SPILL_DIR: Optional[str] = None
+    SESSION_SHARED_DIR: Optional[str] = None  # default: /dev/shm/query_and_chart_sessions
+    SESSION_LOCAL_ENTRIES: int = 64  # sessions each worker keeps mapped between accesses
+
+    # Upload ingestion
+    MAX_UPLOAD_BYTES: int = 1024 ** 3
+    INGEST_WORKERS: int = 4
+    INGEST_BLOCK_BYTES: int = 16 * 1024 ** 2
+    INGEST_CHUNK_ROWS: int = 200_000
+    COMPACT_DATAFRAMES: bool = True
+    COMPACT_ARROW_STRINGS: bool = False
+    PARSE_PROCESSES: int = min(4, os.cpu_count() or 1)
+    PDF_PARALLEL_MIN_PAGES: int = 32
+    EXCEL_ENGINE: str = "auto"  # "auto" (calamine when installed), "calamine" or "openpyxl"
+
+    # Text documents: chunking and lexical retrieval
+    TEXT_CHUNK_CHARS: int = 1200
+    TEXT_CHUNK_OVERLAP_CHARS: int = 200
+    TEXT_TOP_K_CHUNKS: int = 8
+
+    # Chart caches
+    CHART_PLAN_CACHE_SIZE: int = 1024
+    CHART_DATA_CACHE_SIZE: int = 256
+    CHART_DATA_CACHE_MAX_BYTES: int = 256 * 1024 ** 2  # 0: bounded by entries only
+    CHART_CACHE_TTL_SECONDS: float = 3600.0
+
+    # Chart computation
+    CHART_WORKERS: int = min(4, os.cpu_count() or 1)
+    CHART_PARALLEL_MIN_ROWS: int = 100_000
+    COMPUTE_WORKERS: int = 4  # Threads running request-path pandas work (charts, cleaning, joins, query plans)
+
+    # Per-session aggregate index (codes, counts and sums for low-cardinality columns)
+    AGGREGATE_INDEX: bool = True
+    AGGREGATE_MIN_ROWS: int = 100_000
+    AGGREGATE_MAX_CARDINALITY: int = 1000
+    AGGREGATE_MAX_BYTES: int = 256 * 1024 ** 2
+
+    # Upload-time profiling
+    PROFILE_ON_UPLOAD: bool = True
+    PROFILE_WORKERS: int = 2
+    PROFILE_JOB_HISTORY: int = 1024
+
+    # Observability
+    LOG_LEVEL: str = "INFO"  # DEBUG also logs full LLM answers and chart plans
+    SERVER_TIMING: bool = False  # Server-Timing header on every response, not only when asked with X-Server-Timing: 1
+    PROFILER_MAX_SECONDS: float = 300.0
+
     class Config:
         env_file = Path(__file__).resolve().parents[2] / ".env"  
         env_file_encoding = "utf-8"
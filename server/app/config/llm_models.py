@@ -3,4 +3,19 @@ from enum import Enum
 
 class ModelName(str, Enum):
     chatgpt = "chatgpt"
-    gemini = "gemini"
\ No newline at end of file
+    gemini = "gemini"
+    # Routed per request to whichever provider is currently healthiest and fastest
+    auto = "auto"
+
+
+# Models backed by an actual provider, in routing tie-break order
+PROVIDER_MODELS = (ModelName.chatgpt, ModelName.gemini)
+
+
+# Upper bound on the dataset context pasted into a prompt, in tokens.
+# An auto prompt is built before routing, so it must fit every provider.
+CONTEXT_TOKEN_BUDGETS = {
+    ModelName.chatgpt: 6000,
+    ModelName.gemini: 12000,
+    ModelName.auto: 6000,
+}
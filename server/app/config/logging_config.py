@@ -0,0 +1,24 @@
+from app.config.environment_config import settings
+from logging.handlers import QueueHandler, QueueListener
+import logging
+import queue
+
+
+def configure_logging() -> QueueListener:
+    """
+    Route the app's loggers through a queue: request handlers only enqueue
+    records and a background thread writes them to stderr, so a slow
+    terminal or log collector never blocks the event loop. Returns the
+    listener, to be stopped on shutdown so queued records are flushed.
+    """
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = QueueListener(records, handler, respect_handler_level=True)
+
+    logger = logging.getLogger("app")
+    logger.handlers = [QueueHandler(records)]
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.propagate = False
+    listener.start()
+    return listener
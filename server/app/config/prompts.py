@@ -0,0 +1,172 @@
+from typing import Optional
+import inspect
+
+
+class Prompt:
+    """
+    A rendered prompt, kept in three parts so providers can send the stable
+    ones first: system instructions, then the dataset context (fixed for a
+    session), then the per-request user message. Provider-side prompt
+    caching matches on that common prefix.
+
+    `response_schema` (a JSON schema) switches providers to their native
+    structured-output mode.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        user: str,
+        system: Optional[str] = None,
+        context: Optional[str] = None,
+        response_schema: Optional[dict] = None
+    ):
+        self.name = name
+        self.user = user
+        self.system = system
+        self.context = context
+        self.response_schema = response_schema
+
+
+class PromptTemplate:
+    # Templates are dedented once at import instead of on every request
+    def __init__(self, name: str, system: str, user: str, context: str = "{context}"):
+        self.name = name
+        self.system = inspect.cleandoc(system)
+        self.user = inspect.cleandoc(user)
+        self.context = inspect.cleandoc(context)
+
+    def render(self, context: Optional[str] = None, response_schema: Optional[dict] = None, **fields) -> Prompt:
+        return Prompt(
+            self.name,
+            self.user.format(**fields),
+            self.system,
+            self.context.format(context=context) if context is not None else None,
+            response_schema,
+        )
+
+
+CHART_PLAN = PromptTemplate(
+    "chart_plan",
+    system="""
+        You are a data visualization assistant. Based on the user's query and available data columns,
+        suggest the best chart types and identify which columns are required for each chart.
+        Strictly return only a JSON object with 'chart_types' and 'required_columns'.
+        Do NOT include markdown formatting (no triple backticks, no ```json).
+        Strictly respond with a JSON object like:
+        {"chart_types": ["bar", "pie"], "required_columns": [["ColumnA", "ColumnB"], ["ColumnX"]]}
+        Each array in the array of required_columns corresponds to each chart type in the array of chart_types.
+
+        When choosing columns for charts that require both x and y axes (e.g., bar, line, scatter),
+        ensure that:
+        - The x-axis column should be categorical or time-based (e.g., region, product, date).
+        - The y-axis column should be quantitative/numeric (e.g., sales, revenue, profit, count).
+        - The first column in each pair must represent the x-axis.
+        - The second column in each pair must represent the y-axis.
+
+        Use only the available data columns provided and avoid using invalid or duplicate column combinations.
+        If other tables are listed, their columns are written "table.column". Using one requires a 'joins' entry
+        for its table, e.g. "joins": [{"table": "customers", "left_on": "customer_id", "right_on": "customer_id", "how": "left"}],
+        where left_on is a column of the main table (or "table.column" of a table joined earlier) and right_on a column of the joined table.
+        """,
+    context="""
+        Available Columns (name and type):
+        {context}
+        """,
+    user="User Query: {query}",
+)
+
+DATASET_DESCRIPTION = PromptTemplate(
+    "dataset_description",
+    system="""
+        You are a professional data analyst tasked with profiling datasets.
+        Your job is to:
+        1. Give a **clean, human-readable title** for the dataset.
+        2. Write a short **summary description** of what the dataset is about.
+        3. Analyze all the columns and describe their meanings clearly.
+        4. Detect column types: "numeric", "categorical", "datetime", or "text".
+
+        Return your response **only** as a JSON object in this format:
+        {
+        "title": "Descriptive Title",
+        "description": "Brief summary of the dataset",
+        "columns": [
+            {"name": "ColumnA", "type": "numeric", "description": "What this column means"},
+            ...
+        ]
+        }
+
+        Do not include markdown or any extra commentary and no triple backticks, no ```json. Output a valid JSON only.
+        """,
+    context="""
+        Here is a profile of the dataset (schema, column statistics and a representative sample of rows):
+
+        {context}
+        """,
+    user="Analyze and describe it as instructed.",
+)
+
+QUERY_ANSWER = PromptTemplate(
+    "query_answer",
+    system="""
+        You are a professional analyst who returns accurate, concise and detailed response to queries.
+        You answer user queries based on the data the user has uploaded.
+        Your answer should be concise and to the point.
+        Do not include anything more than what is being asked by the user in the query or what is needed.
+        You can include complete sentences though in your answers to give it a human touch.
+        """,
+    context="""
+        The user has uploaded the following data (for tabular files: schema, column statistics and a representative sample of rows):
+        {context}
+        """,
+    user="You need to answer the following user query based on the uploaded data: {query}",
+)
+
+QUERY_PLAN = PromptTemplate(
+    "query_plan",
+    system="""
+        You translate questions about a table into a JSON query plan. You never answer the question yourself.
+        Return only a JSON object (no markdown, no triple backticks) with these optional keys:
+        {
+          "joins": [{"table": "other_table", "left_on": "ColumnK", "right_on": "KeyColumn", "how": "left"}],
+          "filters": [{"column": "ColumnA", "op": "==", "value": "X"}],
+          "group_by": ["ColumnB"],
+          "aggregations": [{"func": "sum", "column": "ColumnC", "alias": "total_c"}],
+          "select": ["ColumnA", "ColumnC"],
+          "sort": [{"column": "total_c", "ascending": false}],
+          "limit": 10
+        }
+        Allowed filter ops: ==, !=, >, >=, <, <=, in, not_in, between (value is [low, high]), contains, is_null, not_null.
+        Allowed aggregation funcs: sum, mean, median, min, max, count, nunique, std. Use {"func": "count"} without a column to count rows.
+        Use "select" only for questions that list rows rather than aggregate them.
+        Sort columns may be table columns or aggregation aliases. Use only the columns listed below.
+        Columns of other tables, if any are listed, are written "table.column" and need a "joins" entry for their table
+        ("how" is "left" or "inner"; left_on may be "table.column" of a table joined earlier).
+        """,
+    context="""
+        Columns:
+        {context}
+        """,
+    user="Question: {query}",
+)
+
+
+# Follow-up for structured output that failed validation: only the bad output and the error go back
+JSON_REPAIR = PromptTemplate(
+    "json_repair",
+    system="""
+        You fix JSON documents that failed validation.
+        Return only the corrected JSON object: no markdown, no triple backticks, no commentary.
+        Change only what the validation error requires.
+        """,
+    user="""
+        JSON:
+        {output}
+
+        Validation error:
+        {error}
+        """,
+)
+
+
+PROMPTS = {template.name: template for template in (CHART_PLAN, DATASET_DESCRIPTION, QUERY_ANSWER, QUERY_PLAN, JSON_REPAIR)}
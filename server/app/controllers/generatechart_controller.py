@@ -1,135 +1,138 @@
-from app.controllers.uploadfile_controller import user_sessions
-from app.services.llm_service import query_gemini, query_gpt
-from app.services.chart_service import create_chart_data
+from app.services.session_store import session_store
+from app.services.llm_service import query_structured
+from app.services.chart_service import create_chart_data, compute_drilldown, run_compute
+from app.services.preprocessing_service import prepare_columns
+from app.services.aggregate_service import session_aggregates
+from app.services.join_service import table_columns, describe_tables, join_tables, join_signature
+from app.services.profiling_service import ensure_profile, ensure_description
+from app.services.cache_service import chart_plan_cache, schema_hash, normalize_query
+from app.services.metrics_service import span
 from app.config.llm_models import ModelName
+from app.config.prompts import CHART_PLAN
+from app.schemas.chart_plan import ScatterMode, ChartPlan
+from app.schemas.join import Join
+from pydantic import ValidationError
 from json import JSONDecodeError
-import json
+import logging
 
 
-def sanitize_llm_json(raw_response: str) -> dict:
-    cleaned = raw_response.strip()
-    if cleaned.startswith("```"):
-        cleaned = "\n".join(cleaned.splitlines()[1:-1])
-    cleaned = cleaned.replace("```json", "").replace("```", "").strip()
-    return json.loads(cleaned)
-
-
-def preprocess_dataframe():
-    # It is going to include a complete cleaning analogy of everything that is required to be done in the EDA step of cleaning
-    pass
+logger = logging.getLogger(__name__)
 
 
 async def get_dataset_description(session_id: str, model: ModelName):
-    if not session_id in user_sessions:
+    session_data = session_store.get(session_id)
+    if session_data is None:
         return {"error": "Invalid or expired session"}
     
     try:
-        session_data = user_sessions[session_id]
-        raw_text = session_data["raw_text"]
 
-        if raw_text is None:
+        if session_data["dataframe"] is None and session_data["raw_text"] is None:
             return {"error": "No DataFrame available for this session"}
-        
-        system_prompt = """
-        You are a professional data analyst tasked with profiling datasets. 
-        Your job is to:
-        1. Give a **clean, human-readable title** for the dataset.
-        2. Write a short **summary description** of what the dataset is about.
-        3. Analyze all the columns and describe their meanings clearly.
-        4. Detect column types: "numeric", "categorical", "datetime", or "text".
-
-        Return your response **only** as a JSON object in this format:
-        {
-        "title": "Descriptive Title",
-        "description": "Brief summary of the dataset",
-        "columns": [
-            {"name": "ColumnA", "type": "numeric", "description": "What this column means"},
-            ...
-        ]
-        }
-
-        Do not include markdown or any extra commentary and no triple backticks, no ```json. Output a valid JSON only.
-        """
-
-        user_prompt = f"""
-        Here is the dataset:
-
-        {raw_text}
-
-        Analyze and describe it as instructed.
-        """
-
-        full_prompt = system_prompt + "\n\n" + user_prompt
-
-        if model == ModelName.chatgpt:
-            response = query_gpt(full_prompt)
-        elif model == ModelName.gemini:
-            response = query_gemini(full_prompt)
-
-        print(f"Complete Description of the dataset: {response}")
-        result = sanitize_llm_json(response)
-        print(f"JSON Response description of the dataset: {result}")
-
-        return result
+
+        # Served from the upload-time profile, or joins the description job already in flight
+        return await ensure_description(session_id, session_data, model)
     except JSONDecodeError as e:
         return {"error": f"LLM returned invalid JSON: {str(e)}"}
+    except ValidationError as e:
+        return {"error": f"LLM returned an invalid dataset description: {str(e)}"}
     except Exception as e:
         return {"error": str(e)}
 
 
-async def generate_chart(query: str, session_id: str, model: ModelName):
-    if not session_id in user_sessions:
+async def request_chart_plan(
+    query: str, column_names: list, model: ModelName, column_types: dict = None, tables: dict = None, tables_context: str = ""
+) -> dict:
+    # tables: {name: columns} of the session's other tables, which the plan may join; tables_context describes them
+    column_types = column_types or {}
+    columns = "\n".join(f"- {name} ({column_types.get(str(name), 'unknown')})" for name in column_names) + tables_context
+    names = [str(name) for name in column_names]
+    with span("prompt_build"):
+        prompt = CHART_PLAN.render(context=columns, query=query, response_schema=ChartPlan.response_schema(names, tables))
+
+    # Chart types, columns and joins are checked here, so the chart service only sees plans it can draw
+    plan = await query_structured(prompt, model, ChartPlan, {"columns": names, "tables": tables})
+    result = plan.model_dump(mode="json")
+    logger.debug("Chart plan: %s", result)
+    return result
+
+
+async def generate_chart(query: str, session_id: str, model: ModelName, max_points: int, scatter_mode: ScatterMode):
+    session_data = session_store.get(session_id)
+    if session_data is None:
         return {"error": "Invalid or expired session"}
 
     try:
-        session_data = user_sessions[session_id]
         df = session_data["dataframe"]
 
         if df is None:
             return {"error": "No DataFrame available for this session"}
         
         column_names = df.columns.to_list()
-
-        system_prompt = """
-        You are a data visualization assistant. Based on the user's query and available data columns,
-        suggest the best chart types and identify which columns are required for each chart.
-        Strictly return only a JSON object with 'chart_types' and 'required_columns'.
-        Do NOT include markdown formatting (no triple backticks, no ```json).
-        Strictly respond with a JSON object like: 
-        {"chart_types": ["bar", "pie"], "required_columns": [["ColumnA", "ColumnB"], ["ColumnX"]]}
-        Each array in the array of required_columns corresponds to each chart type in the array of chart_types.
-
-        When choosing columns for charts that require both x and y axes (e.g., bar, line, scatter),
-        ensure that:
-        - The x-axis column should be categorical or time-based (e.g., region, product, date).
-        - The y-axis column should be quantitative/numeric (e.g., sales, revenue, profit, count).
-        - The first column in each pair must represent the x-axis.
-        - The second column in each pair must represent the y-axis.
-
-        Use only the available data columns provided and avoid using invalid or duplicate column combinations.
-        """
-
-        user_prompt = f"""
-            User Query: {query}\n
-            Available Columns: {column_names}\n\n
-            
-        """
-        full_prompt = system_prompt + "\n\n" + user_prompt
-
-        if model == ModelName.chatgpt:
-            response = query_gpt(full_prompt)
-        elif model == ModelName.gemini:
-            response = query_gemini(full_prompt)
-
-        print(f"Response from llm service: {response}")
-        result = sanitize_llm_json(response)
-        print(f"JSON Response for chart generation: {result}")
-        # Logic to pass in the df and the columns required to a preprocess_dataframe for cleaning the dataframe for these particular columns
+        profile = await ensure_profile(session_id, session_data)
+        column_types = {column["name"]: column["type"] for column in profile["columns"]}
+
+        tables = table_columns(session_data)
+
+        # Same question over the same columns (and joinable tables) with the same model gets the same plan
+        plan_key = (
+            model.value, schema_hash(df), tuple(column_types.values()),
+            tuple((name, tuple(columns)) for name, columns in tables.items()), normalize_query(query)
+        )
+        result = chart_plan_cache.get(plan_key)
+        if result is None:
+            result = await request_chart_plan(query, column_names, model, column_types, tables, describe_tables(session_data))
+        names = [col for cols in result["required_columns"] for col in cols]
+        joins = [Join(**join) for join in result.get("joins", [])]
+        # Only the columns the plan uses are cleaned, and each only once per session
+        with span("preprocess"):
+            frame, preprocessing = await run_compute(prepare_columns, session_data, names)
+        stale = not all(column["cached"] for column in preprocessing["columns"].values())
+        if joins:
+            # Joined columns are gathered here from the session's tables; none of their data went to the LLM
+            with span("join"):
+                frame, preprocessing["join"] = await run_compute(join_tables, session_data, joins, names, frame, clean=True)
+            stale = stale or not preprocessing["join"]["cached"]
+        if stale:
+            session_store.set(session_id, session_data)
 
         # Passing this cleaned dataframe to the service chart_service and get the charts
-        chart_data = create_chart_data(session_id, result["chart_types"], result["required_columns"])
+        # The aggregate index covers the active table's rows only, which a join changes
+        chart_data = await run_compute(
+            create_chart_data,
+            session_id, result["chart_types"], result["required_columns"], max_points, scatter_mode, frame,
+            aggregates=None if joins else session_aggregates(session_data),
+            join_key=join_signature(session_data, joins) if joins else None
+        )
+        if "error" not in chart_data:
+            chart_plan_cache.set(plan_key, result)
+            chart_data["preprocessing"] = preprocessing
         return chart_data
     except JSONDecodeError as e:
         return {"error": f"LLM returned invalid JSON: {str(e)}"}
+    except ValidationError as e:
+        return {"error": f"LLM returned an invalid chart plan: {str(e)}"}
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+async def get_drilldown(session_id: str, column: str, measure: str = None, filters: dict = None):
+    session_data = session_store.get(session_id)
+    if session_data is None:
+        return {"error": "Invalid or expired session"}
+
+    try:
+        df = session_data["dataframe"]
+        if df is None:
+            return {"error": "No DataFrame available for this session"}
+        filters = filters or {}
+        columns = [column, *([measure] if measure else []), *filters]
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            return {"error": f"Columns {missing} not found in DataFrame. Available: {list(df.columns)}"}
+        frame, preprocessing = await run_compute(prepare_columns, session_data, columns)
+        if not all(entry["cached"] for entry in preprocessing["columns"].values()):
+            session_store.set(session_id, session_data)
+        with span("chart_compute", chart_type="drilldown"):
+            return await run_compute(compute_drilldown, frame, column, measure, filters, session_aggregates(session_data))
+    except Exception as e:
+        return {"error": str(e)}
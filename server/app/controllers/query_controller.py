@@ -1,10 +1,36 @@
-from app.controllers.uploadfile_controller import user_sessions
-from app.services.query_service import handle_user_query
+from app.services.session_store import session_store
+from app.services.query_service import handle_user_query, handle_plan_query, stream_user_query
 from app.config.llm_models import ModelName
+from app.schemas.query_plan import QueryMode
+from fastapi.responses import StreamingResponse
+import json
 
 
-async def query_handler(query: str, session_id: str, model: ModelName):
-    if not session_id in user_sessions:
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+async def query_event_stream(query: str, session_id: str, model: ModelName):
+    try:
+        async for token in stream_user_query(query, session_id, model):
+            yield sse_event({"token": token})
+        yield sse_event({}, event="done")
+    except Exception as e:
+        yield sse_event({"error": str(e)}, event="error")
+
+
+async def query_handler(query: str, session_id: str, model: ModelName, stream: bool = False, mode: QueryMode = QueryMode.answer):
+    if not session_id in session_store:
         return {"error": "Invalid or expired session"}
+    elif mode == QueryMode.plan:
+        return await handle_plan_query(query, session_id, model)
+    elif stream:
+        # Starlette cancels the generator when the client disconnects
+        return StreamingResponse(
+            query_event_stream(query, session_id, model),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
     else:
-        return handle_user_query(query, session_id, model)
\ No newline at end of file
+        return await handle_user_query(query, session_id, model)
@@ -1,63 +1,186 @@
 import uuid
+import asyncio
+import logging
+import weakref
 from fastapi import UploadFile
-import pandas as pd
-import io
-from PyPDF2 import PdfReader
-import re
+from typing import Optional
+from app.config.environment_config import settings
+from app.config.llm_models import ModelName
+from app.services.session_store import session_store
+from app.services.ingest_service import ingest_upload, ingest_executor, table_name
+from app.services.append_service import append_rows, append_text
+from app.services.profiling_service import start_profiling, profiling_status
 
 
-# In memory store
-user_sessions = {}
+logger = logging.getLogger(__name__)
 
 
-def parse_file(file: UploadFile):
-    filename = file.filename.lower()
-    print(f"✅File {file.file} received for parsing: {file.filename}")
+def add_tables(session_data: dict, tables: dict, compaction: dict) -> dict:
+    """
+    The session with `tables` added next to its others, replacing tables of
+    the same name. Only replacing the active table resets what was derived
+    from it; the other tables' join keys are versioned on their own.
+    """
+    versions = {**(session_data.get("table_versions") or {}), **{name: uuid.uuid4().hex for name in tables}}
+    updated = {**session_data, "tables": {**session_data["tables"], **tables}, "table_versions": versions}
+    active_table = session_data["active_table"]
+    if active_table in tables:
+        updated.update({
+            "dataframe": tables[active_table],
+            "compaction": compaction,
+            "fingerprint": None,
+            "cleaning_plans": {},
+            "aggregates": None,
+            "profile": None,
+            "descriptions": {},
+            "data_version": uuid.uuid4().hex,
+        })
+    return updated
 
-    if filename.endswith(".csv"):
-        try:
-            content = file.file.read().decode("utf-8")
-            df = pd.read_csv(io.StringIO(content))
-            return df, df.to_string(index=False)
-        except Exception as e:
-            print(f"Error parsing CSV: {e}")
-            raise ValueError(f"Could not parse CSV file: {e}")
-        
-    elif filename.endswith(".pdf"):
-        try:
-            reader = PdfReader(file.file)
-            text = "\n".join([page.extract_text() for page in reader.pages])
-            return text
-        except Exception as e:
-            print(f"Error parsing PDF: {e}")
-            raise ValueError(f"Could not parse PDF file: {e}")
-        
-    elif filename.endswith(".xlsx"):
-        try:
-            df = pd.read_excel(file.file)
-            return df, df.to_string(index=False)
-        except Exception as e:
-            print(f"Error parsing Excel file: {e}")
-            raise ValueError(f"Could not parse Excel file: {e}")
-        
-    else:
-        raise ValueError("Unsupported file type")
 
-
-async def handle_file_upload(file: UploadFile, session_id: str = None):
+async def handle_file_upload(
+    file: UploadFile,
+    session_id: str = None,
+    describe_model: Optional[ModelName] = None,
+    sheet: Optional[str] = None,
+    all_sheets: bool = False,
+    preview_rows: Optional[int] = None,
+    table: Optional[str] = None
+):
+    if table is not None:
+        if not table.strip():
+            return {"error": "Table names must not be empty"}
+        # Same naming rule as tables named after files and sheets
+        table = table_name(table)
     try:
-        df, parsed_content = parse_file(file)
-        session_data = {
-            "raw_text": parsed_content,
-            "dataframe": df
-        }
-        if session_id and session_id in user_sessions:
-            user_sessions[session_id] = session_data
+        tables, parsed_content, ingest_stats, compaction = await ingest_upload(
+            file, sheet=sheet, all_sheets=all_sheets, preview_rows=preview_rows
+        )
+        existing = session_store.get(session_id) if session_id and table else None
+        if table:
+            # A named upload never replaces a session's data, it only adds or replaces that table
+            if not tables:
+                return {"error": "Only tabular files can be added as tables"}
+            if existing is not None and not existing.get("tables"):
+                return {"error": "This session holds a text document; tables can only be added to table sessions"}
+            # A single table takes the name; several sheets are prefixed with it
+            tables = {table: next(iter(tables.values()))} if len(tables) == 1 else {f"{table}_{name}": df for name, df in tables.items()}
+
+        if existing is not None:
+            # A named upload into a table session adds to it instead of replacing it
+            session_data = add_tables(existing, tables, compaction)
+            active_table = session_data["active_table"]
+            df = session_data["dataframe"]
+            session_store[session_id] = session_data
+            reset = active_table in tables
         else:
-            session_id = str(uuid.uuid4())
-            user_sessions[session_id] = session_data
-        print(f"The generated session id: {session_id}") 
-        print(f"The columns of the DataFrame: {df.columns.to_list()}")
-        return {"session_id": session_id, "message": "File Uploaded Sucessfully"}
+            # Every sheet is a named table; the first one is active for queries and charts
+            active_table = next(iter(tables)) if tables else None
+            df = tables[active_table] if tables else None
+            session_data = {
+                "raw_text": parsed_content,
+                "dataframe": df,
+                "tables": tables,
+                "active_table": active_table,
+                "table_versions": {name: uuid.uuid4().hex for name in tables or ()},
+                "compaction": compaction,
+                # Background jobs only write their results back to the data they were started for
+                "data_version": uuid.uuid4().hex
+            }
+            if session_id and session_id in session_store:
+                session_store[session_id] = session_data
+            else:
+                session_id = str(uuid.uuid4())
+                session_store[session_id] = session_data
+            reset = True
+        logger.info("Stored upload %s in session %s", file.filename, session_id)
+        if df is not None and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Columns of session %s: %s", session_id, df.columns.to_list())
+        response = {"session_id": session_id, "message": "File Uploaded Sucessfully", "ingest": ingest_stats}
+        if tables:
+            response["tables"] = list(session_data["tables"])
+            response["active_table"] = active_table
+        if settings.PROFILE_ON_UPLOAD and reset:
+            response["profiling"] = start_profiling(session_id, session_data, describe_model)
+        return response
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+# One append at a time per session, otherwise concurrent appends would drop each other's rows
+_append_locks = weakref.WeakValueDictionary()
+
+
+def _append_lock(session_id: str) -> asyncio.Lock:
+    lock = _append_locks.get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _append_locks[session_id] = lock
+    return lock
+
+
+async def handle_file_append(file: UploadFile, session_id: str, new_rows_only: bool = False, sheet: Optional[str] = None):
+    async with _append_lock(session_id):
+        session_data = session_store.get(session_id)
+        if session_data is None:
+            return {"error": "Invalid or expired session"}
+        try:
+            df = session_data["dataframe"]
+            # new_rows_only: the file is the whole (grown) export again, only rows past the session's are read
+            skip_rows = len(df) if new_rows_only and df is not None else 0
+            new_tables, parsed_content, ingest_stats, _ = await ingest_upload(file, compact=False, skip_rows=skip_rows, sheet=sheet)
+            new_rows = next(iter(new_tables.values())) if new_tables else None
+
+            if df is None:
+                if parsed_content is None:
+                    return {"error": "Cannot append a table to a text session"}
+                loop = asyncio.get_running_loop()
+                updated, append_stats = await loop.run_in_executor(ingest_executor, append_text, session_data, parsed_content)
+            else:
+                if new_rows is None:
+                    return {"error": "Cannot append a text document to a table session"}
+                loop = asyncio.get_running_loop()
+                updated, append_stats = await loop.run_in_executor(ingest_executor, append_rows, session_data, new_rows)
+
+            # The previous profile keeps serving prompts until the refreshed one replaces it
+            session_store.set(session_id, updated)
+            logger.info("Appended to session %s: %s", session_id, append_stats)
+            response = {"session_id": session_id, "message": "File Appended Sucessfully", "ingest": ingest_stats, "append": append_stats}
+            if settings.PROFILE_ON_UPLOAD:
+                response["profiling"] = start_profiling(session_id, updated)
+            return response
+        except Exception as e:
+            return {"error": str(e)}
+
+
+def select_table(session_id: str, table: str):
+    session_data = session_store.get(session_id)
+    if session_data is None:
+        return {"error": "Invalid or expired session"}
+    tables = session_data.get("tables") or {}
+    if table not in tables:
+        return {"error": f"Table {table!r} not found. Available: {list(tables)}"}
+    # Profile, descriptions and fingerprint all describe the active table
+    updated = {
+        **session_data,
+        "dataframe": tables[table],
+        "active_table": table,
+        "fingerprint": None,
+        "cleaning_plans": {},
+        "aggregates": None,
+        "profile": None,
+        "descriptions": {},
+        "data_version": uuid.uuid4().hex,
+    }
+    session_store.set(session_id, updated)
+    response = {"session_id": session_id, "active_table": table, "tables": list(tables)}
+    if settings.PROFILE_ON_UPLOAD:
+        response["profiling"] = start_profiling(session_id, updated)
+    return response
+
+
+def get_profiling_status(session_id: str):
+    session_data = session_store.get(session_id)
+    if session_data is None:
+        return {"error": "Invalid or expired session"}
+    return profiling_status(session_id, session_data)
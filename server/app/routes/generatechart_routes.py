@@ -1,20 +1,37 @@
-from fastapi import APIRouter, Query
-from app.controllers.generatechart_controller import generate_chart, get_dataset_description
+from fastapi import APIRouter, Query, Header
+from app.controllers.generatechart_controller import generate_chart, get_dataset_description, get_drilldown
 from app.config.llm_models import ModelName
+from app.schemas.chart_plan import ScatterMode
+from app.schemas.drilldown import DrilldownRequest
+from app.services.cache_service import cache_metrics
+from app.utils.responses import ORJSONNumpyResponse, chart_response
 
 
 router = APIRouter()
 
 
-@router.post("/dataset-description")
+@router.post("/dataset-description", response_class=ORJSONNumpyResponse)
 async def getDatasetDescription(session_id: str, model: ModelName):
-    return await get_dataset_description(session_id, model)
+    return ORJSONNumpyResponse(await get_dataset_description(session_id, model))
 
 
-@router.post("/generate-chart")
+@router.post("/generate-chart", response_class=ORJSONNumpyResponse)
 async def getChart(
     query: str, 
     session_id: str, 
-    model: ModelName = Query(..., description="Choose a model: chatgpt or gemini")
+    model: ModelName = Query(..., description="Choose a model: chatgpt, gemini, or auto to route to the healthiest provider"),
+    max_points: int = Query(2000, ge=0, description="Upper bound on points per line/scatter chart; 0 disables downsampling"),
+    scatter_mode: ScatterMode = Query(ScatterMode.sample, description="How scatter charts are reduced: random sample or grid bins"),
+    accept: str = Header(None, description="Send application/vnd.apache.arrow.stream to receive chart series as Arrow IPC")
     ):
-    return await generate_chart(query, session_id, model)
\ No newline at end of file
+    return chart_response(await generate_chart(query, session_id, model, max_points, scatter_mode), accept)
+
+
+@router.post("/drilldown", response_class=ORJSONNumpyResponse)
+async def drilldown(request: DrilldownRequest):
+    return ORJSONNumpyResponse(await get_drilldown(request.session_id, request.column, request.measure, request.filters))
+
+
+@router.get("/cache-metrics")
+async def chartCacheMetrics():
+    return cache_metrics()
\ No newline at end of file
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from app.services.metrics_service import render_metrics
+from app.services.profiler_service import sampling_profiler
+from app.services.session_store import session_store
+from app.services.cache_service import cache_metrics
+from app.services.llm_service import llm_single_flight
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    gauges = {"qc_session_store": session_store.metrics()}
+    gauges.update({f"qc_{name}": values for name, values in cache_metrics().items()})
+    gauges["qc_llm_single_flight"] = {**llm_single_flight.counters, "in_flight": llm_single_flight.in_flight()}
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
+
+@router.post("/api/profiler/start")
+async def startProfiler(
+    seconds: float = Query(30.0, gt=0, description="Stop sampling after this long (capped by PROFILER_MAX_SECONDS)"),
+    interval_ms: float = Query(10.0, ge=1, description="Time between two stack samples")):
+    return sampling_profiler.start(seconds, interval_ms)
+
+
+@router.post("/api/profiler/stop")
+async def stopProfiler():
+    return sampling_profiler.stop()
+
+
+@router.get("/api/profiler/status")
+async def profilerStatus():
+    return sampling_profiler.status()
+
+
+@router.get("/api/profiler/stacks", response_class=PlainTextResponse)
+async def profilerStacks(limit: int = Query(None, ge=1, description="Only the most frequent stacks")):
+    # Collapsed stacks; feed to flamegraph.pl or open in speedscope
+    return PlainTextResponse(sampling_profiler.collapsed(limit))
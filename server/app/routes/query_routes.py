@@ -1,15 +1,28 @@
 from fastapi import APIRouter, Query
+from fastapi.responses import Response
 from app.controllers.query_controller import query_handler
 from typing import List
 from app.config.llm_models import ModelName
+from app.schemas.query_plan import QueryMode
+from app.utils.responses import ORJSONNumpyResponse
+from app.services.llm_service import llm_metrics
 
 
 router = APIRouter()
 
 
-@router.post("/query-file")
+@router.post("/query-file", response_class=ORJSONNumpyResponse)
 async def queryFile(
     query: str, 
     session_id: str, 
-    model: ModelName = Query(..., description="Choose a model: chatgpt or gemini")):
-    return await query_handler(query, session_id, model)
\ No newline at end of file
+    model: ModelName = Query(..., description="Choose a model: chatgpt, gemini, or auto to route to the healthiest provider"),
+    stream: bool = Query(False, description="Stream tokens back as Server-Sent Events"),
+    mode: QueryMode = Query(QueryMode.answer, description="answer: LLM answers from the data; plan: LLM writes a query plan that is executed on the server")):
+    result = await query_handler(query, session_id, model, stream, mode)
+    # Streaming answers come back as a ready-made response
+    return result if isinstance(result, Response) else ORJSONNumpyResponse(result)
+
+
+@router.get("/llm-metrics")
+async def llmMetrics():
+    return llm_metrics()
\ No newline at end of file
@@ -1,10 +1,52 @@
-from fastapi import APIRouter, UploadFile, File
-from app.controllers.uploadfile_controller import handle_file_upload
+from fastapi import APIRouter, UploadFile, File, Query
+from typing import Optional
+from app.controllers.uploadfile_controller import handle_file_upload, handle_file_append, select_table, get_profiling_status
+from app.config.llm_models import ModelName
+from app.services.session_store import session_store
 
 
 router = APIRouter()
 
 
 @router.post("/upload-file")
-async def uploadFile(file: UploadFile):
-    return await handle_file_upload(file)
\ No newline at end of file
+async def uploadFile(
+    file: UploadFile,
+    session_id: Optional[str] = Query(None, description="Replace the data of this session instead of starting a new one"),
+    describe_model: Optional[ModelName] = Query(None, description="Also request the LLM dataset description in the background with this model"),
+    sheet: Optional[str] = Query(None, description="Excel: sheet to read (default: the first one)"),
+    all_sheets: bool = Query(False, description="Excel: read every sheet, each as a named table"),
+    preview_rows: Optional[int] = Query(None, ge=1, description="Excel: read only the first rows of each sheet"),
+    table: Optional[str] = Query(None, description="Name of the uploaded table; with session_id it is added to that session's tables, which plans can join")):
+    return await handle_file_upload(
+        file,
+        session_id=session_id,
+        describe_model=describe_model,
+        sheet=sheet,
+        all_sheets=all_sheets,
+        preview_rows=preview_rows,
+        table=table
+    )
+
+
+@router.post("/append-file")
+async def appendFile(
+    file: UploadFile,
+    session_id: str,
+    new_rows_only: bool = Query(False, description="The file is the full export again; skip the rows the session already has"),
+    sheet: Optional[str] = Query(None, description="Excel: sheet holding the new rows (default: the first one)")):
+    return await handle_file_append(file, session_id, new_rows_only, sheet)
+
+
+@router.post("/select-table")
+async def selectTable(session_id: str, table: str):
+    return select_table(session_id, table)
+
+
+@router.get("/profile-status")
+async def profileStatus(session_id: str):
+    return get_profiling_status(session_id)
+
+
+@router.get("/session-metrics")
+async def sessionMetrics():
+    return session_store.metrics()
@@ -0,0 +1,94 @@
+from pydantic import BaseModel, Field, ValidationInfo, field_validator, model_validator
+from typing import Dict, List, Optional
+from enum import Enum
+from app.schemas.join import Join, check_joins, joins_response_schema
+
+
+class ScatterMode(str, Enum):
+    sample = "sample"
+    bin = "bin"
+
+
+class ChartType(str, Enum):
+    bar = "bar"
+    pie = "pie"
+    line = "line"
+    scatter = "scatter"
+
+
+# How many columns each chart type takes: (min, max)
+CHART_ARITY = {
+    ChartType.bar: (1, 2),
+    ChartType.pie: (1, 1),
+    ChartType.line: (2, 2),
+    ChartType.scatter: (2, 2),
+}
+
+
+def validate_columns(names: List[str], info: ValidationInfo) -> List[str]:
+    # The dataset's columns are passed as validation context: model_validate(data, context={"columns": [...]})
+    # With the session's other tables in the context too ({"tables": {name: [...]}}), joins are checked instead
+    context = info.context or {}
+    columns = context.get("columns")
+    if columns is not None and not context.get("tables"):
+        unknown = sorted({name for name in names if name not in columns})
+        if unknown:
+            raise ValueError(f"unknown columns {unknown}; valid columns are {list(columns)}")
+    return names
+
+
+class ChartPlan(BaseModel):
+    chart_types: List[ChartType] = Field(min_length=1)
+    required_columns: List[List[str]]
+    joins: List[Join] = []
+
+    @field_validator("required_columns")
+    @classmethod
+    def columns_exist(cls, value: List[List[str]], info: ValidationInfo) -> List[List[str]]:
+        validate_columns([name for cols in value for name in cols], info)
+        return value
+
+    @model_validator(mode="after")
+    def joins_resolve(self, info: ValidationInfo):
+        context = info.context or {}
+        if context.get("tables"):
+            names = [name for cols in self.required_columns for name in cols]
+            problems = check_joins(self.joins, names, context.get("columns") or [], context["tables"])
+            if problems:
+                raise ValueError("; ".join(problems))
+        return self
+
+    @model_validator(mode="after")
+    def columns_match_chart_types(self):
+        if len(self.chart_types) != len(self.required_columns):
+            raise ValueError("chart_types and required_columns must have the same length")
+        for position, (chart_type, cols) in enumerate(zip(self.chart_types, self.required_columns)):
+            low, high = CHART_ARITY[chart_type]
+            if not low <= len(cols) <= high:
+                expected = str(low) if low == high else f"{low} or {high}"
+                raise ValueError(f"chart {position} ({chart_type.value}) needs {expected} columns, got {cols}")
+        return self
+
+    @classmethod
+    def response_schema(cls, columns: Optional[List[str]] = None, tables: Optional[Dict[str, List[str]]] = None) -> dict:
+        """
+        JSON schema for the providers' structured-output modes, with column
+        names pinned to the dataset. With other tables, their columns are
+        offered as "table.column" and plans gain a "joins" list.
+        """
+        if columns and tables:
+            columns = list(columns) + [f"{table}.{name}" for table, names in tables.items() for name in names]
+        column = {"type": "string", "enum": list(columns)} if columns else {"type": "string"}
+        schema = {
+            "type": "object",
+            "properties": {
+                "chart_types": {"type": "array", "items": {"type": "string", "enum": [t.value for t in ChartType]}},
+                "required_columns": {"type": "array", "items": {"type": "array", "items": column}},
+            },
+            "required": ["chart_types", "required_columns"],
+            "additionalProperties": False,
+        }
+        if tables:
+            schema["properties"]["joins"] = joins_response_schema(list(tables))
+            schema["required"].append("joins")
+        return schema
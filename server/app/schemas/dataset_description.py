@@ -0,0 +1,50 @@
+from pydantic import BaseModel, ValidationInfo, field_validator
+from typing import List, Literal, Optional
+from app.schemas.chart_plan import validate_columns
+
+
+ColumnKind = Literal["numeric", "categorical", "datetime", "text"]
+
+
+class ColumnDescription(BaseModel):
+    name: str
+    type: ColumnKind
+    description: str
+
+
+class DatasetDescription(BaseModel):
+    title: str
+    description: str
+    columns: List[ColumnDescription]
+
+    @field_validator("columns")
+    @classmethod
+    def columns_exist(cls, value: List[ColumnDescription], info: ValidationInfo) -> List[ColumnDescription]:
+        validate_columns([column.name for column in value], info)
+        return value
+
+    @classmethod
+    def response_schema(cls, columns: Optional[List[str]] = None) -> dict:
+        name = {"type": "string", "enum": list(columns)} if columns else {"type": "string"}
+        return {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string"},
+                "description": {"type": "string"},
+                "columns": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": name,
+                            "type": {"type": "string", "enum": ["numeric", "categorical", "datetime", "text"]},
+                            "description": {"type": "string"},
+                        },
+                        "required": ["name", "type", "description"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["title", "description", "columns"],
+            "additionalProperties": False,
+        }
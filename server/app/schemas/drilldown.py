@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+
+class DrilldownRequest(BaseModel):
+    session_id: str
+    column: str
+    measure: Optional[str] = None  # None counts rows
+    filters: Dict[str, List[Any]] = Field(default_factory=dict)  # column -> labels to keep
@@ -0,0 +1,63 @@
+from pydantic import BaseModel
+from typing import Dict, List, Literal
+
+
+JoinHow = Literal["left", "inner"]
+
+
+class Join(BaseModel):
+    # left_on is a column of the active table, or "table.column" of a table joined before this one
+    table: str
+    left_on: str
+    right_on: str
+    how: JoinHow = "left"
+
+
+def check_joins(joins: List[Join], names: List[str], columns: List[str], tables: Dict[str, List[str]]) -> List[str]:
+    """
+    Problems with a plan's joins and its "table.column" references, checked
+    against the active table's `columns` and `tables` ({name: columns} of the
+    session's other tables). An empty list means the joins can be executed.
+    """
+    problems, joined = [], {}
+
+    def known(name: str) -> bool:
+        if name in columns:
+            return True
+        table, _, column = name.partition(".")
+        return table in joined and column in joined[table]
+
+    for join in joins:
+        if join.table not in tables:
+            problems.append(f"unknown table {join.table!r}; tables are {list(tables)}")
+            continue
+        if join.table in joined:
+            problems.append(f"table {join.table!r} is joined twice")
+        if not known(join.left_on):
+            problems.append(f"join key {join.left_on!r} is not a column of the active table or of a table joined before {join.table!r}")
+        if join.right_on not in tables[join.table]:
+            problems.append(f"table {join.table!r} has no column {join.right_on!r}")
+        joined[join.table] = tables[join.table]
+    for name in names:
+        if not known(name):
+            table = name.partition(".")[0]
+            hint = f"; add a join with table {table!r}" if table in tables and table not in joined else ""
+            problems.append(f"unknown column {name!r}{hint}")
+    return problems
+
+
+def joins_response_schema(tables: List[str]) -> dict:
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "table": {"type": "string", "enum": list(tables)},
+                "left_on": {"type": "string"},
+                "right_on": {"type": "string"},
+                "how": {"type": "string", "enum": ["left", "inner"]},
+            },
+            "required": ["table", "left_on", "right_on", "how"],
+            "additionalProperties": False,
+        },
+    }
@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field
+from typing import Any, List, Literal, Optional
+from enum import Enum
+from app.schemas.join import Join
+
+
+class QueryMode(str, Enum):
+    answer = "answer"
+    plan = "plan"
+
+
+FilterOp = Literal["==", "!=", ">", ">=", "<", "<=", "in", "not_in", "between", "contains", "is_null", "not_null"]
+AggFunc = Literal["sum", "mean", "median", "min", "max", "count", "nunique", "std"]
+
+
+class Filter(BaseModel):
+    column: str
+    op: FilterOp
+    value: Any = None
+
+
+class Aggregation(BaseModel):
+    func: AggFunc
+    column: Optional[str] = None  # None with func "count" counts rows
+    alias: Optional[str] = None
+
+    @property
+    def output_name(self) -> str:
+        return self.alias or (f"{self.func}_{self.column}" if self.column else "count")
+
+
+class Sort(BaseModel):
+    column: str
+    ascending: bool = False
+
+
+class QueryPlan(BaseModel):
+    joins: List[Join] = []
+    filters: List[Filter] = []
+    group_by: List[str] = []
+    aggregations: List[Aggregation] = []
+    select: List[str] = []
+    sort: List[Sort] = []
+    limit: Optional[int] = Field(default=None, ge=1, le=1000)
@@ -0,0 +1,218 @@
+from app.config.environment_config import settings
+from app.services.chart_service import ChartFrame, is_numeric
+from app.services.preprocessing_service import infer_plan, apply_plan
+from typing import Optional
+import pandas as pd
+import numpy as np
+import time
+
+
+CARDINALITY_SAMPLE_SIZE = 10_000
+
+
+class AggregateIndex:
+    """
+    Factorized codes, uniques and counts of a session's low-cardinality
+    columns plus the sum of every numeric column per code, built from the
+    columns as cleaned for charting. Bar and pie charts over these columns
+    become lookups and filtered drilldowns bincounts over the codes.
+
+    Tied to one data_version; any change to the session data makes it stale.
+    Appends extend it into an index for the new version (extend_aggregate_index).
+    """
+
+    def __init__(self, data_version: str, plans: dict, dims: dict, sums: dict, stats: dict):
+        self.data_version = data_version
+        self.plans = plans  # column -> cleaning plan the index was built with
+        self.dims = dims  # column -> (codes, uniques, counts)
+        self.sums = sums  # (dimension, measure) -> sums per code
+        self.stats = stats
+
+    def __sizeof__(self) -> int:
+        # Lets the session store account for the arrays held here
+        return self.stats["bytes"]
+
+    def restrict(self, plans: dict) -> "AggregateIndex":
+        """View limited to columns whose cleaning plan matches the session's, so lookups equal recomputation."""
+        keep = {name for name, plan in self.plans.items() if plans.get(name) == plan}
+        return AggregateIndex(
+            self.data_version,
+            {name: plan for name, plan in self.plans.items() if name in keep},
+            {name: dim for name, dim in self.dims.items() if name in keep},
+            {pair: sums for pair, sums in self.sums.items() if pair[0] in keep and pair[1] in keep},
+            self.stats,
+        )
+
+
+def _low_cardinality(series: pd.Series, max_cardinality: int) -> bool:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return len(series.cat.categories) <= max_cardinality
+    # A sample rules out most high-cardinality columns before the full hash pass
+    if series.iloc[:CARDINALITY_SAMPLE_SIZE].nunique() > max_cardinality:
+        return False
+    return series.nunique() <= max_cardinality
+
+
+def _smallest_codes(codes: np.ndarray, cardinality: int) -> np.ndarray:
+    for dtype in (np.int8, np.int16, np.int32):
+        if cardinality < np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes
+
+
+def build_aggregate_index(
+    df: pd.DataFrame,
+    data_version: str,
+    max_cardinality: int = None,
+    max_bytes: int = None
+) -> AggregateIndex:
+    """
+    Index every column with at most max_cardinality distinct values (after
+    cleaning) as a dimension, with sums of every numeric column per
+    dimension value. Dimensions that would take the index past max_bytes
+    are left out; charts over them are computed as before.
+    """
+    start = time.perf_counter()
+    max_cardinality = max_cardinality or settings.AGGREGATE_MAX_CARDINALITY
+    max_bytes = max_bytes or settings.AGGREGATE_MAX_BYTES
+
+    plans, cleaned = {}, {}
+    for name in df.columns:
+        plans[name] = infer_plan(df[name])
+        cleaned[name] = apply_plan(df[name], plans[name])
+    frame = ChartFrame(pd.DataFrame(cleaned, index=df.index, copy=False))
+    measures = [name for name, series in cleaned.items() if is_numeric(series)]
+
+    dims, sums, skipped, used = {}, {}, [], 0
+    for name, series in cleaned.items():
+        if not _low_cardinality(series, max_cardinality):
+            continue
+        codes, uniques, counts = frame.factorize(name)
+        codes = _smallest_codes(codes, len(uniques))
+        cost = codes.nbytes + counts.nbytes + len(uniques) * 8 * (len(measures) + 1)
+        if used + cost > max_bytes:
+            skipped.append(str(name))
+            continue
+        dims[name] = (codes, uniques, counts)
+        used += cost
+        for measure in measures:
+            sums[(name, measure)] = frame.sums_by_code(name, measure)
+
+    stats = {
+        "dimensions": [str(name) for name in dims],
+        "measures": [str(name) for name in measures],
+        "skipped_for_memory": skipped,
+        "bytes": int(used),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return AggregateIndex(data_version, {name: plans[name] for name in cleaned}, dims, sums, stats)
+
+
+def _extend_dim(dim: tuple, delta: pd.Series) -> tuple:
+    # Delta rows are coded against the existing uniques; values not seen before are appended,
+    # in the order a factorization of the whole column would have met them
+    codes, uniques, counts = dim
+    if isinstance(delta.dtype, pd.CategoricalDtype):
+        delta_codes, delta_uniques = delta.cat.codes.to_numpy(), pd.Index(delta.cat.categories)
+    else:
+        delta_codes, delta_uniques = pd.factorize(delta)
+        delta_uniques = pd.Index(delta_uniques)
+    uniques = pd.Index(uniques)
+    positions = uniques.get_indexer(delta_uniques)
+    unseen = positions < 0
+    positions[unseen] = len(uniques) + np.arange(int(unseen.sum()))
+    uniques = uniques.append(delta_uniques[unseen])
+    delta_codes = np.where(delta_codes >= 0, positions[delta_codes], -1)
+    counts = np.bincount(delta_codes[delta_codes >= 0], minlength=len(uniques))
+    counts[:len(dim[2])] += dim[2]
+    codes = _smallest_codes(np.concatenate([codes.astype(np.int64), delta_codes]), len(uniques))
+    return codes, uniques, counts, delta_codes
+
+
+def _code_sums(codes: np.ndarray, values: pd.Series, length: int) -> np.ndarray:
+    values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = (codes >= 0) & ~np.isnan(values)
+    return np.bincount(codes[valid], weights=values[valid], minlength=length)
+
+
+def extend_aggregate_index(
+    index: AggregateIndex,
+    df: pd.DataFrame,
+    start: int,
+    changed: list,
+    data_version: str,
+    max_cardinality: int = None,
+    max_bytes: int = None
+) -> AggregateIndex:
+    """
+    The index of `df` after rows from position `start` were appended, built
+    from the index of the old rows. Codes, counts and sums are additive, so
+    unchanged columns only clean and code the new rows with the plans the
+    index was built with. Columns in `changed` (their dtype was promoted)
+    are re-cleaned and re-coded in full.
+    """
+    begin = time.perf_counter()
+    max_cardinality = max_cardinality or settings.AGGREGATE_MAX_CARDINALITY
+    max_bytes = max_bytes or settings.AGGREGATE_MAX_BYTES
+    changed = {name for name in df.columns if str(name) in changed or name not in index.plans}
+
+    plans, delta, full = {}, {}, {}
+    for name in df.columns:
+        if name in changed:
+            plans[name] = infer_plan(df[name])
+            full[name] = apply_plan(df[name], plans[name])
+        else:
+            plans[name] = index.plans[name]
+            delta[name] = apply_plan(df[name].iloc[start:], plans[name])
+    measures = [name for name in df.columns if is_numeric(full[name] if name in full else delta[name])]
+
+    def whole(name) -> pd.Series:
+        # Full cleaned column, only needed where a changed column meets an unchanged one
+        if name not in full:
+            full[name] = apply_plan(df[name], plans[name])
+        return full[name]
+
+    dims, sums, skipped, used = {}, {}, [], 0
+    for name in df.columns:
+        if name in changed:
+            if not _low_cardinality(full[name], max_cardinality):
+                continue
+            codes, uniques, counts = ChartFrame(pd.DataFrame({name: full[name]})).factorize(name)
+            codes, delta_codes = _smallest_codes(codes, len(uniques)), None
+        elif name in index.dims:
+            codes, uniques, counts, delta_codes = _extend_dim(index.dims[name], delta[name])
+            if len(uniques) > max_cardinality:
+                continue
+        else:
+            continue
+        cost = codes.nbytes + counts.nbytes + len(uniques) * 8 * (len(measures) + 1)
+        if used + cost > max_bytes:
+            skipped.append(str(name))
+            continue
+        dims[name] = (codes, uniques, counts)
+        used += cost
+        for measure in measures:
+            if delta_codes is not None and measure not in changed and (name, measure) in index.sums:
+                added = _code_sums(delta_codes, delta[measure], len(uniques))
+                added[:len(index.sums[(name, measure)])] += index.sums[(name, measure)]
+                sums[(name, measure)] = added
+            else:
+                sums[(name, measure)] = _code_sums(codes.astype(np.intp), whole(measure), len(uniques))
+
+    stats = {
+        "dimensions": [str(name) for name in dims],
+        "measures": [str(name) for name in measures],
+        "skipped_for_memory": skipped,
+        "bytes": int(used),
+        "seconds": round(time.perf_counter() - begin, 3),
+        "rebuilt_columns": [str(name) for name in changed],
+    }
+    return AggregateIndex(data_version, plans, dims, sums, stats)
+
+
+def session_aggregates(session_data: dict) -> Optional[AggregateIndex]:
+    """The session's aggregate index if it was built for the current data, restricted to columns cleaned the same way."""
+    index = session_data.get("aggregates")
+    if index is None or index.data_version != session_data.get("data_version"):
+        return None
+    return index.restrict(session_data.get("cleaning_plans", {}))
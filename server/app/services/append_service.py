@@ -0,0 +1,93 @@
+from app.services.compaction_service import append_frame
+from app.services.cache_service import extend_fingerprint
+from app.services.chart_service import carry_forward_charts
+from app.services.aggregate_service import extend_aggregate_index
+from app.services.profiling_service import extend_text_profile
+from app.services.text_search_service import PAGE_BREAK
+from typing import Optional
+import pandas as pd
+import uuid
+
+
+def append_rows(session_data: dict, new_rows: pd.DataFrame) -> tuple:
+    """
+    Session data with new_rows appended to its DataFrame. Work is proportional
+    to the new rows except for one copy of the existing columns: the old rows
+    are not reparsed or recompacted, the fingerprint is chained rather than
+    rehashed, and cached count/sum charts and the aggregate index are
+    updated from the new rows.
+
+    Returns the new session data (a new dict, so in-flight requests and jobs
+    keep the frame they started with) and append statistics.
+    """
+    df = session_data["dataframe"]
+    combined, changed = append_frame(df, new_rows)
+
+    # Cleaning plans survive the append unless the column's dtype changed
+    plans = {name: plan for name, plan in session_data.get("cleaning_plans", {}).items() if str(name) not in changed}
+    # Cached charts were drawn from cleaned columns; raw new rows only merge into them where cleaning is a no-op
+    skip_columns = {name for name in combined.columns if plans.get(name) != ()}
+
+    fingerprint: Optional[str] = session_data.get("fingerprint")
+    new_fingerprint = None
+    carried = 0
+    if fingerprint is not None:
+        new_fingerprint = extend_fingerprint(fingerprint, combined.iloc[len(df):], combined)
+        carried = carry_forward_charts(fingerprint, new_fingerprint, combined, len(df), skip_columns)
+
+    data_version = uuid.uuid4().hex
+    # An index of the old rows is extended by the new ones; without one it is built in the background
+    aggregates = session_data.get("aggregates")
+    if aggregates is not None and aggregates.data_version == session_data.get("data_version"):
+        aggregates = extend_aggregate_index(aggregates, combined, len(df), changed, data_version)
+    else:
+        aggregates = None
+
+    updated = {
+        **session_data,
+        "dataframe": combined,
+        "fingerprint": new_fingerprint,
+        "cleaning_plans": plans,
+        "aggregates": aggregates,
+        # Descriptions are not refreshed in the background; the next request asks for one of the new data
+        "descriptions": {},
+        "data_version": data_version,
+    }
+    if session_data.get("tables"):
+        updated["tables"] = {**session_data["tables"], session_data["active_table"]: combined}
+        updated["table_versions"] = {**(session_data.get("table_versions") or {}), session_data["active_table"]: updated["data_version"]}
+    stats = {
+        "rows_appended": len(new_rows),
+        "rows_total": len(combined),
+        "promoted_columns": changed,
+        "charts_carried_forward": carried,
+        "aggregate_index_extended": aggregates is not None,
+    }
+    return updated, stats
+
+
+def append_text(session_data: dict, text: str) -> tuple:
+    """
+    Session data with text appended as new pages. A ready profile is
+    extended with the new pages' chunks instead of re-indexing the document.
+    """
+    raw_text = session_data.get("raw_text") or ""
+    data_version = uuid.uuid4().hex
+    profile = session_data.get("profile")
+    updated = {
+        **session_data,
+        # An appended document starts on a new page
+        "raw_text": f"{raw_text}{PAGE_BREAK}{text}" if raw_text else text,
+        "descriptions": {},
+        "data_version": data_version,
+    }
+    # Only a profile of the text as it was can be extended; otherwise the background job re-indexes it
+    extended = profile is not None and raw_text and profile.get("data_version") == session_data.get("data_version")
+    if extended:
+        first_page = raw_text.count(PAGE_BREAK) + 2
+        updated["profile"] = extend_text_profile(profile, updated["raw_text"], text, first_page, data_version)
+    return updated, {
+        "characters_appended": len(text),
+        "characters_total": len(updated["raw_text"]),
+        "text_index_extended": bool(extended),
+    }
@@ -0,0 +1,137 @@
+from app.config.environment_config import settings
+from app.services.session_store import estimate_bytes
+from collections import OrderedDict
+import pandas as pd
+import threading
+import hashlib
+import time
+import re
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an entry bound, optional byte bound and TTL,
+    and hit/miss counters. With max_bytes set, values are sized with
+    estimate_bytes when stored and a value larger than max_bytes is not
+    cached at all.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float = 0, max_bytes: int = 0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, stored_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rejections": 0}
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[2]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 and time.monotonic() - entry[1] > self.ttl_seconds:
+                self._remove(key)
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        size = estimate_bytes(value) if self.max_bytes > 0 else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes > 0 and size > self.max_bytes:
+                self._counters["rejections"] += 1
+                return
+            self._entries[key] = (value, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes > 0 and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def items(self) -> list:
+        """Snapshot of the live (key, value) pairs; does not count as lookups or refresh recency."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                (key, value) for key, (value, stored_at, _) in self._entries.items()
+                if self.ttl_seconds <= 0 or now - stored_at <= self.ttl_seconds
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else None,
+                **self._counters,
+            }
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().strip("?.!").lower()
+
+
+def schema_hash(df: pd.DataFrame) -> str:
+    schema = "|".join(f"{name}:{dtype}" for name, dtype in df.dtypes.items())
+    return hashlib.blake2b(schema.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def dataset_fingerprint(session_data: dict) -> str:
+    """
+    Content hash of the session DataFrame, computed once and kept on the
+    session. Anything that replaces or mutates the frame must drop
+    session_data["fingerprint"].
+    """
+    fingerprint = session_data.get("fingerprint")
+    if fingerprint is None:
+        df = session_data["dataframe"]
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16)
+        digest.update(schema_hash(df).encode("utf-8"))
+        fingerprint = digest.hexdigest()
+        session_data["fingerprint"] = fingerprint
+    return fingerprint
+
+
+def extend_fingerprint(fingerprint: str, appended: pd.DataFrame, df: pd.DataFrame) -> str:
+    """
+    Fingerprint after rows were appended: chains the previous fingerprint with
+    a hash of the new rows only, so appending costs O(new rows). Not equal to
+    dataset_fingerprint() of the same data uploaded in one go, which only
+    costs a cache miss.
+    """
+    row_hashes = pd.util.hash_pandas_object(appended, index=False).to_numpy()
+    digest = hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=16)
+    digest.update(row_hashes.tobytes())
+    digest.update(schema_hash(df).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Level 1: (model, column schema, normalized query) -> parsed chart plan
+chart_plan_cache = LRUCache("chart_plan", settings.CHART_PLAN_CACHE_SIZE, settings.CHART_CACHE_TTL_SECONDS)
+
+# Level 2: (dataset fingerprint, chart spec) -> computed chart payload
+chart_data_cache = LRUCache(
+    "chart_data", settings.CHART_DATA_CACHE_SIZE, settings.CHART_CACHE_TTL_SECONDS, settings.CHART_DATA_CACHE_MAX_BYTES
+)
+
+
+def cache_metrics() -> dict:
+    return {cache.name: cache.metrics() for cache in (chart_plan_cache, chart_data_cache)}
@@ -1,98 +1,414 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
-from app.controllers.uploadfile_controller import user_sessions
+import contextvars
+import asyncio
+import hashlib
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from app.config.environment_config import settings
+from app.services.session_store import session_store
+from app.services.cache_service import chart_data_cache, dataset_fingerprint
+from app.services.metrics_service import span, observe_span
+from app.services.downsampling_service import as_float_axis, lttb_indices, sample_indices, grid_bin
+from app.schemas.chart_plan import ScatterMode
 
 
-def create_chart_data(session_id: str, chart_types: List[str], required_columns: List[List[str]]) -> Dict[str, Any]:
-    if session_id not in user_sessions:
+COLORS = ["#36A2EB", "#FF6384", "#FFCE56", "#4BC0C0", "#9966FF", "#FF9F40"]
+DEFAULT_MAX_POINTS = 2000
+
+# Factorize, bincount, argsort and LTTB spend most of their time in NumPy/pandas
+# kernels that release the GIL, so independent charts overlap on threads
+chart_executor = ThreadPoolExecutor(max_workers=settings.CHART_WORKERS, thread_name_prefix="chart")
+# Request handlers hand their pandas work to this pool so the event loop keeps serving other requests.
+# It is separate from chart_executor, which these jobs fan out to themselves
+compute_executor = ThreadPoolExecutor(max_workers=settings.COMPUTE_WORKERS, thread_name_prefix="compute")
+
+
+async def run_compute(func: Callable, *args, **kwargs):
+    # The copied context keeps spans opened inside func on the request's Server-Timing
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(compute_executor, partial(context.run, func, *args, **kwargs))
+
+
+def is_numeric(series: pd.Series) -> bool:
+    # np.issubdtype rejects extension dtypes (category, Arrow) that compacted frames use
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+class ChartFrame:
+    """
+    Per-request view of a DataFrame that factorizes each key column once and
+    derives counts and group sums from the shared codes, so charts over the
+    same columns do not rescan and rehash them. With a session's aggregate
+    index, codes, counts and sums it holds are looked up instead.
+    """
+
+    def __init__(self, df: pd.DataFrame, aggregates=None):
+        self.df = df
+        self.aggregates = aggregates
+        self._factorized = {}  # column -> (codes, uniques, counts)
+
+    def factorize(self, col: str):
+        factorized = self._factorized.get(col)
+        if factorized is None and self.aggregates is not None:
+            factorized = self.aggregates.dims.get(col)
+        if factorized is None:
+            series = self.df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Compacted frames already carry the codes
+                codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                # Unsorted: only the observed groups of a bar chart need key order
+                codes, uniques = pd.factorize(series)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            factorized = (codes, uniques, counts)
+            self._factorized[col] = factorized
+        return factorized
+
+    def nunique(self, col: str) -> int:
+        return int(np.count_nonzero(self.factorize(col)[2]))
+
+    def value_counts(self, col: str):
+        _, uniques, counts = self.factorize(col)
+        observed = np.flatnonzero(counts)
+        order = observed[np.argsort(-counts[observed], kind="stable")]
+        return _labels(uniques, order), counts[order]
+
+    def sums_by_code(self, key: str, value: str, mask: np.ndarray = None) -> np.ndarray:
+        """Sum of value per code of key, over the rows in mask (all rows if None)."""
+        codes, uniques, _ = self.factorize(key)
+        if mask is None and self.aggregates is not None:
+            sums = self.aggregates.sums.get((key, value))
+            if sums is not None:
+                return sums
+        values = self.df[value].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = (codes >= 0) & ~np.isnan(values)
+        if mask is not None:
+            valid &= mask
+        return np.bincount(codes[valid], weights=values[valid], minlength=len(uniques))
+
+    def key_order(self, key: str, observed: np.ndarray) -> np.ndarray:
+        # Categorical codes already follow category order, other keys are sorted by value
+        if isinstance(self.df[key].dtype, pd.CategoricalDtype):
+            return observed
+        return observed[pd.Index(self.factorize(key)[1][observed]).argsort()]
+
+    def matches(self, col: str, values: list) -> np.ndarray:
+        # Rows whose label (as shown on charts) is one of values, compared on codes
+        codes, uniques, _ = self.factorize(col)
+        wanted = np.flatnonzero(np.isin(_labels(uniques, np.arange(len(uniques))), [str(value) for value in values]))
+        return np.isin(codes, wanted)
+
+    def group_sum(self, key: str, value: str):
+        # Same result as df.groupby(key, observed=True)[value].sum(), from the shared codes
+        _, uniques, counts = self.factorize(key)
+        observed = self.key_order(key, np.flatnonzero(counts))
+        sums = self.sums_by_code(key, value)[observed]
+        if pd.api.types.is_integer_dtype(self.df[value]):
+            sums = sums.astype(np.int64)
+        return _labels(uniques, observed), sums
+
+
+def _labels(uniques, positions: np.ndarray) -> np.ndarray:
+    return pd.Index(uniques[positions]).astype(str).to_numpy()
+
+
+def compute_chart(
+    df: pd.DataFrame,
+    chart_type: str,
+    cols: List[str],
+    max_points: int = DEFAULT_MAX_POINTS,
+    scatter_mode: ScatterMode = ScatterMode.sample,
+    frame: ChartFrame = None
+) -> Dict[str, Any]:
+    if not cols:
+        return {"error": f"No columns given for {chart_type} chart"}
+    if not all(col in df.columns for col in cols):
+        return {"error": f"Columns {cols} not found in DataFrame. Available: {list(df.columns)}"}
+    frame = frame or ChartFrame(df)
+
+    chart_data = {
+        "chart_type": chart_type,
+        "data": {},
+        "metadata": {
+            "x_label": cols[0],
+            "y_label": cols[1] if len(cols) > 1 else "Count",
+            "colors": COLORS[:frame.nunique(cols[0])]
+        }
+    }
+
+    if chart_type == "bar":
+        if len(cols) == 2:
+            if not is_numeric(df[cols[1]]):
+                return {"error": f"Column {cols[1]} must be numeric for bar chart"}
+            labels, values = frame.group_sum(cols[0], cols[1])
+        else:
+            labels, values = frame.value_counts(cols[0])
+        chart_data["data"] = {"labels": labels, "values": values}
+        chart_data["metadata"]["title"] = f"{chart_data['metadata']['y_label']} by {chart_data['metadata']['x_label']}"
+
+    elif chart_type == "pie":
+        if len(cols) != 1:
+            return {"error": "Pie chart requires exactly one categorical column"}
+        labels, values = frame.value_counts(cols[0])
+        chart_data["data"] = {"labels": labels, "values": values}
+        chart_data["metadata"]["title"] = f"Distribution of {chart_data['metadata']['x_label']}"
+
+    elif chart_type == "line":
+        if len(cols) != 2:
+            return {"error": "Line chart requires two columns (x: datetime/numeric, y: numeric)"}
+        if not (pd.api.types.is_datetime64_any_dtype(df[cols[0]]) or is_numeric(df[cols[0]])):
+            return {"error": f"Column {cols[0]} must be datetime or numeric for line chart"}
+        if not is_numeric(df[cols[1]]):
+            return {"error": f"Column {cols[1]} must be numeric for line chart"}
+        data = df[cols].dropna()
+        x_axis = as_float_axis(data[cols[0]])
+        order = np.argsort(x_axis, kind="stable")
+        y_values = data[cols[1]].to_numpy()[order]
+        if max_points and len(order) > max_points:
+            keep = lttb_indices(x_axis[order], y_values.astype(np.float64), max_points)
+            chart_data["metadata"]["downsampling"] = "lttb"
+        else:
+            keep = np.arange(len(order))
+        # Only the points that survive downsampling are converted to label strings
+        chart_data["data"] = {
+            "labels": data[cols[0]].iloc[order[keep]].astype(str).to_numpy(),
+            "values": y_values[keep]
+        }
+        chart_data["metadata"]["total_points"] = len(order)
+        chart_data["metadata"]["title"] = f"{chart_data['metadata']['y_label']} over {chart_data['metadata']['x_label']}"
+
+    elif chart_type == "scatter":
+        if len(cols) != 2:
+            return {"error": "Scatter chart requires two numeric columns"}
+        if not all(is_numeric(df[col]) for col in cols):
+            return {"error": f"Columns {cols} must be numeric for scatter chart"}
+        data = df[cols].dropna()
+        x_values = data[cols[0]].to_numpy()
+        y_values = data[cols[1]].to_numpy()
+        # Columnar arrays instead of one {"x", "y"} dict per row
+        if max_points and len(data) > max_points and scatter_mode == ScatterMode.bin:
+            binned = grid_bin(x_values.astype(np.float64), y_values.astype(np.float64), max_points)
+            chart_data["data"] = binned
+            chart_data["metadata"]["downsampling"] = "grid_bin"
+        else:
+            keep = sample_indices(len(data), max_points) if max_points else np.arange(len(data))
+            chart_data["data"] = {
+                "x": x_values[keep],
+                "y": y_values[keep]
+            }
+            if len(keep) < len(data):
+                chart_data["metadata"]["downsampling"] = "sample"
+        chart_data["metadata"]["total_points"] = len(data)
+        chart_data["metadata"]["title"] = f"{chart_data['metadata']['y_label']} vs {chart_data['metadata']['x_label']}"
+
+    else:
+        return {"error": f"Unsupported chart type: {chart_type}"}
+
+    return chart_data
+
+
+def compute_charts(
+    df: pd.DataFrame,
+    specs: List[tuple],
+    max_points: int = DEFAULT_MAX_POINTS,
+    scatter_mode: ScatterMode = ScatterMode.sample,
+    parallel: bool = True,
+    aggregates=None
+) -> List[Dict[str, Any]]:
+    """
+    Compute a whole chart plan of (chart_type, cols) specs in one pass:
+    duplicate specs are computed once, every key column is factorized once
+    and shared by all charts that group or colour by it, and on large frames
+    the factorizations and the charts themselves run on chart_executor.
+    aggregates: the session's aggregate index, if one is ready for this data.
+    """
+    frame = ChartFrame(df, aggregates)
+    unique_specs = list(dict.fromkeys((chart_type, tuple(cols)) for chart_type, cols in specs))
+    key_columns = list(dict.fromkeys(cols[0] for _, cols in unique_specs if cols and cols[0] in df.columns))
+
+    run = map
+    if parallel and settings.CHART_WORKERS > 1 and len(df) >= settings.CHART_PARALLEL_MIN_ROWS:
+        run = chart_executor.map
+
+    def compute(spec: tuple) -> Dict[str, Any]:
+        # Timed per chart type here, since worker threads do not see the request's spans
+        start = time.perf_counter()
+        result = compute_chart(df, spec[0], list(spec[1]), max_points, scatter_mode, frame)
+        observe_span("chart", time.perf_counter() - start, chart_type=spec[0])
+        return result
+
+    # Stage 1 fills the factorization memo, stage 2 only reads it
+    list(run(frame.factorize, key_columns))
+    results = run(compute, unique_specs)
+    computed = dict(zip(unique_specs, results))
+    return [computed[(chart_type, tuple(cols))] for chart_type, cols in specs]
+
+
+def _is_additive(chart_type: str, cols: tuple, df: pd.DataFrame) -> bool:
+    # Counts and categorical group sums can be merged; downsampled series cannot
+    if chart_type == "pie" or (chart_type == "bar" and len(cols) == 1):
+        return True
+    return chart_type == "bar" and len(cols) == 2 and isinstance(df[cols[0]].dtype, pd.CategoricalDtype)
+
+
+def merge_chart(chart: Dict[str, Any], delta: Dict[str, Any], df: pd.DataFrame, key: str, by_count: bool) -> Dict[str, Any]:
+    """
+    Chart over the combined frame from a cached chart and the same chart over
+    the appended rows only. Labels follow the order compute_chart would give:
+    category order for categorical keys, else first appearance; counts are
+    then sorted descending.
+    """
+    totals = dict(zip(chart["data"]["labels"], chart["data"]["values"].tolist()))
+    for label, value in zip(delta["data"]["labels"], delta["data"]["values"].tolist()):
+        totals[label] = totals.get(label, 0) + value
+    if isinstance(df[key].dtype, pd.CategoricalDtype):
+        order = _labels(df[key].cat.categories, np.arange(len(df[key].cat.categories)))
+    else:
+        order = list(dict.fromkeys([*chart["data"]["labels"], *delta["data"]["labels"]]))
+    labels = np.array([label for label in order if label in totals], dtype=object)
+    values = np.array([totals[label] for label in labels], dtype=chart["data"]["values"].dtype)
+    if by_count:
+        ranked = np.argsort(-values, kind="stable")
+        labels, values = labels[ranked], values[ranked]
+    return {
+        **chart,
+        "data": {"labels": labels, "values": values},
+        "metadata": {**chart["metadata"], "colors": COLORS[:len(labels)]},
+    }
+
+
+def carry_forward_charts(fingerprint: str, new_fingerprint: str, df: pd.DataFrame, start: int, skip_columns: set) -> int:
+    """
+    After rows from position `start` were appended to df, update the cached
+    count and group-sum charts of the old fingerprint from the new rows alone
+    and store them under the new fingerprint. Charts over skip_columns, and
+    everything that is not additive, are recomputed on the next request.
+    Returns the number of charts carried forward.
+    """
+    appended = df.iloc[start:]
+    frame = ChartFrame(appended)
+    carried = 0
+    for (cached_fingerprint, chart_type, cols, max_points, scatter_mode), chart in chart_data_cache.items():
+        if cached_fingerprint != fingerprint or any(col in skip_columns for col in cols):
+            continue
+        if not all(col in df.columns for col in cols) or not _is_additive(chart_type, cols, df):
+            continue
+        delta = compute_chart(appended, chart_type, list(cols), max_points, ScatterMode(scatter_mode), frame)
+        if "error" in delta:
+            continue
+        merged = merge_chart(chart, delta, df, cols[0], by_count=len(cols) == 1)
+        chart_data_cache.set((new_fingerprint, chart_type, cols, max_points, scatter_mode), merged)
+        carried += 1
+    return carried
+
+
+def compute_drilldown(df: pd.DataFrame, key: str, measure: str = None, filters: Dict[str, list] = None, aggregates=None) -> Dict[str, Any]:
+    """
+    Bar chart of row counts (or the sum of measure) per value of key, over
+    the rows whose label matches one of the given values for every filter
+    column. Works on factorized codes, so with an aggregate index no column
+    is rehashed.
+    """
+    filters = filters or {}
+    columns = [key, *([measure] if measure else []), *filters]
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        return {"error": f"Columns {missing} not found in DataFrame. Available: {list(df.columns)}"}
+    if measure and not is_numeric(df[measure]):
+        return {"error": f"Column {measure} must be numeric for drilldown"}
+
+    frame = ChartFrame(df, aggregates)
+    codes, uniques, _ = frame.factorize(key)
+    mask = codes >= 0
+    for col, values in filters.items():
+        mask &= frame.matches(col, values)
+    counts = np.bincount(codes[mask], minlength=len(uniques))
+    observed = np.flatnonzero(counts)
+
+    if measure:
+        observed = frame.key_order(key, observed)
+        values = frame.sums_by_code(key, measure, mask)[observed]
+        if pd.api.types.is_integer_dtype(df[measure]):
+            values = values.astype(np.int64)
+    else:
+        observed = observed[np.argsort(-counts[observed], kind="stable")]
+        values = counts[observed]
+
+    y_label = measure or "Count"
+    return {
+        "chart_type": "bar",
+        "data": {"labels": _labels(uniques, observed), "values": values},
+        "metadata": {
+            "x_label": key,
+            "y_label": y_label,
+            "colors": COLORS[:len(observed)],
+            "title": f"{y_label} by {key}",
+            "filters": filters,
+            "rows_matched": int(mask.sum()),
+        }
+    }
+
+
+# Series are returned as NumPy arrays; routes serialize them with ORJSONNumpyResponse
+def create_chart_data(
+    session_id: str,
+    chart_types: List[str],
+    required_columns: List[List[str]],
+    max_points: int = DEFAULT_MAX_POINTS,
+    scatter_mode: ScatterMode = ScatterMode.sample,
+    frame: pd.DataFrame = None,
+    aggregates=None,
+    join_key: str = None
+) -> Dict[str, Any]:
+    # frame: the session's columns as prepared for charting; cache keys still use the session fingerprint,
+    # combined with join_key when the frame joins other tables
+    session_data = session_store.get(session_id)
+    if session_data is None:
         return {"error": "Invalid or expired session"}
-    
-    try: 
-        session_data = user_sessions[session_data]
-        df = session_data["dataframe"]
-        if df in None:
+
+    try:
+        df = session_data["dataframe"] if frame is None else frame
+        if df is None:
             return {"error": "No DataFrame available for this session"}
-        
+
         if len(chart_types) != len(required_columns):
             return {"error": "Mismatch between chart types and required columns"}
-        
-        colors = ["#36A2EB", "#FF6384", "#FFCE56", "#4BC0C0", "#9966FF", "#FF9F40"]
-
-        charts = [] # This list will contain the charts to be output
-
-        for chart_type, cols in zip(chart_types, required_columns):
-            if not all(col in df.columns for col in cols):
-                return {"error": f"Columns {cols} not found in DataFrame. Available: {list(df.columns)}"}
-
-            chart_data = {
-                "chart_type": chart_type,
-                "data": {},
-                "metadata": {
-                    "x_label": cols[0],
-                    "y_label": cols[1] if len(cols) > 1 else "Count",
-                    "colors": colors[:len(df[cols[0]].unique())] if cols[0] in df.columns else colors
-                }
-            }
 
-            if chart_type == "bar":
-                if len(cols) == 2:
-                    if np.issubdtype(df[cols[1]].dtype, np.number):
-                        grouped = df.groupby(cols[0])[cols[1].sum().reset_index]
-                    else:
-                        return {"error": f"Column {cols[1]} must be numeric for bar chart"}
-                    chart_data["data"] = {
-                        "labels": grouped[cols[0]].astype(str).tolist(),
-                        "values": grouped[cols[1]].tolist()
-                    }
-                else:
-                    counts = df[cols[0]].value_counts().reset_index(name="count")
-                    chart_data["data"] = {
-                        "labels": counts[cols[0]].astype(str).tolist(),
-                        "values": counts["count"].tolist()
-                    }
-                chart_data["metadata"]["title"] = f"{chart_data['metadata']['y_label']} by {chart_data['metadata']['x_label']}"
-
-            elif chart_type == "pie":
-                if len(cols) != 1:
-                    return {"error": "Pie chart requires exactly one categorical column"}
-                counts = df[cols[0]].value_counts().reset_index(name="count")
-                chart_data["data"] = {
-                    "labels": counts[cols[0]].astype(str).tolist(),
-                    "values": counts["count"].tolist()
-                }
-                chart_data["metadata"]["title"] = f"Distribution of {chart_data['metadata']['x_label']}"
-
-            elif chart_type == "line":
-                if len(cols) != 2:
-                    return {"error": "Line chart requires two columns (x: datetime/numeric, y: numeric)"}
-                if not (np.issubdtype(df[cols[0]].dtype, np.datetime64) or np.issubdtype(df[cols[0]].dtype, np.number)):
-                    return {"error": f"Column {cols[0]} must be datetime or numeric for line chart"}
-                if not np.issubdtype(df[cols[1]].dtype, np.number):
-                    return {"error": f"Column {cols[1]} must be numeric for line chart"}
-                sorted_df = df.sort_values(cols[0])
-                chart_data["data"] = {
-                    "labels": sorted_df[cols[0]].astype(str).tolist(),
-                    "values": sorted_df[cols[1]].tolist()
-                }
-                chart_data["metadata"]["title"] = f"{chart_data['metadata']['y_label']} over {chart_data["metadata"]["x_label"]}"
-
-            elif chart_type == "scatter":
-                if len(cols) != 2:
-                    return {"error": "Scatter chart requires two numeric columns"}
-                if not all(np.issubdtype(df[col].dtype, np.number) for col in cols):
-                    return {"error": f"Columns {cols} must be numeric for scatter chart"}
-                chart_data["data"] = {
-                    "data": [{"x": x, "y": y} for x, y in zip(df[cols[0]], df[cols[1]])]
-                }
-                chart_data["metadata"]["title"] = f"{chart_data["metadata"]["y_label"]} vs {chart_data['metadata']['x_label']}"
+        fingerprint = dataset_fingerprint(session_data)
+        if join_key is not None:
+            fingerprint = hashlib.blake2b(f"{fingerprint}:{join_key}".encode("utf-8"), digest_size=16).hexdigest()
 
-            else:
-                return {"error": f"Unsupported chart type: {chart_type}"}
-            
-            charts.append(chart_data)
+        cache_keys = [
+            (fingerprint, chart_type, tuple(cols), max_points, scatter_mode.value)
+            for chart_type, cols in zip(chart_types, required_columns)
+        ]
+        charts = [chart_data_cache.get(cache_key) for cache_key in cache_keys] # This list will contain the charts to be output
+
+        # Everything the cache could not answer is computed together as one batch
+        missing = [index for index, chart_data in enumerate(charts) if chart_data is None]
+        if missing:
+            with span("chart_compute"):
+                computed = compute_charts(
+                    df,
+                    [(chart_types[index], required_columns[index]) for index in missing],
+                    max_points,
+                    scatter_mode,
+                    aggregates=aggregates
+                )
+            for index, chart_data in zip(missing, computed):
+                charts[index] = chart_data
+
+        for chart_data in charts:
+            if "error" in chart_data:
+                return chart_data
+        for index in missing:
+            chart_data_cache.set(cache_keys[index], charts[index])
 
-            return {"charts": charts}
+        return {"charts": charts}
 
     except Exception as e:
-        return {"error": f"Failed to create chart data: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Failed to create chart data: {str(e)}"}
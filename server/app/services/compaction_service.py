@@ -0,0 +1,207 @@
+from pandas.api.types import union_categoricals
+import pandas as pd
+import numpy as np
+import warnings
+import re
+
+
+DATE_SAMPLE_SIZE = 1000
+DATE_MIN_PARSED_RATIO = 0.95
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+MEMORY_SAMPLE_SIZE = 10_000
+DATE_LIKE = re.compile(r"^\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}")
+
+
+class SchemaMismatchError(ValueError):
+    pass
+
+
+def memory_by_column(df: pd.DataFrame) -> pd.Series:
+    """
+    Per-column memory in bytes. Python-object columns are measured on a
+    sample and scaled, since memory_usage(deep=True) walks every object.
+    """
+    shallow = df.memory_usage(index=False, deep=False)
+    for position, name in enumerate(df.columns):
+        series = df.iloc[:, position]
+        if pd.api.types.is_object_dtype(series) and len(series) > MEMORY_SAMPLE_SIZE:
+            sample = series.sample(n=MEMORY_SAMPLE_SIZE, random_state=0)
+            shallow[name] = int(sample.memory_usage(index=False, deep=True) / MEMORY_SAMPLE_SIZE * len(series))
+        elif pd.api.types.is_object_dtype(series):
+            shallow[name] = series.memory_usage(index=False, deep=True)
+    return shallow
+
+
+def _compact_numeric(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series):
+        # Only keep float32 when it round-trips exactly, aggregates must not drift
+        values = series.to_numpy()
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed.astype(values.dtype), values, equal_nan=True):
+            return pd.Series(narrowed, index=series.index, name=series.name)
+    return series
+
+
+def _try_parse_dates(series: pd.Series):
+    sample = series.iloc[:DATE_SAMPLE_SIZE * 10].dropna().iloc[:DATE_SAMPLE_SIZE].astype(str)
+    if sample.empty or sample.str.match(DATE_LIKE).mean() < DATE_MIN_PARSED_RATIO:
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if pd.to_datetime(sample, errors="coerce").notna().mean() < DATE_MIN_PARSED_RATIO:
+            return None
+        parsed = pd.to_datetime(series, errors="coerce")
+    if parsed.notna().sum() < DATE_MIN_PARSED_RATIO * series.notna().sum():
+        return None
+    return parsed
+
+
+def _compact_object(series: pd.Series, use_arrow: bool) -> pd.Series:
+    parsed = _try_parse_dates(series)
+    if parsed is not None:
+        return parsed
+
+    # A cheap look at a sample rules out most high-cardinality text before the full hash pass
+    sample = series.iloc[:MEMORY_SAMPLE_SIZE].dropna()
+    if len(sample) and sample.nunique() / len(sample) <= CATEGORY_MAX_UNIQUE_RATIO:
+        non_null = series.notna().sum()
+        if series.nunique(dropna=True) / non_null <= CATEGORY_MAX_UNIQUE_RATIO:
+            return series.astype("category")
+
+    if use_arrow and pd.api.types.infer_dtype(series, skipna=True) == "string":
+        return series.astype(pd.ArrowDtype(_arrow_string_type()))
+    return series
+
+
+def _arrow_string_type():
+    import pyarrow as pa
+    return pa.large_string()
+
+
+def compact_dataframe(df: pd.DataFrame, use_arrow: bool = False):
+    """
+    Shrink a freshly parsed DataFrame: downcast numerics, parse date-like text
+    once, turn low-cardinality text into categoricals and, with use_arrow,
+    store the remaining text as Arrow strings.
+
+    Returns the compacted frame and a before/after memory report.
+    """
+    before = memory_by_column(df)
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_numeric_dtype(series):
+            columns[name] = _compact_numeric(series)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            columns[name] = _compact_object(series, use_arrow)
+        else:
+            columns[name] = series
+    compacted = pd.DataFrame(columns, index=df.index)
+    after = memory_by_column(compacted)
+
+    report = {
+        "bytes_before": int(before.sum()),
+        "bytes_after": int(after.sum()),
+        "ratio": round(before.sum() / after.sum(), 2) if after.sum() else None,
+        "columns": {
+            str(name): {
+                "dtype_before": str(df[name].dtype),
+                "dtype_after": str(compacted[name].dtype),
+                "bytes_before": int(before[name]),
+                "bytes_after": int(after[name]),
+            }
+            for name in df.columns
+        },
+    }
+    return compacted, report
+
+
+def _conform_numeric(old: pd.Series, new: pd.Series) -> pd.Series:
+    try:
+        new = pd.to_numeric(new)
+    except (ValueError, TypeError):
+        raise SchemaMismatchError(f"Column {old.name} is numeric but the new rows are not")
+    if len(new) == 0:
+        return new.astype(old.dtype)
+    if pd.api.types.is_integer_dtype(old) and pd.api.types.is_integer_dtype(new):
+        info = np.iinfo(old.dtype)
+        if info.min <= new.min() and new.max() <= info.max:
+            return new.astype(old.dtype)
+    elif old.dtype == np.float32 and pd.api.types.is_numeric_dtype(new):
+        values = new.to_numpy(dtype=np.float64, na_value=np.nan)
+        if np.array_equal(values.astype(np.float32).astype(np.float64), values, equal_nan=True):
+            return new.astype(np.float32)
+    # Values the narrowed dtype cannot hold; concat promotes to the smallest common dtype
+    return _compact_numeric(new)
+
+
+def _conform_datetime(old: pd.Series, new: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        converted = pd.to_datetime(new, errors="coerce")
+    unparsed = converted.isna() & new.notna()
+    if unparsed.any():
+        raise SchemaMismatchError(f"Column {old.name} holds dates but the new rows have {new[unparsed].iloc[0]!r}")
+    if not pd.api.types.is_datetime64_any_dtype(converted):
+        # e.g. strings with different UTC offsets, which pandas leaves as objects
+        raise SchemaMismatchError(f"Column {old.name} holds dates but the new rows mix time zones")
+    old_tz, new_tz = getattr(old.dtype, "tz", None), getattr(converted.dtype, "tz", None)
+    if old_tz is None and new_tz is not None:
+        raise SchemaMismatchError(f"Column {old.name} holds dates without a time zone but the new rows have one")
+    if old_tz is not None and new_tz is None:
+        raise SchemaMismatchError(f"Column {old.name} holds dates in {old_tz} but the new rows have no time zone")
+    if new_tz is not None:
+        converted = converted.dt.tz_convert(old_tz)
+    return converted.astype(old.dtype)
+
+
+def _append_categorical(old: pd.Series, new: pd.Series) -> pd.Series:
+    categories = old.cat.categories
+    values = new.astype(object)
+    if categories.inferred_type == "string" and not pd.api.types.is_string_dtype(new):
+        values = values.where(new.isna(), new.astype(str))
+    # New categories are appended after the existing ones, so the old codes stay valid
+    combined = union_categoricals([old.array, pd.Categorical(values)])
+    return pd.Series(combined, name=old.name)
+
+
+def append_frame(df: pd.DataFrame, new_rows: pd.DataFrame):
+    """
+    Append freshly parsed rows to a (compacted) session frame without
+    re-running compaction over the whole frame: the new rows are cast to the
+    frame's dtypes where that is lossless, categoricals are extended with any
+    new categories, and columns whose new values do not fit are promoted.
+
+    Returns the combined frame and the names of columns whose dtype changed.
+    """
+    missing = [str(name) for name in df.columns if name not in new_rows.columns]
+    unexpected = [str(name) for name in new_rows.columns if name not in df.columns]
+    if missing or unexpected:
+        raise SchemaMismatchError(f"Columns do not match the session data. Missing: {missing}, unexpected: {unexpected}")
+
+    columns = {}
+    for name in df.columns:
+        old, new = df[name], new_rows[name]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            columns[name] = _append_categorical(old, new)
+            continue
+        if pd.api.types.is_datetime64_any_dtype(old):
+            new = _conform_datetime(old, new)
+        elif pd.api.types.is_numeric_dtype(old):
+            new = _conform_numeric(old, new)
+        elif isinstance(old.dtype, pd.ArrowDtype):
+            new = new.astype(old.dtype)
+        else:
+            new = new.astype(object)
+        columns[name] = pd.concat([old, new], ignore_index=True)
+
+    combined = pd.DataFrame(columns)
+    changed = [
+        str(name) for name in df.columns
+        if combined[name].dtype != df[name].dtype and not isinstance(df[name].dtype, pd.CategoricalDtype)
+    ]
+    return combined, changed
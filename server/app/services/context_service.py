@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as np
+from app.config.llm_models import ModelName, CONTEXT_TOKEN_BUDGETS
+
+
+CHARS_PER_TOKEN = 4
+TOP_K_VALUES = 5
+MAX_SAMPLE_ROWS = 50
+MAX_CELL_CHARS = 60
+CATEGORICAL_MAX_UNIQUE = 50
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def classify_column(series: pd.Series, n_unique: int) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return "categorical"
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    if n_unique <= CATEGORICAL_MAX_UNIQUE:
+        return "categorical"
+    return "text"
+
+
+def _fmt(value) -> str:
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.6g}"
+    text = str(value)
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 3] + "..."
+
+
+def describe_column(name: str, series: pd.Series) -> tuple:
+    # One hash pass per non-numeric column serves both the unique count and the top values
+    counts = None
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        n_unique = int(series.nunique(dropna=True))
+    else:
+        counts = series.value_counts(dropna=True)
+        n_unique = len(counts)
+    kind = classify_column(series, n_unique)
+    parts = [f"- {name} ({kind}, {series.dtype}): {int(series.isna().sum())} nulls, {n_unique} unique"]
+
+    if kind == "numeric" and not pd.api.types.is_bool_dtype(series):
+        values = series.dropna()
+        if len(values):
+            q = values.quantile([0.25, 0.5, 0.75])
+            parts.append(
+                f"min {_fmt(values.min())}, p25 {_fmt(q[0.25])}, median {_fmt(q[0.5])}, "
+                f"p75 {_fmt(q[0.75])}, max {_fmt(values.max())}, mean {_fmt(values.mean())}, std {_fmt(values.std())}"
+            )
+    elif kind == "datetime":
+        values = series.dropna()
+        if len(values):
+            parts.append(f"from {values.min()} to {values.max()}")
+    else:
+        top = (counts if counts is not None else series.value_counts(dropna=True)).head(TOP_K_VALUES)
+        parts.append("top: " + ", ".join(f"{_fmt(v)} ({c})" for v, c in top.items()))
+
+    return kind, "; ".join(parts)
+
+
+def stratified_sample(df: pd.DataFrame, n: int, strata_column: str = None) -> pd.DataFrame:
+    if len(df) <= n:
+        return df
+    if strata_column is None:
+        return df.sample(n=n, random_state=0).sort_index()
+
+    # Proportional allocation with at least one row from every stratum that fits
+    groups = df.groupby(strata_column, observed=True, sort=False).indices
+    sizes = pd.Series({key: len(idx) for key, idx in groups.items()}).sort_values(ascending=False)
+    quotas = np.maximum(1, np.floor(sizes / len(df) * n)).astype(int).head(n)
+    rng = np.random.default_rng(0)
+    picked = [rng.choice(groups[key], size=min(quota, sizes[key]), replace=False) for key, quota in quotas.items()]
+    return df.iloc[np.sort(np.concatenate(picked))]
+
+
+def render_rows(sample: pd.DataFrame) -> str:
+    return sample.map(_fmt).to_csv(index=False)
+
+
+def describe_columns(df: pd.DataFrame) -> list:
+    return [describe_column(str(name), df[name]) for name in df.columns]
+
+
+def build_dataset_context(df: pd.DataFrame, model: ModelName, described: list = None) -> str:
+    """
+    Compact, size-bounded description of a DataFrame for use inside prompts:
+    schema, dtypes, per-column statistics, top values and a stratified sample.
+    `described` takes the output of describe_columns() so several budgets
+    can be built from one statistics pass.
+    """
+    budget = CONTEXT_TOKEN_BUDGETS[model] * CHARS_PER_TOKEN
+
+    lines = [f"Rows: {len(df)}, Columns: {len(df.columns)}", "Columns:"]
+    categorical = []
+    used = sum(len(line) + 1 for line in lines)
+    for position, name in enumerate(df.columns):
+        kind, line = described[position] if described is not None else describe_column(str(name), df[name])
+        if used + len(line) + 1 > budget * 0.7:
+            lines.append(f"- ... {len(df.columns) - position} more columns omitted")
+            break
+        if kind == "categorical":
+            categorical.append((df[name].nunique(), name))
+        lines.append(line)
+        used += len(line) + 1
+
+    strata_column = min(categorical)[1] if categorical else None
+    header = "\n".join(lines)
+
+    # Halve the sample until it fits in what is left of the budget
+    n_rows = min(MAX_SAMPLE_ROWS, len(df))
+    while n_rows > 0:
+        sample = stratified_sample(df, n_rows, strata_column)
+        label = f"Sample rows ({len(sample)} of {len(df)}" + (f", stratified by {strata_column}" if strata_column else "") + "):"
+        rows = render_rows(sample)
+        context = f"{header}\n{label}\n{rows}"
+        if len(context) <= budget:
+            return context
+        n_rows //= 2
+
+    return header[:budget]
+
+
+def build_text_context(text: str, model: ModelName) -> str:
+    budget = CONTEXT_TOKEN_BUDGETS[model] * CHARS_PER_TOKEN
+    if len(text) <= budget:
+        return text
+    return text[:budget] + "\n... [truncated]"
+
+
+def build_retrieved_context(text: str, index, query: str, model: ModelName, top_k: int) -> str:
+    """
+    Prompt context for a question about a text document: the whole text if it
+    fits the model budget, otherwise the top_k best matching chunks (as many
+    as fit), in document order and labelled with their page.
+    """
+    budget = CONTEXT_TOKEN_BUDGETS[model] * CHARS_PER_TOKEN
+    if len(text) <= budget:
+        return text
+    picked, used = {}, 0
+    for position in index.search(query, top_k):
+        chunk = index.chunks[position]
+        excerpt = f"[page {chunk['page']}]\n{chunk['text']}"
+        if used + len(excerpt) + 2 <= budget:
+            picked[position] = excerpt
+            used += len(excerpt) + 2
+    if not picked:
+        # Nothing in the document shares a word with the question
+        return build_text_context(text, model)
+    header = f"Excerpts of the document most relevant to the question ({len(picked)} of {len(index.chunks)} chunks):"
+    return "\n\n".join([header, *(picked[position] for position in sorted(picked))])
+
+
+def build_session_context(session_data: dict, model: ModelName) -> str:
+    # Contexts precomputed by the upload-time profiling job
+    profile = session_data.get("profile")
+    if profile is not None:
+        return profile["context"][model.value]
+    df = session_data.get("dataframe")
+    if df is not None:
+        return build_dataset_context(df, model)
+    return build_text_context(session_data.get("raw_text") or "", model)
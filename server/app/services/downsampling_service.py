@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+
+def as_float_axis(series: pd.Series) -> np.ndarray:
+    # Datetimes are ordered by their int64 representation
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy().view("int64").astype(np.float64)
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: pick `threshold` points of an x-sorted
+    series that preserve its visual shape. Each bucket is scanned with one
+    vectorized area computation.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start = end
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def sample_indices(n: int, max_points: int, seed: int = 0) -> np.ndarray:
+    if n <= max_points:
+        return np.arange(n)
+    # Uniform sample without replacement (the in-memory equivalent of a reservoir),
+    # kept in row order so repeated requests are stable
+    return np.sort(np.random.default_rng(seed).choice(n, size=max_points, replace=False))
+
+
+def grid_bin(x: np.ndarray, y: np.ndarray, max_points: int) -> dict:
+    """Aggregate points onto a square grid with at most max_points cells; returns the occupied cells."""
+    bins = max(1, int(np.sqrt(max_points)))
+    x_min, x_max = x.min(), x.max()
+    y_min, y_max = y.min(), y.max()
+    x_width = (x_max - x_min) / bins or 1.0
+    y_width = (y_max - y_min) / bins or 1.0
+    xi = np.minimum(((x - x_min) / x_width).astype(np.int64), bins - 1)
+    yi = np.minimum(((y - y_min) / y_width).astype(np.int64), bins - 1)
+    counts = np.bincount(xi * bins + yi, minlength=bins * bins)
+    occupied = np.flatnonzero(counts)
+    return {
+        "x": x_min + (occupied // bins + 0.5) * x_width,
+        "y": y_min + (occupied % bins + 0.5) * y_width,
+        "count": counts[occupied],
+    }
@@ -0,0 +1,314 @@
+from app.config.environment_config import settings
+from app.services.compaction_service import compact_dataframe
+from app.services.text_search_service import PAGE_BREAK
+from app.services.metrics_service import span
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import UploadFile
+from PyPDF2 import PdfReader
+from functools import partial
+from pathlib import Path
+from typing import Optional
+import importlib.util
+import multiprocessing
+import pandas as pd
+import numpy as np
+import threading
+import asyncio
+import logging
+import time
+import io
+
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+class SheetNotFoundError(ValueError):
+    pass
+
+
+# Parsing is CPU bound and mostly releases the GIL (pyarrow, pandas C parser),
+# so a small dedicated pool keeps it off the event loop without starving it
+ingest_executor = ThreadPoolExecutor(max_workers=settings.INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+# PyPDF2 and the Excel readers hold the GIL, so PDF page ranges and workbook
+# sheets are parsed in worker processes. Created on first use; spawn, because
+# forking a threaded server is unsafe.
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=settings.PARSE_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(cancel_futures=True)
+            _parse_pool = None
+
+
+class LimitedReader:
+    """Binary file wrapper that counts bytes read and enforces a ceiling."""
+
+    def __init__(self, raw, max_bytes: int):
+        self.raw = raw
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.closed = False
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        self.bytes_read += len(chunk)
+        if self.max_bytes and self.bytes_read > self.max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds the {self.max_bytes} byte limit")
+        return chunk
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+def read_csv_arrow(raw, max_bytes: int, skip_rows: int = 0) -> pd.DataFrame:
+    from pyarrow import csv as pa_csv
+    import pyarrow as pa
+
+    reader = pa_csv.open_csv(
+        LimitedReader(raw, max_bytes),
+        # Skipped rows are split on newlines but never converted
+        read_options=pa_csv.ReadOptions(block_size=settings.INGEST_BLOCK_BYTES, skip_rows_after_names=skip_rows),
+    )
+    batches = [batch for batch in reader]
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    del batches
+    # self_destruct frees each Arrow column as soon as it has been converted;
+    # dates become datetime64 directly instead of Python date objects
+    return table.to_pandas(self_destruct=True, split_blocks=True, date_as_object=False)
+
+
+def read_csv_chunked(raw, max_bytes: int, skip_rows: int = 0) -> pd.DataFrame:
+    chunks = pd.read_csv(
+        LimitedReader(raw, max_bytes),
+        chunksize=settings.INGEST_CHUNK_ROWS,
+        encoding="utf-8",
+        skiprows=range(1, skip_rows + 1) if skip_rows else None
+    )
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_csv_stream(raw, max_bytes: int, skip_rows: int = 0) -> pd.DataFrame:
+    try:
+        return read_csv_arrow(raw, max_bytes, skip_rows)
+    except UploadTooLargeError:
+        raise
+    except Exception as e:
+        # pyarrow infers types from the first block and rejects files whose later
+        # blocks disagree; pandas' chunked reader is slower but more forgiving
+        logger.warning("Arrow CSV reader failed (%s), falling back to chunked pandas reader", e)
+        raw.seek(0)
+        return read_csv_chunked(raw, max_bytes, skip_rows)
+
+
+def extract_page_range(data: bytes, start: int, stop: int) -> list:
+    reader = PdfReader(io.BytesIO(data))
+    # Scanned pages have no text layer and give None
+    return [reader.pages[number].extract_text() or "" for number in range(start, stop)]
+
+
+def read_pdf_text(raw, max_bytes: int) -> str:
+    """Text of every page, pages separated by PAGE_BREAK. Large documents are split into one page range per worker."""
+    data = LimitedReader(raw, max_bytes).read()
+    page_count = len(PdfReader(io.BytesIO(data)).pages)
+    if settings.PARSE_PROCESSES <= 1 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        pages = extract_page_range(data, 0, page_count)
+    else:
+        bounds = np.linspace(0, page_count, settings.PARSE_PROCESSES + 1).astype(int)
+        futures = [parse_pool().submit(extract_page_range, data, start, stop) for start, stop in zip(bounds, bounds[1:])]
+        pages = [text for future in futures for text in future.result()]
+    return PAGE_BREAK.join(pages)
+
+
+def excel_engine() -> str:
+    # calamine (Rust) reads .xlsx several times faster than openpyxl; it is optional
+    if settings.EXCEL_ENGINE != "auto":
+        return settings.EXCEL_ENGINE
+    return "calamine" if importlib.util.find_spec("python_calamine") is not None else "openpyxl"
+
+
+def read_excel_sheet(data: bytes, sheet: str, engine: str, nrows: Optional[int] = None, skip_rows: int = 0) -> pd.DataFrame:
+    skiprows = range(1, skip_rows + 1) if skip_rows else None
+    return pd.read_excel(io.BytesIO(data), sheet_name=sheet, engine=engine, nrows=nrows, skiprows=skiprows)
+
+
+def _read_sheets(data: bytes, engine: str, sheet: Optional[str], all_sheets: bool, nrows: Optional[int], skip_rows: int) -> dict:
+    with pd.ExcelFile(io.BytesIO(data), engine=engine) as workbook:
+        names = workbook.sheet_names
+        if all_sheets:
+            selected = names
+        elif sheet is not None:
+            if sheet not in names:
+                raise SheetNotFoundError(f"Sheet {sheet!r} not found. Available: {names}")
+            selected = [sheet]
+        else:
+            selected = names[:1]
+
+        if len(selected) > 1 and settings.PARSE_PROCESSES > 1:
+            futures = [parse_pool().submit(read_excel_sheet, data, name, engine, nrows, skip_rows) for name in selected]
+            frames = [future.result() for future in futures]
+        else:
+            skiprows = range(1, skip_rows + 1) if skip_rows else None
+            frames = [workbook.parse(name, nrows=nrows, skiprows=skiprows) for name in selected]
+    return dict(zip(selected, frames))
+
+
+def read_excel_tables(
+    raw,
+    max_bytes: int,
+    sheet: Optional[str] = None,
+    all_sheets: bool = False,
+    nrows: Optional[int] = None,
+    skip_rows: int = 0
+) -> dict:
+    """
+    Sheets of a workbook as {sheet name: DataFrame}: the first sheet, the
+    named one, or with all_sheets every sheet (in parallel on the parse
+    pool). nrows limits each sheet to its first rows for previews.
+    """
+    data = LimitedReader(raw, max_bytes).read()
+    engine = excel_engine()
+    try:
+        return _read_sheets(data, engine, sheet, all_sheets, nrows, skip_rows)
+    except SheetNotFoundError:
+        raise
+    except Exception as e:
+        if engine == "openpyxl":
+            raise
+        logger.warning("Excel engine %s failed (%s), falling back to openpyxl", engine, e)
+        return _read_sheets(data, "openpyxl", sheet, all_sheets, nrows, skip_rows)
+
+
+def parse_file(
+    file: UploadFile,
+    skip_rows: int = 0,
+    sheet: Optional[str] = None,
+    all_sheets: bool = False,
+    preview_rows: Optional[int] = None
+):
+    """
+    Parse an upload into ({table name: DataFrame}, None) for tabular files or
+    (None, text) for documents. skip_rows leaves out that many data rows after
+    the header (rows a session already has).
+    """
+    filename = file.filename.lower()
+    logger.debug("Parsing %s", file.filename)
+
+    if filename.endswith(".csv"):
+        try:
+            df = read_csv_stream(file.file, settings.MAX_UPLOAD_BYTES, skip_rows)
+            # Tabular files are described to the LLM from the DataFrame itself, no text copy is kept
+            return {Path(file.filename).stem: df}, None
+        except UploadTooLargeError:
+            raise
+        except Exception as e:
+            logger.warning("Error parsing CSV %s: %s", file.filename, e)
+            raise ValueError(f"Could not parse CSV file: {e}")
+
+    elif filename.endswith(".pdf"):
+        try:
+            return None, read_pdf_text(file.file, settings.MAX_UPLOAD_BYTES)
+        except UploadTooLargeError:
+            raise
+        except Exception as e:
+            logger.warning("Error parsing PDF %s: %s", file.filename, e)
+            raise ValueError(f"Could not parse PDF file: {e}")
+
+    elif filename.endswith(".xlsx"):
+        try:
+            tables = read_excel_tables(file.file, settings.MAX_UPLOAD_BYTES, sheet, all_sheets, preview_rows, skip_rows)
+            return tables, None
+        except UploadTooLargeError:
+            raise
+        except Exception as e:
+            logger.warning("Error parsing Excel file %s: %s", file.filename, e)
+            raise ValueError(f"Could not parse Excel file: {e}")
+
+    else:
+        raise ValueError("Unsupported file type")
+
+
+def table_name(name: str) -> str:
+    # Plans refer to other tables' columns as "table.column", so a table name never contains "."
+    return str(name).strip().replace(".", "_") or "table"
+
+
+def normalize_table_names(tables: dict) -> dict:
+    """Tables renamed by table_name; names that end up equal get a numeric suffix."""
+    normalized = {}
+    for name, df in tables.items():
+        base = candidate = table_name(name)
+        number = 2
+        while candidate in normalized:
+            candidate, number = f"{base}_{number}", number + 1
+        normalized[candidate] = df
+    return normalized
+
+
+def parse_and_compact(file: UploadFile, compact: bool = True, **options):
+    tables, parsed_content = parse_file(file, **options)
+    if tables is not None:
+        # File stems and sheet names become table names ("orders.v2.csv", sheet "Q1.2024")
+        tables = normalize_table_names(tables)
+    reports = None
+    if tables is not None and compact and settings.COMPACT_DATAFRAMES:
+        reports = {}
+        for name, df in tables.items():
+            tables[name], reports[name] = compact_dataframe(df, use_arrow=settings.COMPACT_ARROW_STRINGS)
+    return tables, parsed_content, reports
+
+
+async def ingest_upload(file: UploadFile, compact: bool = True, **options):
+    """
+    Parse (and compact) an upload off the event loop. options go to
+    parse_file. Returns ({table name: DataFrame} or None, text or None,
+    ingest statistics, {table name: compaction report} or None).
+    """
+    if settings.MAX_UPLOAD_BYTES and file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+        raise UploadTooLargeError(f"Upload exceeds the {settings.MAX_UPLOAD_BYTES} byte limit")
+
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with span("parse"):
+        tables, parsed_content, compaction = await loop.run_in_executor(
+            ingest_executor, partial(parse_and_compact, file, compact, **options)
+        )
+    elapsed = time.perf_counter() - start
+
+    rows = sum(len(df) for df in tables.values()) if tables is not None else 0
+    stats = {
+        "rows": rows,
+        "bytes": file.size,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed) if elapsed > 0 else None,
+    }
+    if tables is not None and len(tables) > 1:
+        stats["tables"] = {name: len(df) for name, df in tables.items()}
+    if compaction is not None:
+        stats["memory_bytes_before"] = sum(report["bytes_before"] for report in compaction.values())
+        stats["memory_bytes_after"] = sum(report["bytes_after"] for report in compaction.values())
+    logger.info("Ingested %s: %s", file.filename, stats)
+    return tables, parsed_content, stats, compaction
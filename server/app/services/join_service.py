@@ -0,0 +1,231 @@
+from app.schemas.join import Join, check_joins
+from app.services.preprocessing_service import infer_plan, apply_plan
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+import numpy as np
+import hashlib
+import time
+
+
+class JoinError(ValueError):
+    pass
+
+
+class KeyIndex:
+    """
+    A table's join key column factorized once: codes per row, the distinct
+    key values and, built on first use as the right side of a join, the rows
+    of each code grouped together (order, starts, counts). Joining two tables
+    only hashes their distinct keys against each other.
+    """
+
+    def __init__(self, version: str, series: pd.Series):
+        self.version = version
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Compacted frames already carry the codes
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series)
+        self.codes = codes.astype(np.intp, copy=False)
+        self.uniques = pd.Index(uniques)
+        self.order = None
+
+    def build_lookup(self):
+        if self.order is None:
+            valid = self.codes >= 0
+            self.counts = np.bincount(self.codes[valid], minlength=len(self.uniques))
+            # Rows without a key sort first and never match
+            self.order = np.argsort(self.codes, kind="stable")[len(self.codes) - int(valid.sum()):]
+            self.starts = np.cumsum(self.counts) - self.counts
+        return self
+
+    def __sizeof__(self) -> int:
+        arrays = [self.codes] + ([self.order, self.starts, self.counts] if self.order is not None else [])
+        return sum(array.nbytes for array in arrays) + int(self.uniques.memory_usage(deep=True))
+
+
+def table_version(session_data: dict, name: str) -> Optional[str]:
+    # Tables stored before per-table versions existed share the session's
+    return (session_data.get("table_versions") or {}).get(name) or session_data.get("data_version")
+
+
+def other_tables(session_data: dict) -> Dict[str, pd.DataFrame]:
+    active = session_data.get("active_table")
+    return {name: df for name, df in (session_data.get("tables") or {}).items() if name != active}
+
+
+def table_columns(session_data: dict) -> Dict[str, List[str]]:
+    return {name: [str(col) for col in df.columns] for name, df in other_tables(session_data).items()}
+
+
+def _column_types(df: pd.DataFrame) -> str:
+    return "\n".join(f"- {name} ({df[name].dtype})" for name in df.columns)
+
+
+def describe_tables(session_data: dict, describe_columns: Callable[[pd.DataFrame], str] = _column_types) -> str:
+    """
+    Prompt section listing the session's other tables: their columns (as
+    describe_columns renders them) and the column names they share with the
+    active table as likely join keys. Only names and types, never rows.
+    """
+    tables = other_tables(session_data)
+    if not tables:
+        return ""
+    active = session_data["dataframe"]
+    sections = []
+    for name, df in tables.items():
+        lines = [f"Table {name}:"]
+        lines += ["  " + line for line in describe_columns(df).splitlines()]
+        shared = [str(col) for col in df.columns if col in active.columns]
+        if shared:
+            lines.append("  Likely join keys: " + ", ".join(f"{col} = {name}.{col}" for col in shared))
+        sections.append("\n".join(lines))
+    return (
+        "\nOther tables. Refer to their columns as \"table.column\" and add a join for every table used:\n"
+        + "\n".join(sections)
+    )
+
+
+def join_signature(session_data: dict, joins: List[Join]) -> str:
+    """Identifies the joined tables' data and the joins, for cache keys next to the active table's fingerprint."""
+    parts = [f"{j.table}:{table_version(session_data, j.table)}:{j.left_on}:{j.right_on}:{j.how}" for j in joins]
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _join_cache(session_data: dict) -> dict:
+    cache = session_data.get("joins")
+    if cache is None:
+        cache = {"keys": {}, "mappings": {}, "cleaned": {}}
+        session_data["joins"] = cache
+    return cache
+
+
+def _key_index(session_data: dict, table: str, column: str, cached: list) -> KeyIndex:
+    cache = _join_cache(session_data)["keys"]
+    version = table_version(session_data, table)
+    key = cache.get((table, column))
+    if key is None or key.version != version:
+        key = KeyIndex(version, session_data["tables"][table][column])
+        cache[(table, column)] = key
+        cached.append(False)
+    return key
+
+
+def _key_mapping(session_data: dict, left: Tuple[str, str], right: Tuple[str, str], left_key: KeyIndex, right_key: KeyIndex) -> np.ndarray:
+    # Position of each distinct left key among the distinct right keys (-1: no match)
+    cache = _join_cache(session_data)["mappings"]
+    versions = (left_key.version, right_key.version)
+    entry = cache.get((left, right))
+    if entry is None or entry[0] != versions:
+        left_uniques, right_uniques = left_key.uniques, right_key.uniques
+        if pd.api.types.is_numeric_dtype(left_uniques) != pd.api.types.is_numeric_dtype(right_uniques):
+            # e.g. ids read as numbers from one file and as text from the other; text that is no number matches nothing
+            left_uniques, right_uniques = (pd.Index(pd.to_numeric(u, errors="coerce")) for u in (left_uniques, right_uniques))
+        positions = right_uniques.get_indexer(left_uniques).astype(np.intp, copy=False)
+        positions[np.asarray(left_uniques.isna())] = -1
+        entry = (versions, positions)
+        cache[(left, right)] = entry
+    return entry[1]
+
+
+def _match(codes: np.ndarray, right: KeyIndex, how: str) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """
+    Hash join of rows holding right-side key codes (-1: no key) against the
+    grouped rows of `right`. Returns the positions of the output rows among
+    the input rows (None: unchanged) and each output row's right row (-1 for
+    unmatched rows of a left join).
+    """
+    found = codes >= 0
+    matches = np.zeros(len(codes), dtype=np.intp)
+    matches[found] = right.counts[codes[found]]
+    first = np.full(len(codes), -1, dtype=np.intp)
+    hit = matches > 0
+    first[hit] = right.order[right.starts[codes[hit]]]
+    if matches.max(initial=0) <= 1:
+        # Many-to-one, the usual lookup of a dimension table
+        if how == "left":
+            return None, first
+        rows = np.flatnonzero(hit)
+        return rows, first[rows]
+
+    out = np.maximum(matches, 1) if how == "left" else matches
+    rows = np.repeat(np.arange(len(codes), dtype=np.intp), out)
+    offsets = np.arange(len(rows), dtype=np.intp) - np.repeat(np.cumsum(out) - out, out)
+    right_rows = np.full(len(rows), -1, dtype=np.intp)
+    matched = matches[rows] > 0
+    right_rows[matched] = right.order[right.starts[codes[rows[matched]]] + offsets[matched]]
+    return rows, right_rows
+
+
+def _take(series: pd.Series, rows: Optional[np.ndarray]) -> pd.Series:
+    if rows is None:
+        return series.reset_index(drop=True)
+    if isinstance(series.dtype, np.dtype):
+        values = pd.api.extensions.take(series.to_numpy(), rows, allow_fill=True)
+    else:
+        values = series.array.take(rows, allow_fill=True)
+    return pd.Series(values, name=series.name)
+
+
+def _joined_column(session_data: dict, table: str, column: str, clean: bool, cached: list) -> pd.Series:
+    series = session_data["tables"][table][column]
+    if not clean:
+        return series
+    # Cleaned on the joined table itself, before its rows are repeated by the join
+    cache = _join_cache(session_data)["cleaned"]
+    version = table_version(session_data, table)
+    entry = cache.get((table, column))
+    if entry is None or entry[0] != version:
+        entry = (version, apply_plan(series, infer_plan(series)))
+        cache[(table, column)] = entry
+        cached.append(False)
+    return entry[1]
+
+
+def join_tables(session_data: dict, joins: List[Join], columns: List[str], base: pd.DataFrame, clean: bool = False) -> Tuple[pd.DataFrame, dict]:
+    """
+    Frame of `columns` over the active table joined with other session
+    tables. `base` holds the active table's own columns (already projected
+    and, for charts, cleaned) row-aligned with it; joined columns come out
+    as "table.column", cleaned too when `clean` is set. Keys are joined
+    through cached KeyIndex factorizations and only the requested columns
+    are gathered, so a join never copies whole tables.
+
+    Returns the frame and a report with the rows each join produced.
+    """
+    start = time.perf_counter()
+    active = session_data["active_table"]
+    tables = table_columns(session_data)
+    problems = check_joins(joins, columns, [str(col) for col in session_data["dataframe"].columns], tables)
+    if problems:
+        raise JoinError("; ".join(problems))
+
+    cached = []
+    rows = {active: None}  # table -> its row behind each output row (None: the active table's rows as they are)
+    report = []
+    for join in joins:
+        left_table, _, left_column = join.left_on.partition(".")
+        if join.left_on in session_data["dataframe"].columns:
+            left_table, left_column = active, join.left_on
+        left_key = _key_index(session_data, left_table, left_column, cached)
+        right_key = _key_index(session_data, join.table, join.right_on, cached).build_lookup()
+        mapping = _key_mapping(session_data, (left_table, left_column), (join.table, join.right_on), left_key, right_key)
+
+        codes = left_key.codes if rows[left_table] is None else np.where(rows[left_table] >= 0, left_key.codes[rows[left_table]], -1)
+        codes = np.where(codes >= 0, mapping[codes], -1)
+        kept, right_rows = _match(codes, right_key, join.how)
+        if kept is not None:
+            rows = {table: kept if table_rows is None else table_rows[kept] for table, table_rows in rows.items()}
+        rows[join.table] = right_rows
+        report.append({"table": join.table, "how": join.how, "rows": len(right_rows), "unmatched": int((right_rows < 0).sum())})
+
+    frame = {}
+    for name in dict.fromkeys(columns):
+        if name in base.columns:
+            frame[name] = _take(base[name], rows[active])
+            continue
+        table, _, column = name.partition(".")
+        series = _joined_column(session_data, table, column, clean, cached)
+        frame[name] = _take(series, rows[table]).rename(name)
+    result = pd.DataFrame(frame)
+    return result, {"joins": report, "cached": not cached, "ms": round((time.perf_counter() - start) * 1000, 2)}
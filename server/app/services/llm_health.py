@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Optional
+import numpy as np
+import time
+
+
+# Upper bounds, in seconds, of the cumulative latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class ProviderHealth:
+    """
+    Rolling latency and error statistics plus a circuit breaker for one LLM
+    provider. Only touched from the event loop, so it needs no locking.
+
+    The breaker opens after `failure_threshold` consecutive failures, rejects
+    requests for `cooldown_seconds`, then lets a single trial request through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str, window: int, failure_threshold: int, cooldown_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "cancelled": 0}
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def available(self) -> bool:
+        """Whether allow_request() would admit a request, without claiming the half-open trial."""
+        if self.state == "open":
+            return time.monotonic() - self.opened_at >= self.cooldown_seconds
+        return self.state == "closed" or not self.trial_in_flight
+
+    def record_success(self, seconds: Optional[float] = None):
+        self.counters["successes"] += 1
+        self.outcomes.append(True)
+        if seconds is not None:
+            self.latencies.append(seconds)
+            self.histogram[int(np.searchsorted(LATENCY_BUCKETS, seconds))] += 1
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+        self.state = "closed"
+
+    def record_failure(self):
+        self.counters["failures"] += 1
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # Cancelled (e.g. a hedging loser) or failed for reasons that say nothing about the provider
+        self.counters["cancelled"] += 1
+        self.trial_in_flight = False
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return float(np.quantile(np.fromiter(self.latencies, dtype=np.float64), q))
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def expected_latency(self) -> Optional[float]:
+        # Median latency inflated by the chance of having to go elsewhere after a failure
+        median = self.quantile(0.5)
+        if median is None:
+            return None
+        return median / max(0.05, 1.0 - self.error_rate())
+
+    def metrics(self) -> dict:
+        cumulative = np.cumsum(self.histogram).tolist()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "samples": len(self.latencies),
+            "error_rate": round(self.error_rate(), 4),
+            "latency_seconds": {
+                label: round(value, 4) if value is not None else None
+                for label, value in (("p50", self.quantile(0.5)), ("p90", self.quantile(0.9)), ("p99", self.quantile(0.99)))
+            },
+            "histogram": {
+                **{f"le_{bound:g}": count for bound, count in zip(LATENCY_BUCKETS, cumulative)},
+                "le_inf": cumulative[-1],
+            },
+            **self.counters,
+        }
+
+
+class UsageTracker:
+    """Token and cost accounting: totals per provider and per prompt, plus the most recent requests."""
+
+    def __init__(self, history: int):
+        self.recent = deque(maxlen=history)
+        self.totals = {}  # (provider, prompt name) -> summed usage
+
+    def record(self, provider: str, prompt_name: str, usage: dict, cost_usd: float, seconds: Optional[float]):
+        entry = {"provider": provider, "prompt": prompt_name, **usage, "cost_usd": cost_usd, "seconds": seconds}
+        self.recent.append(entry)
+        totals = self.totals.setdefault((provider, prompt_name), {
+            "requests": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+        })
+        totals["requests"] += 1
+        for key in ("input_tokens", "cached_tokens", "output_tokens"):
+            totals[key] += usage[key]
+        totals["cost_usd"] += cost_usd
+
+    def metrics(self) -> dict:
+        by_prompt = {}
+        for (provider, prompt_name), totals in self.totals.items():
+            by_prompt.setdefault(prompt_name, {})[provider] = {
+                **totals,
+                "cost_usd": round(totals["cost_usd"], 6),
+                "cached_ratio": round(totals["cached_tokens"] / totals["input_tokens"], 4) if totals["input_tokens"] else None,
+            }
+        return {"by_prompt": by_prompt, "recent": list(self.recent)}
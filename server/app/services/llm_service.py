@@ -1,7 +1,21 @@
 from app.config.environment_config import settings
+from app.config.llm_models import ModelName, PROVIDER_MODELS
+from app.config.prompts import Prompt, JSON_REPAIR
+from app.services.llm_health import ProviderHealth, UsageTracker
+from app.services.metrics_service import span, LLM_TOKENS
 from google import genai
-from google.genai import types
+from google.genai import types, errors as genai_errors
+from pydantic import BaseModel, ValidationError
+from json import JSONDecodeError
 import openai
+import httpx
+from typing import AsyncIterator, Awaitable, Callable, Optional, Type, Union
+import asyncio
+import hashlib
+import random
+import logging
+import json
+import time
 
 
 GEMINI_API_KEY = settings.GEMINI_API_KEY
@@ -9,33 +23,635 @@ OPENAI_API_KEY = settings.OPENAI_API_KEY
 GEMINI_LLM_MODEL = settings.GEMINI_LLM_MODEL
 OPENAI_LLM_MODEL = settings.OPENAI_LLM_MODEL
 
+GPT_SYSTEM_PROMPT = "You are a professional analyst who returns accurate, concise and detailed response to queries"
 
-def query_gemini(prompt):
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Invalid output longer than this is cut before it is sent back for repair
+MAX_REPAIR_CHARS = 8000
+
+usage_tracker = UsageTracker(settings.LLM_USAGE_HISTORY)
+logger = logging.getLogger(__name__)
+
+
+class LLMServiceError(Exception):
+    pass
+
+
+_json_decoder = json.JSONDecoder()
+
+
+def sanitize_llm_json(raw_response: str) -> dict:
+    """
+    Parse the JSON in an LLM answer. Structured-output answers parse directly;
+    otherwise decoding starts at the first { or [ and stops at the end of that
+    value, so code fences and stray text around it are ignored.
+    """
+    with span("json_sanitize"):
+        cleaned = raw_response.strip()
+        try:
+            return json.loads(cleaned)
+        except JSONDecodeError:
+            pass
+        starts = [index for index in (cleaned.find("{"), cleaned.find("[")) if index >= 0]
+        if not starts:
+            raise JSONDecodeError("No JSON value found in LLM response", cleaned, 0)
+        value, _ = _json_decoder.raw_decode(cleaned, min(starts))
+        return value
+
+
+def as_prompt(prompt: Union[str, Prompt]) -> Prompt:
+    return prompt if isinstance(prompt, Prompt) else Prompt("adhoc", prompt)
+
+
+def empty_usage() -> dict:
+    return {"input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+
+
+def _http2_available() -> bool:
+    if not settings.LLM_HTTP2:
+        return False
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        response = client.models.generate_content(
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _httpx_client_args() -> dict:
+    return {
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+        ),
+        "timeout": httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=10.0),
+    }
+
+
+class LLMProvider:
+    """
+    Long-lived async client for one LLM backend.
+
+    Owns a pooled HTTP client, caps in-flight requests with a semaphore,
+    retries transient failures with full-jitter exponential backoff and
+    tracks its own latency and outages in a ProviderHealth.
+    """
+
+    name = "base"
+    # USD per million input, cached input and output tokens
+    prices = (0.0, 0.0, 0.0)
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.health = ProviderHealth(
+            self.name,
+            settings.LLM_STATS_WINDOW,
+            settings.LLM_BREAKER_FAILURES,
+            settings.LLM_BREAKER_COOLDOWN_SECONDS,
+        )
+        self.timeout = settings.LLM_TIMEOUT_SECONDS
+        self.max_retries = settings.LLM_MAX_RETRIES
+        self.backoff_base = settings.LLM_BACKOFF_BASE_SECONDS
+        self.backoff_max = settings.LLM_BACKOFF_MAX_SECONDS
+
+    async def _complete_once(self, prompt: Prompt) -> tuple:
+        """Returns the answer text and its usage as returned by empty_usage()."""
+        raise NotImplementedError
+
+    def _stream_once(self, prompt: Prompt, usage: dict) -> AsyncIterator[str]:
+        """Yields answer tokens and fills `usage` once the provider reports it."""
+        raise NotImplementedError
+
+    def cost(self, usage: dict) -> float:
+        input_price, cached_price, output_price = self.prices
+        uncached = usage["input_tokens"] - usage["cached_tokens"]
+        return (uncached * input_price + usage["cached_tokens"] * cached_price + usage["output_tokens"] * output_price) / 1e6
+
+    def _record_usage(self, prompt: Prompt, usage: dict, seconds: Optional[float]) -> str:
+        cost = self.cost(usage)
+        usage_tracker.record(self.name, prompt.name, usage, round(cost, 8), round(seconds, 4) if seconds is not None else None)
+        LLM_TOKENS.inc(usage["input_tokens"] - usage["cached_tokens"], model=self.name, kind="input")
+        LLM_TOKENS.inc(usage["cached_tokens"], model=self.name, kind="cached_input")
+        LLM_TOKENS.inc(usage["output_tokens"], model=self.name, kind="output")
+        logger.info("LLM usage %s/%s: %s, $%.6f", self.name, prompt.name, usage, cost)
+        return f"{prompt.name} in={usage['input_tokens']} cached={usage['cached_tokens']} out={usage['output_tokens']}"
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, (asyncio.TimeoutError, httpx.TransportError))
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _is_outage(self, exc: LLMServiceError) -> bool:
+        # Exhausted retries on transient errors count against the breaker, a rejected prompt does not
+        return exc.__cause__ is None or self._is_retryable(exc.__cause__)
+
+    def _admit(self):
+        if not self.health.allow_request():
+            raise LLMServiceError(f"{self.name} circuit breaker is open")
+
+    async def complete(self, prompt: Union[str, Prompt]) -> str:
+        prompt = as_prompt(prompt)
+        self._admit()
+        with span("llm_call", model=self.name) as details:
+            start = time.perf_counter()
+            try:
+                result, usage = await self._complete_with_retries(prompt)
+            except LLMServiceError as e:
+                if self._is_outage(e):
+                    self.health.record_failure()
+                else:
+                    self.health.release()
+                raise
+            except BaseException:
+                self.health.release()
+                raise
+            elapsed = time.perf_counter() - start
+            self.health.record_success(elapsed)
+            details["desc"] = self._record_usage(prompt, usage, elapsed)
+            return result
+
+    async def _complete_with_retries(self, prompt: Prompt) -> tuple:
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    return await asyncio.wait_for(self._complete_once(prompt), timeout=self.timeout)
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise LLMServiceError(f"{self.name} request failed: {e!r}") from e
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def stream(self, prompt: Union[str, Prompt]) -> AsyncIterator[str]:
+        # Stream durations depend on answer length, so only the outcome is recorded
+        prompt = as_prompt(prompt)
+        self._admit()
+        outcome = None
+        usage = empty_usage()
+        with span("llm_stream", model=self.name) as details:
+            try:
+                async for token in self._stream_with_retries(prompt, usage):
+                    yield token
+                outcome = True
+                details["desc"] = self._record_usage(prompt, usage, None)
+            except LLMServiceError as e:
+                outcome = False if self._is_outage(e) else None
+                raise
+            finally:
+                if outcome is True:
+                    self.health.record_success()
+                elif outcome is False:
+                    self.health.record_failure()
+                else:
+                    self.health.release()
+
+    async def _stream_with_retries(self, prompt: Prompt, usage: dict) -> AsyncIterator[str]:
+        # Retries are only safe until the first token has been handed to the caller
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self.semaphore:
+                    async for token in self._stream_once(prompt, usage):
+                        started = True
+                        yield token
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not self._is_retryable(e):
+                    raise LLMServiceError(f"{self.name} stream failed: {e!r}") from e
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def aclose(self):
+        pass
+
+
+class OpenAIProvider(LLMProvider):
+    name = "chatgpt"
+    prices = (
+        settings.OPENAI_PRICE_INPUT_PER_MTOK,
+        settings.OPENAI_PRICE_CACHED_INPUT_PER_MTOK,
+        settings.OPENAI_PRICE_OUTPUT_PER_MTOK,
+    )
+
+    def __init__(self):
+        super().__init__(settings.OPENAI_MAX_CONCURRENCY)
+        self.http_client = httpx.AsyncClient(**_httpx_client_args())
+        self.client = openai.AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        if isinstance(exc, openai.APIStatusError):
+            return exc.status_code in RETRYABLE_STATUS_CODES
+        return super()._is_retryable(exc)
+
+    def _messages(self, prompt: Prompt) -> list:
+        # Stable parts first: OpenAI caches the longest previously seen prefix automatically
+        messages = [{"role": "system", "content": prompt.system or GPT_SYSTEM_PROMPT}]
+        if prompt.context:
+            messages.append({"role": "user", "content": prompt.context})
+        messages.append({"role": "user", "content": prompt.user})
+        return messages
+
+    def _usage(self, usage) -> dict:
+        if usage is None:
+            return empty_usage()
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "input_tokens": usage.prompt_tokens or 0,
+            "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            "output_tokens": usage.completion_tokens or 0,
+        }
+
+    def _response_format(self, prompt: Prompt) -> dict:
+        if prompt.response_schema is None:
+            return {}
+        return {"response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": prompt.name, "schema": prompt.response_schema, "strict": True},
+        }}
+
+    async def _complete_once(self, prompt: Prompt) -> tuple:
+        response = await self.client.chat.completions.create(
+            model=OPENAI_LLM_MODEL,
+            messages=self._messages(prompt),
+            temperature=0,
+            **self._response_format(prompt)
+        )
+        return response.choices[0].message.content.strip(), self._usage(response.usage)
+
+    async def _stream_once(self, prompt: Prompt, usage: dict) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=OPENAI_LLM_MODEL,
+            messages=self._messages(prompt),
+            temperature=0,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        # Leaving the block closes the HTTP response, aborting the upstream generation
+        async with stream:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage.update(self._usage(chunk.usage))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def aclose(self):
+        await self.client.close()
+
+
+def gemini_schema(schema: dict) -> dict:
+    # Gemini takes an OpenAPI-style subset of JSON schema without additionalProperties
+    if isinstance(schema, dict):
+        return {key: gemini_schema(value) for key, value in schema.items() if key != "additionalProperties"}
+    if isinstance(schema, list):
+        return [gemini_schema(value) for value in schema]
+    return schema
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    prices = (
+        settings.GEMINI_PRICE_INPUT_PER_MTOK,
+        settings.GEMINI_PRICE_CACHED_INPUT_PER_MTOK,
+        settings.GEMINI_PRICE_OUTPUT_PER_MTOK,
+    )
+
+    def __init__(self):
+        super().__init__(settings.GEMINI_MAX_CONCURRENCY)
+        client_args = _httpx_client_args()
+        client_args.pop("timeout")
+        self.client = genai.Client(
+            api_key=GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                base_url=settings.GEMINI_BASE_URL,
+                timeout=int(self.timeout * 1000),
+                async_client_args=client_args,
+            ),
+        )
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        if isinstance(exc, genai_errors.APIError):
+            return exc.code in RETRYABLE_STATUS_CODES
+        return super()._is_retryable(exc)
+
+    def _config(self, prompt: Prompt) -> types.GenerateContentConfig:
+        structured = {}
+        if prompt.response_schema is not None:
+            structured = {
+                "response_mime_type": "application/json",
+                "response_schema": gemini_schema(prompt.response_schema),
+            }
+        return types.GenerateContentConfig(
+            temperature=0.4,
+            system_instruction=prompt.system,
+            **structured
+        )
+
+    def _contents(self, prompt: Prompt) -> list:
+        # System instruction, then context, then the question: Gemini's implicit cache matches on the shared prefix
+        parts = [types.Part(text=prompt.context)] if prompt.context else []
+        parts.append(types.Part(text=prompt.user))
+        return [types.Content(role="user", parts=parts)]
+
+    def _usage(self, metadata) -> dict:
+        if metadata is None:
+            return empty_usage()
+        return {
+            "input_tokens": metadata.prompt_token_count or 0,
+            "cached_tokens": metadata.cached_content_token_count or 0,
+            "output_tokens": metadata.candidates_token_count or 0,
+        }
+
+    async def _complete_once(self, prompt: Prompt) -> tuple:
+        response = await self.client.aio.models.generate_content(
             model=GEMINI_LLM_MODEL,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.4
-            )
+            contents=self._contents(prompt),
+            config=self._config(prompt)
+        )
+        return response.text, self._usage(response.usage_metadata)
+
+    async def _stream_once(self, prompt: Prompt, usage: dict) -> AsyncIterator[str]:
+        stream = await self.client.aio.models.generate_content_stream(
+            model=GEMINI_LLM_MODEL,
+            contents=self._contents(prompt),
+            config=self._config(prompt)
+        )
+        try:
+            async for chunk in stream:
+                # Every chunk carries the running totals, the last one wins
+                if chunk.usage_metadata is not None:
+                    usage.update(self._usage(chunk.usage_metadata))
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            await stream.aclose()
+
+    async def aclose(self):
+        # google-genai does not expose a close hook for its pooled async client
+        await self.client._api_client._async_httpx_client.aclose()
+
+
+PROVIDER_CLASSES = {
+    ModelName.chatgpt: OpenAIProvider,
+    ModelName.gemini: GeminiProvider,
+}
+
+_providers: dict = {}
+
+
+def get_provider(model: ModelName) -> LLMProvider:
+    # Created lazily so the pools bind to the running event loop
+    if model not in _providers:
+        _providers[model] = PROVIDER_CLASSES[model]()
+    return _providers[model]
+
+
+async def close_providers():
+    providers = list(_providers.values())
+    _providers.clear()
+    for provider in providers:
+        await provider.aclose()
+
+
+routing_counters = {"auto_requests": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0}
+structured_counters = {"requests": 0, "repairs": 0, "repair_failures": 0}
+
+
+class SingleFlight:
+    """
+    Identical concurrent calls share one in-flight task: the first caller
+    starts it, later callers with the same key wait for the same result or
+    exception. A caller that is cancelled only stops waiting; the shared
+    task is cancelled once no caller is waiting for it any more. Finished
+    calls are forgotten, so results are never served after the fact.
+    """
+
+    def __init__(self):
+        self._flights = {}  # key -> [task, number of waiting callers]
+        self.counters = {"calls": 0, "coalesced": 0, "cancelled": 0}
+
+    async def run(self, key: tuple, factory: Callable[[], Awaitable], on_join: Callable = None):
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.create_task(factory())
+            flight = [task, 0]
+            self._flights[key] = flight
+            task.add_done_callback(lambda done: self._finish(key, flight, done))
+            self.counters["calls"] += 1
+        else:
+            self.counters["coalesced"] += 1
+            if on_join is not None:
+                on_join()
+        flight[1] += 1
+        try:
+            # shield: cancelling one caller must not cancel the call the others wait for
+            return await asyncio.shield(flight[0])
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not flight[0].done():
+                # Forget it first: a caller arriving before the task finishes cancelling starts a new one
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight[0].cancel()
+                self.counters["cancelled"] += 1
+
+    def _finish(self, key: tuple, flight: list, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception retrieved when every caller has already gone
+        task.cancelled() or task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+llm_single_flight = SingleFlight()
+
+
+def prompt_key(prompt: Prompt) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (prompt.name, prompt.system, prompt.context, prompt.user):
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    if prompt.response_schema is not None:
+        digest.update(json.dumps(prompt.response_schema, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def rank_providers() -> list:
+    """
+    Provider models ordered for an auto request: those whose breaker admits
+    requests first, providers without enough samples before measured ones
+    (so both keep getting measured), then by expected latency.
+    """
+    def sort_key(model: ModelName):
+        health = get_provider(model).health
+        expected = health.expected_latency()
+        measured = len(health.latencies) >= settings.LLM_ROUTING_MIN_SAMPLES and expected is not None
+        return (not health.available(), measured, expected if measured else 0.0)
+    return sorted(PROVIDER_MODELS, key=sort_key)
+
+
+def hedge_delay(model: ModelName) -> float:
+    health = get_provider(model).health
+    p90 = health.quantile(0.9)
+    if p90 is None or len(health.latencies) < settings.LLM_ROUTING_MIN_SAMPLES:
+        return settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    return p90
+
+
+async def _validated(model: ModelName, prompt: Union[str, Prompt], validate: Optional[Callable]) -> str:
+    response = await get_provider(model).complete(prompt)
+    if validate is not None:
+        validate(response)
+    return response
+
+
+async def query_auto(prompt: Union[str, Prompt], validate: Optional[Callable] = None) -> str:
+    """
+    Send the prompt to the best-ranked provider. If it has not answered within
+    its own p90 latency (hedging) or fails / returns something `validate`
+    rejects (fallback), the next provider is raced against it. The first valid
+    answer wins and the other request is cancelled.
+    """
+    routing_counters["auto_requests"] += 1
+    ranked = rank_providers()
+    primary, backups = ranked[0], ranked[1:]
+    pending = {asyncio.create_task(_validated(primary, prompt, validate))}
+    winners = {}
+    errors = []
+
+    def launch_backup(reason: str):
+        model = backups.pop(0)
+        routing_counters[reason] += 1
+        task = asyncio.create_task(_validated(model, prompt, validate))
+        winners[task] = reason
+        pending.add(task)
+
+    try:
+        while pending:
+            timeout = hedge_delay(primary) if backups and settings.LLM_HEDGE_REQUESTS and not winners else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch_backup("hedges")
+                continue
+            for task in done:
+                pending.discard(task)
+                try:
+                    response = task.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if winners.get(task) == "hedges":
+                    routing_counters["hedge_wins"] += 1
+                return response
+            if backups and not pending:
+                launch_backup("fallbacks")
+        raise LLMServiceError(f"All providers failed: {'; '.join(repr(e) for e in errors)}")
+    finally:
+        # Losers are cancelled, which closes their HTTP requests
+        for task in pending:
+            task.cancel()
+
+
+async def _query_llm(prompt: Prompt, model: ModelName, validate: Optional[Callable]) -> str:
+    if model == ModelName.auto:
+        return await query_auto(prompt, validate)
+    return await get_provider(model).complete(prompt)
+
+
+async def query_llm(prompt: Union[str, Prompt], model: ModelName, validate: Optional[Callable] = None) -> str:
+    """
+    `validate` (e.g. sanitize_llm_json) only matters for auto requests, where
+    an answer it rejects sends the request on to the other provider.
+
+    Concurrent calls with the same model and prompt share one provider call
+    (LLM_SINGLE_FLIGHT), e.g. a dashboard whose clients all ask for the
+    same chart plan or description at once.
+    """
+    prompt = as_prompt(prompt)
+    if not settings.LLM_SINGLE_FLIGHT:
+        return await _query_llm(prompt, model, validate)
+    key = (model.value, prompt_key(prompt), getattr(validate, "__qualname__", None))
+    with span("llm_query", model=model.value) as details:
+        return await llm_single_flight.run(
+            key,
+            lambda: _query_llm(prompt, model, validate),
+            on_join=lambda: details.update(desc="coalesced"),
         )
-        return response.text
-    except Exception as e:
-        print(f"An unexpected error occured: {e}")
 
 
-def query_gpt(prompt):
+def describe_invalid_output(exc: Exception) -> str:
+    # Location and message per error, without pydantic's input echo and docs links
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'document'}: {error['msg']}"
+            for error in exc.errors(include_url=False)
+        )
+    return str(exc)
+
+
+async def query_structured(
+    prompt: Prompt,
+    model: ModelName,
+    schema_model: Type[BaseModel],
+    validation_context: Optional[dict] = None
+) -> BaseModel:
+    """
+    Ask for JSON (natively enforced when prompt.response_schema is set) and
+    validate it against schema_model. If that fails, one repair request sends
+    back only the invalid output and the validation error, not the original
+    prompt. A second failure raises the JSONDecodeError / ValidationError.
+    """
+    structured_counters["requests"] += 1
+    response = await query_llm(prompt, model, validate=sanitize_llm_json)
     try:
-        openai.api_key = OPENAI_API_KEY
-        response = openai.chat.completions.create(
-            model=OPENAI_LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a professional analyst who returns accurate, concise and detailed response to queries"},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"An unexpected error occured: {e}")
\ No newline at end of file
+        return schema_model.model_validate(sanitize_llm_json(response), context=validation_context)
+    except (JSONDecodeError, ValidationError) as e:
+        error = describe_invalid_output(e)
+
+    structured_counters["repairs"] += 1
+    logger.warning("Repairing invalid %s output: %s", prompt.name, error)
+    repair = JSON_REPAIR.render(output=response[:MAX_REPAIR_CHARS], error=error, response_schema=prompt.response_schema)
+    response = await query_llm(repair, model, validate=sanitize_llm_json)
+    try:
+        return schema_model.model_validate(sanitize_llm_json(response), context=validation_context)
+    except (JSONDecodeError, ValidationError):
+        structured_counters["repair_failures"] += 1
+        raise
+
+
+async def stream_llm(prompt: Union[str, Prompt], model: ModelName) -> AsyncIterator[str]:
+    if model == ModelName.auto:
+        # Tokens cannot be raced without showing both answers, so streams are only routed
+        routing_counters["auto_requests"] += 1
+        model = rank_providers()[0]
+    async for token in get_provider(model).stream(prompt):
+        yield token
+
+
+async def query_gemini(prompt):
+    return await query_llm(prompt, ModelName.gemini)
+
+
+async def query_gpt(prompt):
+    return await query_llm(prompt, ModelName.chatgpt)
+
+
+def llm_metrics() -> dict:
+    return {
+        "providers": {model.value: get_provider(model).health.metrics() for model in PROVIDER_MODELS},
+        "routing": dict(routing_counters),
+        "structured_output": dict(structured_counters),
+        "single_flight": {**llm_single_flight.counters, "in_flight": llm_single_flight.in_flight()},
+        "usage": usage_tracker.metrics(),
+    }
@@ -0,0 +1,200 @@
+from app.config.environment_config import settings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, List, Optional
+import threading
+import bisect
+import time
+import os
+
+
+# Seconds; spans from sub-millisecond lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label set, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}  # label values -> total
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set. observe() is a bisect and a few
+    additions under a lock, cheap enough for every request and span.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            series[position] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in snapshot.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = 'le="' + str(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "qc_request_duration_seconds", "HTTP request latency by route template.", ("route", "method", "status")
+)
+SPAN_SECONDS = Histogram(
+    "qc_span_duration_seconds", "Time spent in one hot-path step of a request.", ("span", "model", "chart_type")
+)
+LLM_TOKENS = Counter("qc_llm_tokens_total", "LLM tokens by provider and kind.", ("model", "kind"))
+
+# Spans finished during the current request, for its Server-Timing header
+_request_spans: ContextVar[Optional[list]] = ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(name: str, model: str = "", chart_type: str = ""):
+    """
+    Time a step into qc_span_duration_seconds and the current request's
+    Server-Timing entries. Yields a dict; a "desc" set on it (e.g. token
+    counts) is shown next to the duration in Server-Timing.
+    """
+    details = {}
+    start = time.perf_counter()
+    try:
+        yield details
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, span=name, model=model, chart_type=chart_type)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed, details.get("desc")))
+
+
+def observe_span(name: str, seconds: float, model: str = "", chart_type: str = ""):
+    # For steps timed elsewhere, e.g. on worker threads that do not share the request context
+    SPAN_SECONDS.observe(seconds, span=name, model=model, chart_type=chart_type)
+
+
+def server_timing_header(spans: Iterable[tuple], total: float) -> str:
+    entries = []
+    for number, (name, elapsed, desc) in enumerate(spans):
+        # Repeated steps (e.g. two LLM calls) need distinct metric names
+        entry = f"{name}_{number};dur={elapsed * 1000:.2f}"
+        if desc:
+            entry += f';desc="{_escape(desc)}"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by its route template (not the
+    raw path, so session ids do not explode the label set). Adds a
+    Server-Timing header with the request's spans when SERVER_TIMING is on
+    or the client sends `X-Server-Timing: 1`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        spans = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+        status = 500
+        timing = settings.SERVER_TIMING or (b"x-server-timing", b"1") in scope.get("headers", ())
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timing:
+                    header = server_timing_header(spans, time.perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                route=getattr(route, "path", "unmatched"),
+                method=scope["method"],
+                status=status,
+            )
+            _request_spans.reset(token)
+
+
+def _gauges(prefix: str, values: dict) -> List[str]:
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+def render_metrics(extra_gauges: dict = None) -> str:
+    """
+    Prometheus text exposition of this process. With several workers each
+    one answers for itself; qc_process_info tells which one a scrape reached.
+    """
+    lines = ["# TYPE qc_process_info gauge", f'qc_process_info{{pid="{os.getpid()}"}} 1']
+    for metric in (REQUEST_SECONDS, SPAN_SECONDS, LLM_TOKENS):
+        lines += metric.render()
+    for prefix, values in (extra_gauges or {}).items():
+        lines += _gauges(prefix, values)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,151 @@
+from app.services.compaction_service import DATE_LIKE
+from typing import List, Tuple
+import pandas as pd
+import numpy as np
+import warnings
+import time
+
+
+INFER_SAMPLE_SIZE = 2000
+INFER_MIN_PARSED_RATIO = 0.95
+NULL_TOKENS = ["", "na", "n/a", "nan", "null", "none", "-", "--", "?"]
+# Currency symbols, thousands separators, percent signs and spaces around numbers
+NUMBER_NOISE = r"[,\s$€£¥%]"
+
+
+def _strip(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.strip().str.replace(r"\s+", " ", regex=True)
+
+
+def _as_number(values: pd.Series) -> pd.Series:
+    # "(1,234.50)" is accounting notation for -1234.5
+    text = values.str.replace(NUMBER_NOISE, "", regex=True).str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+    return pd.to_numeric(text, errors="coerce")
+
+
+def _as_datetime(values: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(values, errors="coerce")
+
+
+def infer_plan(series: pd.Series) -> Tuple[str, ...]:
+    """
+    Cleaning steps for a column, decided on a sample of its non-null values.
+    The empty plan means the column is charted as it is.
+    """
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return ()
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return ("inf_to_null",) if np.isinf(values).any() else ()
+
+    sample = series.dropna()
+    if isinstance(sample.dtype, pd.CategoricalDtype):
+        # The categories already are the distinct values
+        sample = pd.Series(sample.cat.categories)
+    sample = sample.iloc[:INFER_SAMPLE_SIZE]
+    if sample.empty:
+        return ()
+
+    stripped = _strip(sample)
+    steps = []
+    if not stripped.equals(sample.astype(str)):
+        steps.append("strip")
+    is_null = stripped.str.lower().isin(NULL_TOKENS)
+    if is_null.any():
+        steps.append("null_tokens")
+    values = stripped[~is_null]
+    if values.empty:
+        return tuple(steps)
+
+    if _as_number(values).notna().mean() >= INFER_MIN_PARSED_RATIO:
+        steps.append("numeric")
+    elif values.str.match(DATE_LIKE).mean() >= INFER_MIN_PARSED_RATIO and _as_datetime(values).notna().mean() >= INFER_MIN_PARSED_RATIO:
+        steps.append("datetime")
+    return tuple(steps)
+
+
+def apply_plan(series: pd.Series, plan: Tuple[str, ...]) -> pd.Series:
+    """
+    Run a cleaning plan over a whole column. Text is cleaned once per distinct
+    value and mapped back through the factorized codes, so repeated values
+    cost one hash pass instead of a string operation each.
+    """
+    if not plan:
+        return series
+    if plan == ("inf_to_null",):
+        return series.replace([np.inf, -np.inf], np.nan)
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), pd.Series(series.cat.categories)
+    else:
+        codes, uniques = pd.factorize(series)
+        uniques = pd.Series(uniques)
+    cleaned = _strip(uniques) if "strip" in plan else uniques.astype(str)
+    missing = cleaned.str.lower().isin(NULL_TOKENS).to_numpy() if "null_tokens" in plan else np.zeros(len(cleaned), dtype=bool)
+
+    if "numeric" in plan or "datetime" in plan:
+        converted = _as_number(cleaned) if "numeric" in plan else _as_datetime(cleaned)
+        converted[missing] = None
+        # A code of -1 (null) picks the appended null slot
+        values = pd.concat([converted, pd.Series([None], dtype=converted.dtype)], ignore_index=True).to_numpy()
+        return pd.Series(values[codes], index=series.index, name=series.name)
+
+    # Text stays categorical: variants that clean to the same value share a category
+    new_codes, categories = pd.factorize(cleaned.where(~missing))
+    mapped = np.where(codes >= 0, new_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(mapped, categories), index=series.index, name=series.name)
+
+
+def prepare_columns(session_data: dict, columns: List[str]) -> Tuple[pd.DataFrame, dict]:
+    """
+    Chart-ready frame holding only `columns` of the session DataFrame, each
+    cleaned on first use. Cleaned columns are kept on the session for its
+    current data_version and the decided plans for as long as the column's
+    dtype holds, so later charts (and appends) reuse them. Never modifies
+    the session DataFrame itself.
+
+    Returns the frame and a per-column report with the timing of each step.
+    """
+    start = time.perf_counter()
+    df = session_data["dataframe"]
+    version = session_data.get("data_version")
+    cache = session_data.get("cleaned")
+    if cache is None or cache["data_version"] != version:
+        cache = {"data_version": version, "columns": {}}
+        session_data["cleaned"] = cache
+    plans = session_data.setdefault("cleaning_plans", {})
+
+    cleaned, report = {}, {}
+    for name in dict.fromkeys(columns):
+        if name not in df.columns:
+            continue
+        if name in cache["columns"]:
+            cleaned[name] = cache["columns"][name]
+            report[str(name)] = {"steps": list(plans.get(name, ())), "cached": True}
+            continue
+
+        series = df[name]
+        step_start = time.perf_counter()
+        plan = plans.get(name)
+        if plan is None:
+            plan = infer_plan(series)
+            plans[name] = plan
+        inferred = time.perf_counter()
+        result = apply_plan(series, plan)
+        applied = time.perf_counter()
+
+        cache["columns"][name] = result
+        cleaned[name] = result
+        report[str(name)] = {
+            "steps": list(plan),
+            "cached": False,
+            "dtype_before": str(series.dtype),
+            "dtype_after": str(result.dtype),
+            "infer_ms": round((inferred - step_start) * 1000, 2),
+            "apply_ms": round((applied - inferred) * 1000, 2),
+        }
+
+    frame = pd.DataFrame(cleaned, index=df.index)
+    return frame, {"columns": report, "total_ms": round((time.perf_counter() - start) * 1000, 2)}
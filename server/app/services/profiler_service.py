@@ -0,0 +1,109 @@
+from app.config.environment_config import settings
+from collections import Counter
+from typing import Optional
+import threading
+import time
+import sys
+import os
+
+
+# Leaf frames of threads blocked waiting for work; sampling them only adds noise
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("handlers.py", "dequeue"),  # the log QueueListener
+    ("thread.py", "_worker"),  # ThreadPoolExecutor blocked in SimpleQueue.get, which has no Python frame
+}
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that can be switched on in a running server. A
+    daemon thread snapshots the Python stack of every other thread at a fixed
+    interval and counts identical stacks; nothing is hooked into the
+    interpreter, so the cost is one stack walk per thread and sample, and
+    zero while stopped. Threads waiting for work are left out. Results are
+    collapsed stacks ("frame;frame;frame N"), the input format of
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self._samples = 0
+        self._started_at = None
+        self._ended_at = None
+        self._interval = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval_ms: float) -> dict:
+        with self._lock:
+            if self.running:
+                return {"error": "The profiler is already running"}
+            seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+            self._stacks = Counter()
+            self._samples = 0
+            self._interval = max(interval_ms, 1) / 1000
+            self._started_at, self._ended_at = time.time(), None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(seconds,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return self.status()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.status()
+
+    def _run(self, seconds: float):
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own and not _idle(frame):
+                        self._stacks[_collapse(frame)] += 1
+                self._samples += 1
+            del frames
+            self._stop.wait(self._interval)
+        self._ended_at = time.time()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "pid": os.getpid(),
+            "samples": self._samples,
+            "interval_ms": self._interval * 1000 if self._interval else None,
+            "started_at": self._started_at,
+            "ended_at": self._ended_at,
+        }
+
+    def collapsed(self, limit: int = None) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return "\n".join(f"{stack} {count}" for stack, count in stacks) + "\n"
+
+
+def _idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def _collapse(frame) -> str:
+    # Root first, as the collapsed format expects
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+sampling_profiler = SamplingProfiler()
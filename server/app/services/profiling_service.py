@@ -0,0 +1,223 @@
+from app.config.environment_config import settings
+from app.config.llm_models import ModelName, CONTEXT_TOKEN_BUDGETS
+from app.config.prompts import DATASET_DESCRIPTION
+from app.services.session_store import session_store
+from app.services.context_service import describe_columns, build_dataset_context, build_text_context
+from app.services.text_search_service import TextIndex, chunk_text
+from app.services.aggregate_service import build_aggregate_index
+from app.services.llm_service import query_structured
+from app.schemas.dataset_description import DatasetDescription
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+# Column statistics are pandas work; a small pool keeps them off the event loop
+# and bounds how many uploads are profiled at once
+profile_executor = ThreadPoolExecutor(max_workers=settings.PROFILE_WORKERS, thread_name_prefix="profile")
+
+
+class JobRegistry:
+    """
+    Background asyncio jobs keyed by (session_id, data_version, name). Asking
+    for a job that is still running returns the in-flight task instead of
+    starting a duplicate; finished jobs leave a status record behind.
+    """
+
+    def __init__(self, max_history: int):
+        self.max_history = max_history
+        self._tasks = {}  # key -> asyncio.Task
+        self._status = OrderedDict()  # key -> status dict
+
+    def submit(self, key: tuple, factory: Callable[[], Awaitable]) -> asyncio.Task:
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            return task
+
+        status = {"state": "running", "started_at": time.time(), "seconds": None, "error": None}
+        self._status[key] = status
+        self._status.move_to_end(key)
+        while len(self._status) > self.max_history:
+            self._status.popitem(last=False)
+
+        task = asyncio.create_task(self._run(key, status, factory))
+        # Speculative jobs may never be awaited; mark their exception as retrieved
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._tasks[key] = task
+        return task
+
+    async def _run(self, key: tuple, status: dict, factory: Callable[[], Awaitable]):
+        start = time.perf_counter()
+        try:
+            result = await factory()
+            status["state"] = "done"
+            return result
+        except Exception as e:
+            status["state"] = "failed"
+            status["error"] = str(e)
+            raise
+        finally:
+            status["seconds"] = round(time.perf_counter() - start, 3)
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    def status(self, session_id: str, data_version: str) -> dict:
+        return {
+            key[2]: dict(status)
+            for key, status in self._status.items()
+            if key[0] == session_id and key[1] == data_version
+        }
+
+
+profile_jobs = JobRegistry(settings.PROFILE_JOB_HISTORY)
+
+
+def profile_session(session_data: dict) -> dict:
+    """
+    Column types, statistics and the prompt context for every model, from one
+    statistics pass. Text sessions get a chunk index for retrieval instead.
+    """
+    df = session_data.get("dataframe")
+    version = session_data.get("data_version")
+    if df is None:
+        text = session_data.get("raw_text") or ""
+        return {
+            "rows": None,
+            "columns": [],
+            "context": {model.value: build_text_context(text, model) for model in ModelName},
+            "text_index": TextIndex(chunk_text(text)),
+            "data_version": version,
+        }
+
+    described = describe_columns(df)
+    # Models with the same token budget share one context
+    by_budget = {}
+    for model in ModelName:
+        if CONTEXT_TOKEN_BUDGETS[model] not in by_budget:
+            by_budget[CONTEXT_TOKEN_BUDGETS[model]] = build_dataset_context(df, model, described)
+    return {
+        "rows": len(df),
+        "columns": [
+            {"name": str(name), "type": kind, "dtype": str(df[name].dtype), "summary": summary}
+            for name, (kind, summary) in zip(df.columns, described)
+        ],
+        "context": {model.value: by_budget[CONTEXT_TOKEN_BUDGETS[model]] for model in ModelName},
+        "data_version": version,
+    }
+
+
+def extend_text_profile(profile: dict, text: str, appended: str, first_page: int, data_version: str) -> dict:
+    """Profile of a text session whose `text` now ends with the pages of `appended`; only those are chunked and indexed."""
+    return {
+        **profile,
+        "context": {model.value: build_text_context(text, model) for model in ModelName},
+        "text_index": profile["text_index"].extended(chunk_text(appended, first_page=first_page)),
+        "data_version": data_version,
+    }
+
+
+def _store_result(session_id: str, data_version: str, update: Callable[[dict], None]):
+    # The session may have expired or been re-uploaded while the job ran
+    session_data = session_store.get(session_id)
+    if session_data is None or session_data.get("data_version") != data_version:
+        return
+    update(session_data)
+    session_store.set(session_id, session_data)
+
+
+async def _profile_job(session_id: str, session_data: dict) -> dict:
+    loop = asyncio.get_running_loop()
+    profile = await loop.run_in_executor(profile_executor, profile_session, session_data)
+
+    def update(data: dict):
+        data["profile"] = profile
+    _store_result(session_id, session_data.get("data_version"), update)
+    logger.info("Profiled session %s: %d columns", session_id, len(profile["columns"]))
+    return profile
+
+
+async def _aggregates_job(session_id: str, session_data: dict):
+    loop = asyncio.get_running_loop()
+    version = session_data.get("data_version")
+    index = await loop.run_in_executor(profile_executor, build_aggregate_index, session_data["dataframe"], version)
+
+    def update(data: dict):
+        data["aggregates"] = index
+    _store_result(session_id, version, update)
+    logger.info("Aggregate index for session %s: %s", session_id, index.stats)
+    return index.stats
+
+
+async def request_dataset_description(dataset_context: str, model: ModelName, columns: Optional[list] = None) -> dict:
+    prompt = DATASET_DESCRIPTION.render(context=dataset_context, response_schema=DatasetDescription.response_schema(columns))
+    description = await query_structured(prompt, model, DatasetDescription, {"columns": columns})
+    result = description.model_dump(mode="json")
+    logger.debug("Dataset description: %s", result)
+    return result
+
+
+async def _description_job(session_id: str, session_data: dict, model: ModelName) -> dict:
+    profile = await ensure_profile(session_id, session_data)
+    columns = [column["name"] for column in profile["columns"]] or None
+    result = await request_dataset_description(profile["context"][model.value], model, columns)
+
+    def update(data: dict):
+        data["descriptions"] = {**data.get("descriptions", {}), model.value: result}
+    _store_result(session_id, session_data.get("data_version"), update)
+    return result
+
+
+async def ensure_profile(session_id: str, session_data: dict) -> dict:
+    """Cached profile if there is one, otherwise the in-flight (or a new) profiling job."""
+    profile = session_data.get("profile")
+    if profile is not None:
+        return profile
+    key = (session_id, session_data.get("data_version"), "profile")
+    # shield: a cancelled request must not cancel a job other requests share
+    return await asyncio.shield(profile_jobs.submit(key, lambda: _profile_job(session_id, session_data)))
+
+
+async def ensure_description(session_id: str, session_data: dict, model: ModelName) -> dict:
+    description = session_data.get("descriptions", {}).get(model.value)
+    if description is not None:
+        return description
+    key = (session_id, session_data.get("data_version"), f"description:{model.value}")
+    return await asyncio.shield(profile_jobs.submit(key, lambda: _description_job(session_id, session_data, model)))
+
+
+def start_profiling(session_id: str, session_data: dict, describe_model: Optional[ModelName] = None) -> dict:
+    """Kick off upload-time jobs without waiting for them."""
+    version = session_data.get("data_version")
+    profile = session_data.get("profile")
+    # Text appends hand over a profile already extended to the new pages
+    if profile is None or profile.get("data_version") != version:
+        profile_jobs.submit((session_id, version, "profile"), lambda: _profile_job(session_id, session_data))
+    df = session_data.get("dataframe")
+    # Small frames are charted from scratch about as fast as from an index
+    index = session_data.get("aggregates")
+    # Appends hand over an index already extended to the new rows
+    current = index is not None and index.data_version == version
+    if settings.AGGREGATE_INDEX and df is not None and len(df) >= settings.AGGREGATE_MIN_ROWS and not current:
+        profile_jobs.submit((session_id, version, "aggregates"), lambda: _aggregates_job(session_id, session_data))
+    if describe_model is not None:
+        profile_jobs.submit(
+            (session_id, version, f"description:{describe_model.value}"),
+            lambda: _description_job(session_id, session_data, describe_model)
+        )
+    return profile_jobs.status(session_id, version)
+
+
+def profiling_status(session_id: str, session_data: dict) -> dict:
+    return {
+        "session_id": session_id,
+        "profile_ready": session_data.get("profile") is not None,
+        "descriptions_ready": sorted(session_data.get("descriptions", {})),
+        "aggregates": session_data["aggregates"].stats if session_data.get("aggregates") is not None else None,
+        "jobs": profile_jobs.status(session_id, session_data.get("data_version")),
+    }
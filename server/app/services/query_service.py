@@ -1,26 +1,87 @@
-from app.services.llm_service import query_gemini, query_gpt
-from app.controllers.uploadfile_controller import user_sessions
+from app.services.llm_service import query_llm, stream_llm, sanitize_llm_json
+from app.services.session_store import session_store
+from app.services.context_service import build_session_context, build_retrieved_context
+from app.services.profiling_service import ensure_profile
+from app.services.metrics_service import span
+from app.config.environment_config import settings
+from app.services.queryplan_service import build_plan_prompt, describe_columns_for_plan, execute_plan, plan_columns, result_to_json, QueryPlanError
+from app.services.join_service import describe_tables, join_tables, JoinError
+from app.services.chart_service import run_compute
+from app.schemas.query_plan import QueryPlan
 from app.config.llm_models import ModelName
+from app.config.prompts import Prompt, QUERY_ANSWER
+from pydantic import ValidationError
+from json import JSONDecodeError
+from typing import AsyncIterator
+import logging
 
 
-def handle_user_query(query: str, session_id: str, model: ModelName):
+logger = logging.getLogger(__name__)
+
+
+async def build_query_prompt(query: str, session_id: str, model: ModelName) -> Prompt:
+    session_data = session_store[session_id]
+    if session_data["dataframe"] is None:
+        # Text documents: only the chunks that match the question go to the LLM
+        profile = await ensure_profile(session_id, session_data)
+        with span("prompt_build", model=model.value):
+            dataset_context = build_retrieved_context(
+                session_data.get("raw_text") or "", profile["text_index"], query, model, settings.TEXT_TOP_K_CHUNKS
+            )
+            return QUERY_ANSWER.render(context=dataset_context, query=query)
+    with span("prompt_build", model=model.value):
+        dataset_context = build_session_context(session_data, model)
+        return QUERY_ANSWER.render(context=dataset_context, query=query)
+
+
+async def handle_user_query(query: str, session_id: str, model: ModelName):
     try:
-        text_file_content = user_sessions[session_id]["raw_text"]
-        prompt = f"""
-            The user has uploaded the following data: {text_file_content}
-            You need to answer the following user query based on the uploaded data: {query} 
-            Your answer should be cocise and to the point.
-            Do not include any thing more than what is being asked by the user in the query or what is needed.
-            You can include complete sentences though in you answers to give it a humanly touch.
-        """
-        response = ""
-        if model == ModelName.gemini:
-            response = query_gemini(prompt)
-        elif model == ModelName.chatgpt:
-            response = query_gpt(prompt)
-        print("----------------------The response received from the llm for user data and query----------------------")
-        print(response)
-        print("------------------------------------------------------------------------------------------------------")
+        prompt = await build_query_prompt(query, session_id, model)
+        response = await query_llm(prompt, model)
+        logger.debug("LLM answer for session %s: %s", session_id, response)
         return {"response": response}
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+async def stream_user_query(query: str, session_id: str, model: ModelName) -> AsyncIterator[str]:
+    # Tokens are forwarded as they arrive; closing this generator closes the upstream stream
+    prompt = await build_query_prompt(query, session_id, model)
+    async for token in stream_llm(prompt, model):
+        yield token
+
+
+async def handle_plan_query(query: str, session_id: str, model: ModelName):
+    # The LLM only writes the plan; the answer is computed locally on the full DataFrame
+    session_data = session_store.get(session_id)
+    if session_data is None:
+        return {"error": "Invalid or expired session"}
+    df = session_data["dataframe"]
+    if df is None:
+        return {"error": "Query plans need a tabular file (CSV or Excel)"}
+
+    try:
+        with span("prompt_build", model=model.value):
+            # Listing small categoricals scans every text column, so this is table work too
+            tables_context = await run_compute(describe_tables, session_data, describe_columns_for_plan)
+            prompt = await run_compute(build_plan_prompt, query, df, tables_context)
+        response = await query_llm(prompt, model, validate=sanitize_llm_json)
+        plan = QueryPlan.model_validate(sanitize_llm_json(response))
+        if plan.joins:
+            # Joined locally from the session's tables; only their column names were in the prompt
+            with span("join"):
+                df, join_report = await run_compute(join_tables, session_data, plan.joins, plan_columns(plan, df), df)
+            if not join_report["cached"]:
+                session_store.set(session_id, session_data)
+        result = await run_compute(execute_plan, df, plan)
+        return {
+            "plan": plan.model_dump(exclude_defaults=True),
+            "result": result_to_json(result),
+            "row_count": len(result),
+        }
+    except JSONDecodeError as e:
+        return {"error": f"LLM returned invalid JSON: {str(e)}"}
+    except (ValidationError, QueryPlanError, JoinError) as e:
+        return {"error": f"LLM returned an invalid query plan: {str(e)}"}
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,168 @@
+import pandas as pd
+import numpy as np
+import json
+from app.schemas.query_plan import QueryPlan, Filter
+from app.config.prompts import Prompt, QUERY_PLAN
+
+
+DEFAULT_RESULT_LIMIT = 100
+MAX_PROMPT_VALUES = 10
+
+
+class QueryPlanError(ValueError):
+    pass
+
+
+def describe_columns_for_plan(df: pd.DataFrame) -> str:
+    # Only names, dtypes and the values of small categoricals, so the prompt stays tiny
+    lines = []
+    for name in df.columns:
+        series = df[name]
+        line = f"- {name} ({series.dtype})"
+        if not pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dropna().unique()
+            if len(values) <= MAX_PROMPT_VALUES:
+                line += f": values {[str(v) for v in values]}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def build_plan_prompt(query: str, df: pd.DataFrame, tables_context: str = "") -> Prompt:
+    # tables_context: the session's other tables, which the plan may join
+    return QUERY_PLAN.render(context=describe_columns_for_plan(df) + tables_context, query=query)
+
+
+def referenced_columns(plan: QueryPlan) -> list:
+    referenced = [f.column for f in plan.filters] + plan.group_by + plan.select
+    return referenced + [a.column for a in plan.aggregations if a.column is not None]
+
+
+def plan_columns(plan: QueryPlan, df: pd.DataFrame) -> list:
+    """Columns a plan needs, so a join gathers only those. Listing rows without a select needs the whole table."""
+    columns = referenced_columns(plan)
+    if not plan.select and not plan.group_by and not plan.aggregations:
+        columns = [str(name) for name in df.columns] + columns
+    if not plan.group_by and not plan.aggregations:
+        # Grouped plans sort by columns of their result, listed rows by any column
+        columns += [s.column for s in plan.sort]
+    # A bare row count still needs one column to count over
+    return list(dict.fromkeys(columns)) or [plan.joins[0].left_on]
+
+
+def validate_plan(plan: QueryPlan, df: pd.DataFrame):
+    columns = set(df.columns)
+    referenced = referenced_columns(plan)
+    unknown = [c for c in referenced if c not in columns]
+    if unknown:
+        raise QueryPlanError(f"Unknown columns in query plan: {unknown}")
+
+    for agg in plan.aggregations:
+        if agg.column is None and agg.func != "count":
+            raise QueryPlanError(f"Aggregation '{agg.func}' requires a column")
+        if agg.func in ("sum", "mean", "median", "std") and not pd.api.types.is_numeric_dtype(df[agg.column]):
+            raise QueryPlanError(f"Aggregation '{agg.func}' requires a numeric column, got '{agg.column}'")
+
+    sortable = sortable_columns(plan, df)
+    unknown_sort = [s.column for s in plan.sort if s.column not in sortable]
+    if unknown_sort:
+        raise QueryPlanError(f"Unknown sort columns in query plan: {unknown_sort}; sortable columns are {sorted(map(str, sortable))}")
+
+
+def sortable_columns(plan: QueryPlan, df: pd.DataFrame) -> set:
+    """Columns of a grouped plan's result, or every column when rows are listed (they are sorted before the select)."""
+    if plan.aggregations:
+        return set(plan.group_by) | {a.output_name for a in plan.aggregations}
+    if plan.group_by:
+        return set(plan.group_by) | {"count"}
+    return set(df.columns)
+
+
+def _coerce(series: pd.Series, value):
+    if isinstance(value, (list, tuple)):
+        return [_coerce(series, v) for v in value]
+    if value is None:
+        return value
+    try:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return pd.Timestamp(value)
+        if pd.api.types.is_numeric_dtype(series) and isinstance(value, str):
+            return pd.to_numeric(value)
+    except (ValueError, TypeError) as e:
+        raise QueryPlanError(f"Filter value {value!r} does not fit column '{series.name}' ({series.dtype})") from e
+    return value
+
+
+def _filter_mask(df: pd.DataFrame, f: Filter) -> np.ndarray:
+    series = df[f.column]
+    value = _coerce(series, f.value)
+    if f.op == "==":
+        return (series == value).to_numpy()
+    if f.op == "!=":
+        return (series != value).to_numpy()
+    if f.op == ">":
+        return (series > value).to_numpy()
+    if f.op == ">=":
+        return (series >= value).to_numpy()
+    if f.op == "<":
+        return (series < value).to_numpy()
+    if f.op == "<=":
+        return (series <= value).to_numpy()
+    if f.op in ("in", "not_in"):
+        values = value if isinstance(value, list) else [value]
+        mask = series.isin(values).to_numpy()
+        return mask if f.op == "in" else ~mask
+    if f.op == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            raise QueryPlanError(f"'between' on '{f.column}' needs a [low, high] value")
+        return series.between(value[0], value[1]).to_numpy()
+    if f.op == "contains":
+        return series.astype(str).str.contains(str(value), case=False, regex=False, na=False).to_numpy()
+    if f.op == "is_null":
+        return series.isna().to_numpy()
+    return series.notna().to_numpy()
+
+
+def execute_plan(df: pd.DataFrame, plan: QueryPlan) -> pd.DataFrame:
+    validate_plan(plan, df)
+
+    if plan.filters:
+        mask = np.ones(len(df), dtype=bool)
+        for f in plan.filters:
+            mask &= _filter_mask(df, f)
+        df = df[mask]
+
+    if plan.aggregations:
+        named = {}
+        for agg in plan.aggregations:
+            if agg.column is None:
+                # Row count: any column works as the target of "size"
+                named[agg.output_name] = pd.NamedAgg(column=df.columns[0], aggfunc="size")
+            else:
+                named[agg.output_name] = pd.NamedAgg(column=agg.column, aggfunc=agg.func)
+        if plan.group_by:
+            result = df.groupby(plan.group_by, observed=True, sort=False, dropna=False).agg(**named).reset_index()
+        else:
+            result = pd.DataFrame({
+                name: [len(df) if spec.aggfunc == "size" else df[spec.column].agg(spec.aggfunc)]
+                for name, spec in named.items()
+            })
+    elif plan.group_by:
+        result = df.groupby(plan.group_by, observed=True, sort=False, dropna=False).size().reset_index(name="count")
+    else:
+        # Listed rows are sorted before the select, so they can be ordered by a column not shown
+        result = _sorted(df, plan)
+        return (result[plan.select] if plan.select else result).head(plan.limit or DEFAULT_RESULT_LIMIT)
+
+    return _sorted(result, plan).head(plan.limit or DEFAULT_RESULT_LIMIT)
+
+
+def _sorted(df: pd.DataFrame, plan: QueryPlan) -> pd.DataFrame:
+    if not plan.sort:
+        return df
+    return df.sort_values([s.column for s in plan.sort], ascending=[s.ascending for s in plan.sort])
+
+
+def result_to_json(result: pd.DataFrame) -> dict:
+    # to_json handles numpy scalars, NaN and timestamps in one vectorized pass
+    payload = json.loads(result.to_json(orient="split", index=False, date_format="iso"))
+    return {"columns": payload["columns"], "rows": payload["data"]}
@@ -0,0 +1,514 @@
+from app.config.environment_config import settings
+from app.services.compaction_service import memory_by_column
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+import pyarrow as pa
+import pandas as pd
+import tempfile
+import threading
+import pickle
+import uuid
+import time
+import re
+import sys
+import os
+
+
+def estimate_bytes(value, seen: Optional[set] = None) -> int:
+    # seen: ids of DataFrames already counted (the active table is also in "tables")
+    seen = set() if seen is None else seen
+    if isinstance(value, pd.DataFrame):
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        return int(memory_by_column(value).sum() + value.index.memory_usage())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(v, seen) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(v, seen) for v in value)
+    return sys.getsizeof(value)
+
+
+class SessionStore:
+    """
+    Interface for session storage. Sessions are dicts holding at least
+    "dataframe" and "raw_text"; callers that grow a session in place should
+    store it again so its size is re-accounted.
+    """
+
+    def get(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def set(self, session_id: str, session_data: dict):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def metrics(self) -> dict:
+        raise NotImplementedError
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __getitem__(self, session_id: str) -> dict:
+        session_data = self.get(session_id)
+        if session_data is None:
+            raise KeyError(session_id)
+        return session_data
+
+    def __setitem__(self, session_id: str, session_data: dict):
+        self.set(session_id, session_data)
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store with idle TTL expiry and least-recently-used eviction
+    once the estimated resident size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # session_id -> [session_data, size, last_access]
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - last_access > self.ttl_seconds
+
+    def _remove(self, session_id: str):
+        _, size, _ = self._entries.pop(session_id)
+        self._resident_bytes -= size
+
+    def _evict(self, session_id: str, session_data: dict):
+        # Hook for backends that keep evicted sessions somewhere else
+        pass
+
+    def _miss(self, session_id: str) -> Optional[dict]:
+        return None
+
+    def _sweep(self, now: float):
+        expired = [sid for sid, (_, _, last_access) in self._entries.items() if self._expired(last_access, now)]
+        for sid in expired:
+            self._remove(sid)
+            self._counters["expirations"] += 1
+
+    def _enforce_capacity(self, keep: str):
+        for sid in list(self._entries):
+            if self._resident_bytes <= self.max_bytes:
+                break
+            if sid == keep:
+                continue
+            session_data = self._entries[sid][0]
+            self._remove(sid)
+            self._counters["evictions"] += 1
+            self._evict(sid, session_data)
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(session_id)
+            if entry is not None and self._expired(entry[2], now):
+                self._remove(session_id)
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                session_data = self._miss(session_id)
+                if session_data is not None:
+                    self.set(session_id, session_data)
+                return session_data
+            self._counters["hits"] += 1
+            entry[2] = now
+            self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def set(self, session_id: str, session_data: dict):
+        size = estimate_bytes(session_data)
+        with self._lock:
+            now = time.monotonic()
+            if session_id in self._entries:
+                self._remove(session_id)
+            self._entries[session_id] = [session_data, size, now]
+            self._resident_bytes += size
+            self._sweep(now)
+            self._enforce_capacity(keep=session_id)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "backend": type(self).__name__,
+                "resident_sessions": len(self._entries),
+                "resident_bytes": self._resident_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else None,
+                **self._counters,
+            }
+
+
+SAFE_SESSION_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class DiskSpillSessionStore(InMemorySessionStore):
+    """
+    In-memory LRU tier that spills evicted sessions to local disk instead of
+    dropping them. DataFrames are written as Arrow IPC files, everything else
+    that can be pickled goes to a sidecar file; both are reloaded on access.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, spill_dir: str):
+        super().__init__(max_bytes, ttl_seconds)
+        self.spill_dir = Path(spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self._counters.update({"spills": 0, "reloads": 0})
+
+    def _meta_path(self, session_id: str) -> Path:
+        return self.spill_dir / f"{session_id}.pkl"
+
+    def _frame_path(self, session_id: str, key: str) -> Path:
+        return self.spill_dir / f"{session_id}.{key}.arrow"
+
+    def _write_frame(self, df: pd.DataFrame, path: Path) -> tuple:
+        try:
+            # Arrow IPC needs string column names and a default index
+            frame = df.reset_index(drop=True)
+            frame.columns = [str(c) for c in frame.columns]
+            frame.to_feather(path)
+            return ("frame", list(df.columns))
+        except Exception:
+            return ("value", pickle.dumps(df))
+
+    def _spill_frame(self, session_id: str, key: str, df: pd.DataFrame, written: dict) -> tuple:
+        # A frame held under several keys is written once and referenced after that
+        if id(df) in written:
+            return ("same", written[id(df)])
+        written[id(df)] = key
+        return self._write_frame(df, self._frame_path(session_id, key))
+
+    def _load_frame(self, session_id: str, key: str, entry: tuple, loaded: dict):
+        kind, payload = entry
+        if kind == "same":
+            return loaded[payload]
+        if kind == "frame":
+            df = pd.read_feather(self._frame_path(session_id, key))
+            df.columns = payload
+            loaded[key] = df
+            return df
+        # Frames feather cannot write (e.g. mixed-type object columns) are pickled; "same" entries may point at them too
+        value = pickle.loads(payload)
+        loaded[key] = value
+        return value
+
+    def _evict(self, session_id: str, session_data: dict):
+        meta = {}
+        written = {}  # id(DataFrame) -> key it was written under
+        for key, value in session_data.items():
+            if isinstance(value, pd.DataFrame):
+                meta[key] = self._spill_frame(session_id, key, value, written)
+                continue
+            if key == "tables" and value is not None:
+                # Table names are user supplied, so files are named by position
+                meta[key] = ("tables", [
+                    (name, self._spill_frame(session_id, f"table{position}", df, written))
+                    for position, (name, df) in enumerate(value.items())
+                ])
+                continue
+            try:
+                meta[key] = ("value", pickle.dumps(value))
+            except Exception:
+                pass  # Transient state such as in-flight tasks is not spilled
+        with open(self._meta_path(session_id), "wb") as f:
+            pickle.dump(meta, f)
+        self._counters["spills"] += 1
+
+    def _remove_files(self, session_id: str):
+        for path in self.spill_dir.glob(f"{session_id}.*"):
+            path.unlink(missing_ok=True)
+
+    def _miss(self, session_id: str) -> Optional[dict]:
+        # Session ids arrive from clients, so never let one escape the spill directory
+        if not SAFE_SESSION_ID.fullmatch(session_id):
+            return None
+        meta_path = self._meta_path(session_id)
+        if not meta_path.exists():
+            return None
+        if self.ttl_seconds > 0 and time.time() - meta_path.stat().st_mtime > self.ttl_seconds:
+            self._remove_files(session_id)
+            self._counters["expirations"] += 1
+            return None
+        with open(meta_path, "rb") as f:
+            meta = pickle.load(f)
+        session_data = {}
+        loaded = {}
+        for key, (kind, payload) in meta.items():
+            if kind == "tables":
+                session_data[key] = {
+                    name: self._load_frame(session_id, f"table{position}", entry, loaded)
+                    for position, (name, entry) in enumerate(payload)
+                }
+            else:
+                session_data[key] = self._load_frame(session_id, key, (kind, payload), loaded)
+        self._remove_files(session_id)
+        self._counters["reloads"] += 1
+        return session_data
+
+    def delete(self, session_id: str):
+        with self._lock:
+            super().delete(session_id)
+            if SAFE_SESSION_ID.fullmatch(session_id):
+                self._remove_files(session_id)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            files = [p for p in self.spill_dir.iterdir() if p.is_file()]
+            return {
+                **super().metrics(),
+                "spilled_sessions": sum(1 for p in files if p.suffix == ".pkl"),
+                "spilled_bytes": sum(p.stat().st_size for p in files),
+            }
+
+
+# Derived per-process caches; cheap to rebuild, too large to re-pickle on every write
+LOCAL_ONLY_KEYS = ("cleaned", "aggregates", "joins")
+
+
+class SharedSessionStore(SessionStore):
+    """
+    Store shared by every worker process of one host (uvicorn --workers N).
+    DataFrames are written once as uncompressed Arrow IPC files, on tmpfs
+    when /dev/shm exists, and memory-mapped by each worker that reads them:
+    numeric, datetime and categorical-code columns are zero-copy views of
+    the shared pages. The other session fields go to one pickled meta file
+    per session that is replaced atomically, so the directory doubles as the
+    registry workers discover sessions through.
+
+    Each worker keeps the sessions it used recently and revalidates them
+    with one stat() per access; only a changed meta file is reloaded, and
+    frames already mapped are reused. When two workers write the same
+    session at once the last write wins.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, directory: str, local_entries: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.local_entries = local_entries
+        # session_id -> {"inode": of the meta file read, "data": session dict, "frames": {file name: DataFrame}}
+        self._local = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_sweep = 0.0
+        self._counters = {
+            "hits": 0, "misses": 0, "loads": 0, "reloads": 0, "writes": 0, "frames_written": 0,
+            "evictions": 0, "expirations": 0,
+        }
+
+    def _meta_path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.meta"
+
+    def _write_frame(self, df: pd.DataFrame, path: Path):
+        # Arrow IPC needs string column names and a default index
+        frame = df.reset_index(drop=True)
+        frame.columns = [str(c) for c in frame.columns]
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        # Written under a temporary name so no worker maps a half-written file
+        tmp = path.with_name(f".{path.name}.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+
+    def _map_frame(self, path: Path, columns: list) -> pd.DataFrame:
+        # No explicit close: the mapping lives as long as a column still references it
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        df = table.to_pandas(split_blocks=True)
+        df.columns = columns
+        return df
+
+    def _share_frame(self, session_id: str, df: pd.DataFrame, known: dict, written: dict) -> tuple:
+        # Frames this worker already wrote or mapped are referenced by file name
+        name = next((name for name, frame in known.items() if frame is df), None)
+        if name is None:
+            name = f"{session_id}.{uuid.uuid4().hex}.arrow"
+            try:
+                self._write_frame(df, self.directory / name)
+            except Exception:
+                return ("value", pickle.dumps(df))
+            self._counters["frames_written"] += 1
+        known[name] = df
+        written[name] = df
+        return ("frame", name, list(df.columns))
+
+    def _load_frame(self, entry: tuple, known: dict, loaded: dict):
+        kind, payload = entry[0], entry[1]
+        if kind == "value":
+            return pickle.loads(payload)
+        if payload not in loaded:
+            loaded[payload] = known[payload] if payload in known else self._map_frame(self.directory / payload, entry[2])
+        return loaded[payload]
+
+    def _remove_files(self, session_id: str):
+        for path in self.directory.glob(f"{session_id}.*"):
+            path.unlink(missing_ok=True)
+        self._local.pop(session_id, None)
+
+    def _sweep(self):
+        # Any worker expires and evicts for all of them, at most once a minute each
+        now = time.time()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        sessions = []
+        for meta_path in self.directory.glob("*.meta"):
+            session_id = meta_path.stem
+            try:
+                last_access = meta_path.stat().st_mtime
+                size = sum(p.stat().st_size for p in self.directory.glob(f"{session_id}.*"))
+            except FileNotFoundError:
+                continue
+            if self.ttl_seconds > 0 and now - last_access > self.ttl_seconds:
+                self._remove_files(session_id)
+                self._counters["expirations"] += 1
+                continue
+            sessions.append((last_access, session_id, size))
+        total = sum(size for _, _, size in sessions)
+        for _, session_id, size in sorted(sessions):
+            if total <= self.max_bytes:
+                break
+            self._remove_files(session_id)
+            total -= size
+            self._counters["evictions"] += 1
+
+    def _remember(self, session_id: str, entry: dict):
+        self._local[session_id] = entry
+        self._local.move_to_end(session_id)
+        while len(self._local) > self.local_entries:
+            self._local.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[dict]:
+        # Session ids arrive from clients, so never let one escape the shared directory
+        if not SAFE_SESSION_ID.fullmatch(session_id):
+            return None
+        meta_path = self._meta_path(session_id)
+        with self._lock:
+            try:
+                f = open(meta_path, "rb")
+            except FileNotFoundError:
+                self._local.pop(session_id, None)
+                self._counters["misses"] += 1
+                return None
+            with f:
+                st = os.fstat(f.fileno())
+                if self.ttl_seconds > 0 and time.time() - st.st_mtime > self.ttl_seconds:
+                    self._remove_files(session_id)
+                    self._counters["expirations"] += 1
+                    return None
+                # Idle time counts from the last access by any worker
+                os.utime(meta_path)
+                cached = self._local.get(session_id)
+                if cached is not None and cached["inode"] == st.st_ino:
+                    self._counters["hits"] += 1
+                    self._local.move_to_end(session_id)
+                    return cached["data"]
+                meta = pickle.load(f)
+
+            known = cached["frames"] if cached is not None else {}
+            loaded = {}
+            session_data = {}
+            for key, entry in meta.items():
+                if entry[0] == "tables":
+                    session_data[key] = {name: self._load_frame(e, known, loaded) for name, e in entry[1]}
+                else:
+                    session_data[key] = self._load_frame(entry, known, loaded)
+            if cached is not None:
+                # Another worker's write carries none of this worker's derived caches; they check data_version themselves
+                for key in LOCAL_ONLY_KEYS:
+                    if key in cached["data"]:
+                        session_data.setdefault(key, cached["data"][key])
+            self._remember(session_id, {"inode": st.st_ino, "data": session_data, "frames": loaded})
+            self._counters["loads" if cached is None else "reloads"] += 1
+            return session_data
+
+    def set(self, session_id: str, session_data: dict):
+        if not SAFE_SESSION_ID.fullmatch(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        with self._lock:
+            cached = self._local.get(session_id)
+            known = dict(cached["frames"]) if cached is not None else {}
+            written = {}  # file name -> DataFrame for every frame this version references
+            meta = {}
+            for key, value in session_data.items():
+                if key in LOCAL_ONLY_KEYS:
+                    continue
+                if isinstance(value, pd.DataFrame):
+                    meta[key] = self._share_frame(session_id, value, known, written)
+                elif key == "tables" and value is not None:
+                    meta[key] = ("tables", [
+                        (name, self._share_frame(session_id, df, known, written)) for name, df in value.items()
+                    ])
+                else:
+                    try:
+                        meta[key] = ("value", pickle.dumps(value))
+                    except Exception:
+                        pass  # Transient state such as in-flight tasks stays in this worker
+
+            meta_path = self._meta_path(session_id)
+            tmp = self.directory / f".{session_id}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(meta, f)
+            os.replace(tmp, meta_path)
+            # Readers that mapped a replaced frame keep their mapping after the unlink
+            for name in set(known) - set(written):
+                (self.directory / name).unlink(missing_ok=True)
+            self._counters["writes"] += 1
+            self._remember(session_id, {"inode": os.stat(meta_path).st_ino, "data": session_data, "frames": written})
+            self._sweep()
+
+    def delete(self, session_id: str):
+        if not SAFE_SESSION_ID.fullmatch(session_id):
+            return
+        with self._lock:
+            self._remove_files(session_id)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            files = [p for p in self.directory.iterdir() if p.is_file()]
+            lookups = sum(self._counters[name] for name in ("hits", "misses", "loads", "reloads"))
+            return {
+                "backend": type(self).__name__,
+                "directory": str(self.directory),
+                "worker_pid": os.getpid(),
+                "local_sessions": len(self._local),
+                "shared_sessions": sum(1 for p in files if p.suffix == ".meta"),
+                "shared_bytes": sum(p.stat().st_size for p in files),
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else None,
+                **self._counters,
+            }
+
+
+def shared_session_dir() -> str:
+    # tmpfs keeps the shared frames in memory; elsewhere the page cache does
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "query_and_chart_sessions")
+
+
+def create_session_store() -> SessionStore:
+    if settings.SESSION_BACKEND == "shared":
+        directory = settings.SESSION_SHARED_DIR or shared_session_dir()
+        return SharedSessionStore(settings.SESSION_MAX_BYTES, settings.SESSION_TTL_SECONDS, directory, settings.SESSION_LOCAL_ENTRIES)
+    if settings.SESSION_BACKEND == "disk":
+        spill_dir = settings.SESSION_SPILL_DIR or os.path.join(tempfile.gettempdir(), "query_and_chart_sessions")
+        return DiskSpillSessionStore(settings.SESSION_MAX_BYTES, settings.SESSION_TTL_SECONDS, spill_dir)
+    return InMemorySessionStore(settings.SESSION_MAX_BYTES, settings.SESSION_TTL_SECONDS)
+
+
+session_store = create_session_store()
@@ -0,0 +1,110 @@
+from app.config.environment_config import settings
+from collections import Counter
+import numpy as np
+import math
+import re
+
+
+# Separator between pages in the text of PDF sessions
+PAGE_BREAK = "\f"
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN.findall(text.lower())
+
+
+def chunk_text(text: str, chunk_chars: int = None, overlap_chars: int = None, first_page: int = 1) -> list:
+    """
+    Split a document into word-aligned chunks of about chunk_chars characters
+    that never cross a page break. Consecutive chunks share about
+    overlap_chars characters so a passage cut at a boundary is whole in one.
+    first_page numbers the pages of text appended to an earlier document.
+    """
+    chunk_chars = chunk_chars or settings.TEXT_CHUNK_CHARS
+    overlap_chars = settings.TEXT_CHUNK_OVERLAP_CHARS if overlap_chars is None else overlap_chars
+    chunks = []
+    for page_number, page in enumerate(text.split(PAGE_BREAK), start=first_page):
+        words = page.split()
+        start = 0
+        while start < len(words):
+            end, size = start + 1, len(words[start])
+            while end < len(words) and size + len(words[end]) + 1 <= chunk_chars:
+                size += len(words[end]) + 1
+                end += 1
+            chunks.append({"page": page_number, "text": " ".join(words[start:end])})
+            if end == len(words):
+                break
+            back, size = end, 0
+            while back > start + 1 and size + len(words[back - 1]) + 1 <= overlap_chars:
+                back -= 1
+                size += len(words[back]) + 1
+            start = back
+    return chunks
+
+
+class TextIndex:
+    """
+    Okapi BM25 index over text chunks. Postings are NumPy arrays per term so
+    a query only touches the chunks that contain its terms.
+    """
+
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        postings = {}  # term -> ([chunk ids], [term frequencies])
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for position, chunk in enumerate(chunks):
+            tokens = tokenize(chunk["text"])
+            lengths[position] = len(tokens)
+            for term, frequency in Counter(tokens).items():
+                ids, frequencies = postings.setdefault(term, ([], []))
+                ids.append(position)
+                frequencies.append(frequency)
+        self.postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(frequencies, dtype=np.float32))
+            for term, (ids, frequencies) in postings.items()
+        }
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if len(chunks) else 0.0
+
+    def extended(self, chunks: list) -> "TextIndex":
+        """
+        A new index over this index's chunks followed by `chunks`. Postings and
+        chunk lengths are additive, so only the new chunks are tokenized; this
+        index is left as it is for searches still using it.
+        """
+        added = TextIndex(chunks, self.k1, self.b)
+        merged = TextIndex([], self.k1, self.b)
+        merged.chunks = self.chunks + chunks
+        offset = len(self.chunks)
+        postings = dict(self.postings)
+        for term, (ids, frequencies) in added.postings.items():
+            ids = ids + offset
+            if term in postings:
+                ids = np.concatenate([postings[term][0], ids])
+                frequencies = np.concatenate([postings[term][1], frequencies])
+            postings[term] = (ids, frequencies)
+        merged.postings = postings
+        merged.lengths = np.concatenate([self.lengths, added.lengths])
+        merged.average_length = float(merged.lengths.mean()) if len(merged.chunks) else 0.0
+        return merged
+
+    def search(self, query: str, k: int) -> list:
+        """Positions of the k best matching chunks, best first; chunks sharing no term with the query are left out."""
+        if not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, frequencies = posting
+            idf = math.log(1 + (len(self.chunks) - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[ids] / self.average_length)
+            scores[ids] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        return matched[np.argsort(-scores[matched], kind="stable")].tolist()
@@ -0,0 +1,81 @@
+from fastapi.responses import JSONResponse, Response
+from typing import Any, List
+import numpy as np
+import pandas as pd
+import orjson
+
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _orjson_default(obj):
+    # Reached only for what orjson cannot encode natively, e.g. object-dtype label arrays
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.to_numpy().tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ORJSONNumpyResponse(JSONResponse):
+    """
+    JSON response rendered by orjson with NumPy arrays serialized directly.
+    Return it from the route itself so FastAPI's jsonable_encoder is skipped.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+def wants_arrow(accept: str) -> bool:
+    return bool(accept) and ARROW_STREAM_MEDIA_TYPE in accept
+
+
+def charts_to_arrow_stream(charts: List[dict]) -> bytes:
+    """
+    Encode chart series as a single Arrow IPC stream in long format: one row
+    per point with a "chart" index column, and whichever of label / x / y /
+    count the chart has. Per-chart metadata travels as JSON in the schema
+    metadata. Numeric arrays are handed to Arrow without copying.
+    """
+    import pyarrow as pa
+
+    column_map = {"labels": "label", "values": "y", "x": "x", "y": "y", "count": "count"}
+    tables = []
+    for index, chart in enumerate(charts):
+        columns = {}
+        for key, values in chart["data"].items():
+            name = column_map.get(key)
+            if name is None:
+                continue
+            array = np.asarray(values)
+            if name == "label":
+                array = array.astype(str)
+            elif name != "count":
+                array = array.astype(np.float64, copy=False)
+            columns[name] = pa.array(array)
+        length = len(next(iter(columns.values()))) if columns else 0
+        tables.append(pa.table({"chart": pa.array(np.full(length, index, dtype=np.int16)), **columns}))
+
+    table = pa.concat_tables(tables, promote_options="default") if tables else pa.table({"chart": pa.array([], pa.int16())})
+    metadata = [{"chart_type": chart["chart_type"], "metadata": chart["metadata"]} for chart in charts]
+    table = table.replace_schema_metadata({"charts": orjson.dumps(metadata, default=_orjson_default)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def chart_response(payload: dict, accept: str = None) -> Response:
+    if "charts" in payload and wants_arrow(accept):
+        return Response(content=charts_to_arrow_stream(payload["charts"]), media_type=ARROW_STREAM_MEDIA_TYPE)
+    return ORJSONNumpyResponse(payload)
@@ -0,0 +1,57 @@
+"""
+Bar/pie charts and filtered drilldowns with and without the per-session
+aggregate index, plus the time and memory it takes to build the index.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_aggregates --rows 100000 1000000
+"""
+import argparse
+import os
+
+from benchmarks.datasets import make_dataset
+from benchmarks.bench_charts import timed
+
+
+PLAN = [
+    ("bar", ["region", "revenue"]),
+    ("bar", ["region", "units"]),
+    ("pie", ["region"]),
+    ("bar", ["product", "revenue"]),
+    ("pie", ["product"]),
+    ("bar", ["units", "revenue"]),
+]
+DRILLDOWN = ("product", "revenue", {"region": ["North", "West"]})
+
+
+def main(rows_list, repeat: int):
+    from app.services.compaction_service import compact_dataframe
+    from app.services.aggregate_service import build_aggregate_index, session_aggregates
+    from app.services.preprocessing_service import prepare_columns
+    from app.services.chart_service import compute_charts, compute_drilldown
+
+    for rows in rows_list:
+        df, _ = compact_dataframe(make_dataset(rows))
+        index = build_aggregate_index(df, "bench")
+        session_data = {"dataframe": df, "data_version": "bench", "aggregates": index}
+        frame, _ = prepare_columns(session_data, ["region", "product", "units", "revenue"])
+        view = session_aggregates(session_data)
+        key, measure, filters = DRILLDOWN
+        print({
+            "rows": rows,
+            "index_build_seconds": index.stats["seconds"],
+            "index_bytes": index.stats["bytes"],
+            "charts_ms": timed(lambda: compute_charts(frame, PLAN, parallel=False), repeat),
+            "charts_indexed_ms": timed(lambda: compute_charts(frame, PLAN, parallel=False, aggregates=view), repeat),
+            "drilldown_ms": timed(lambda: compute_drilldown(frame, key, measure, filters), repeat),
+            "drilldown_indexed_ms": timed(lambda: compute_drilldown(frame, key, measure, filters, view), repeat),
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    main(args.rows, args.repeat)
@@ -0,0 +1,93 @@
+"""
+Cost of adding a day's rows to a session: re-uploading the whole export
+(parse + compact everything) versus appending only the new file, and versus
+sending the whole export again with new_rows_only (skips the known rows).
+The append timings include updating the cached charts of a 6-chart plan.
+Also times extending the aggregate index by the new rows against
+rebuilding it over the combined frame.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_append --rows 1000000 --new-rows 10000
+"""
+import argparse
+import io
+import os
+import time
+
+from benchmarks.datasets import make_dataset
+from benchmarks.bench_charts import PLAN
+
+
+def timed(compute, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = compute()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 1), result
+
+
+def main(rows: int, new_rows: int, repeat: int):
+    from app.services.ingest_service import read_csv_stream
+    from app.services.compaction_service import compact_dataframe
+    from app.services.cache_service import chart_data_cache, dataset_fingerprint
+    from app.services.chart_service import compute_charts
+    from app.services.append_service import append_rows
+    from app.services.aggregate_service import build_aggregate_index, extend_aggregate_index
+    from app.services.compaction_service import append_frame
+
+    df = make_dataset(rows + new_rows)
+    full_csv = df.to_csv(index=False).encode("utf-8")
+    delta_csv = df.iloc[rows:].to_csv(index=False).encode("utf-8")
+    session_df, _ = compact_dataframe(df.iloc[:rows].reset_index(drop=True))
+
+    def session_with_charts() -> dict:
+        chart_data_cache.clear()
+        session_data = {"dataframe": session_df}
+        fingerprint = dataset_fingerprint(session_data)
+        for (chart_type, cols), chart in zip(PLAN, compute_charts(session_df, PLAN)):
+            chart_data_cache.set((fingerprint, chart_type, tuple(cols), 2000, "sample"), chart)
+        return session_data
+
+    def reupload():
+        parsed = read_csv_stream(io.BytesIO(full_csv), 0)
+        return compact_dataframe(parsed)[0]
+
+    def append(payload: bytes, skip_rows: int):
+        session_data = session_with_charts()
+        start = time.perf_counter()
+        parsed = read_csv_stream(io.BytesIO(payload), 0, skip_rows)
+        _, stats = append_rows(session_data, parsed)
+        return time.perf_counter() - start, stats
+
+    reupload_ms, _ = timed(reupload, repeat)
+    # Time only the append itself, not setting up the session and its chart cache
+    append_ms = round(min(append(delta_csv, 0)[0] for _ in range(repeat)) * 1000, 1)
+    refresh_ms = round(min(append(full_csv, rows)[0] for _ in range(repeat)) * 1000, 1)
+    _, stats = append(delta_csv, 0)
+
+    index = build_aggregate_index(session_df, "old")
+    combined, changed = append_frame(session_df, read_csv_stream(io.BytesIO(delta_csv), 0))
+    extend_ms, _ = timed(lambda: extend_aggregate_index(index, combined, rows, changed, "new"), repeat)
+    rebuild_ms, _ = timed(lambda: build_aggregate_index(combined, "new"), repeat)
+    print({
+        "rows": rows,
+        "new_rows": new_rows,
+        "full_reupload_ms": reupload_ms,
+        "append_new_file_ms": append_ms,
+        "append_full_export_new_rows_only_ms": refresh_ms,
+        "charts_carried_forward": stats["charts_carried_forward"],
+        "index_extend_ms": extend_ms,
+        "index_rebuild_ms": rebuild_ms,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--new-rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    main(args.rows, args.new_rows, args.repeat)
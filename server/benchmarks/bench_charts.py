@@ -0,0 +1,59 @@
+"""
+Time to compute a typical 6-chart plan over overlapping columns: one chart at a
+time (each chart factorizes its own columns) versus the batch engine, serial
+and on the chart thread pool.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_charts --rows 100000 1000000
+"""
+import argparse
+import os
+import time
+
+from benchmarks.datasets import make_dataset
+
+
+PLAN = [
+    ("bar", ["region", "revenue"]),
+    ("bar", ["region", "units"]),
+    ("pie", ["region"]),
+    ("bar", ["product", "revenue"]),
+    ("line", ["date", "revenue"]),
+    ("scatter", ["units", "revenue"]),
+]
+
+
+def timed(compute, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compute()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 1)
+
+
+def main(rows_list, repeat: int, compact: bool):
+    from app.services.chart_service import compute_chart, compute_charts
+    from app.services.compaction_service import compact_dataframe
+
+    for rows in rows_list:
+        df = make_dataset(rows)
+        if compact:
+            df, _ = compact_dataframe(df)
+        print({
+            "rows": rows,
+            "per_chart_ms": timed(lambda: [compute_chart(df, chart_type, cols) for chart_type, cols in PLAN], repeat),
+            "batch_serial_ms": timed(lambda: compute_charts(df, PLAN, parallel=False), repeat),
+            "batch_parallel_ms": timed(lambda: compute_charts(df, PLAN), repeat),
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-compact", action="store_true", help="Benchmark the raw parsed frame instead of the compacted one")
+    args = parser.parse_args()
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    main(args.rows, args.repeat, not args.no_compact)
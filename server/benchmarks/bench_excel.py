@@ -0,0 +1,71 @@
+"""
+Excel ingestion time per engine: the first sheet, every sheet (serial and
+on the parse process pool) and a preview of the first rows.
+
+Workbooks are generated with benchmarks.datasets.write_xlsx and cached in
+--data-dir. The calamine engine needs the optional
+python-calamine package.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_excel --rows 50000 --sheets 4
+"""
+import argparse
+import importlib.util
+import os
+import time
+
+from benchmarks.datasets import write_xlsx
+
+def timed(read, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 1)
+
+
+def main(rows: int, sheets: int, preview_rows: int, repeat: int, data_dir: str):
+    from app.config.environment_config import settings
+    from app.services.ingest_service import read_excel_tables, parse_pool, shutdown_parse_pool
+
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_{rows}x{sheets}.xlsx")
+    if not os.path.exists(path):
+        write_xlsx(path, rows, sheets)
+
+    def read(**options):
+        with open(path, "rb") as f:
+            return read_excel_tables(f, 0, **options)
+
+    engines = ["openpyxl"] + (["calamine"] if importlib.util.find_spec("python_calamine") else [])
+    workers = settings.PARSE_PROCESSES
+    try:
+        if workers > 1:
+            # Start the worker processes outside the timings
+            list(parse_pool().map(abs, range(workers)))
+        for engine in engines:
+            settings.EXCEL_ENGINE = engine
+            result = {"engine": engine, "rows_per_sheet": rows, "sheets": sheets, "file_mb": round(os.path.getsize(path) / 1024 ** 2, 1)}
+            result["first_sheet_ms"] = timed(lambda: read(), repeat)
+            settings.PARSE_PROCESSES = 1
+            result["all_sheets_serial_ms"] = timed(lambda: read(all_sheets=True), repeat)
+            settings.PARSE_PROCESSES = workers
+            result[f"all_sheets_{workers}_processes_ms"] = timed(lambda: read(all_sheets=True), repeat)
+            result[f"preview_{preview_rows}_rows_ms"] = timed(lambda: read(nrows=preview_rows), repeat)
+            print(result)
+    finally:
+        shutdown_parse_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--preview-rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--data-dir", default="/tmp/bench_excel")
+    args = parser.parse_args()
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    main(args.rows, args.sheets, args.preview_rows, args.repeat, args.data_dir)
@@ -0,0 +1,91 @@
+"""
+Peak RSS and wall time of CSV ingestion: the old read().decode() + StringIO path
+versus the streaming pipeline in app.services.ingest_service.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_ingest --sizes-mb 10 100 1000
+
+Every measurement runs in a fresh subprocess so peak RSS is not polluted by
+earlier runs. Generated CSVs are cached in --data-dir.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+
+
+def write_csv(path: str, target_mb: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    rows_per_chunk = 100_000
+    first = True
+    while not os.path.exists(path) or os.path.getsize(path) < target_mb * 1024 ** 2:
+        chunk = pd.DataFrame({
+            "order_id": rng.integers(0, 10 ** 9, size=rows_per_chunk),
+            "region": rng.choice(["North", "South", "East", "West"], size=rows_per_chunk),
+            "product": rng.choice([f"Product {i}" for i in range(200)], size=rows_per_chunk),
+            "date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, size=rows_per_chunk), unit="D")).strftime("%Y-%m-%d"),
+            "units": rng.integers(1, 50, size=rows_per_chunk),
+            "revenue": rng.gamma(2.0, 150.0, size=rows_per_chunk).round(2),
+        })
+        chunk.to_csv(path, mode="w" if first else "a", header=first, index=False)
+        first = False
+
+
+def measure(engine: str, path: str) -> dict:
+    import resource
+    import time
+
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    from app.config.environment_config import settings
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        if engine == "baseline":
+            import io
+            df = pd.read_csv(io.StringIO(f.read().decode("utf-8")))
+        elif engine == "chunked":
+            from app.services.ingest_service import read_csv_chunked
+            df = read_csv_chunked(f, 0)
+        else:
+            from app.services.ingest_service import read_csv_stream
+            df = read_csv_stream(f, 0)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "engine": engine,
+        "file_mb": round(os.path.getsize(path) / 1024 ** 2, 1),
+        "rows": len(df),
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(len(df) / elapsed),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def main(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    for size in args.sizes_mb:
+        path = os.path.join(args.data_dir, f"ingest_{size}mb.csv")
+        write_csv(path, size)
+        for engine in args.engines:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_ingest", "--measure", engine, path],
+                capture_output=True, text=True, check=True,
+            )
+            print(json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--engines", nargs="+", default=["baseline", "chunked", "stream"])
+    parser.add_argument("--data-dir", default=os.path.join("benchmarks", ".data"))
+    parser.add_argument("--measure", nargs=2, metavar=("ENGINE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+    else:
+        main(args)
@@ -0,0 +1,76 @@
+"""
+Cross-table joins as chart and query plans run them: --rows orders joined
+with --customers customers on customer_id, charting revenue by
+customers.segment. Compares a pandas merge of the whole tables, a merge of
+only the needed columns, and join_service cold (keys factorized on first
+use) and warm (keys cached on the session), with the size of each result.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_joins --rows 1000000 --customers 100000
+"""
+import argparse
+import os
+import time
+
+from benchmarks.datasets import make_customers, make_dataset, with_customers
+
+
+def best_of(compute, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = compute()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(rows: int, customers: int, repeat: int):
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    from app.schemas.join import Join
+    from app.services.compaction_service import compact_dataframe
+    from app.services.join_service import join_tables
+
+    orders, _ = compact_dataframe(with_customers(make_dataset(rows), customers))
+    customer_table, _ = compact_dataframe(make_customers(customers))
+    joins = [Join(table="customers", left_on="customer_id", right_on="customer_id", how="left")]
+    columns = ["revenue", "customers.segment"]
+
+    def session():
+        return {
+            "dataframe": orders,
+            "tables": {"orders": orders, "customers": customer_table},
+            "active_table": "orders",
+            "table_versions": {"orders": "bench", "customers": "bench"},
+        }
+
+    def megabytes(df) -> float:
+        return round(float(df.memory_usage(deep=True).sum()) / 1024 ** 2, 1)
+
+    full, merged = best_of(lambda: orders.merge(customer_table, on="customer_id", how="left"), repeat)
+    print({"name": "pandas_merge_full", "ms": round(full * 1000, 1), "result_mb": megabytes(merged)})
+
+    projected, merged = best_of(
+        lambda: orders[["customer_id", "revenue"]].merge(customer_table[["customer_id", "segment"]], on="customer_id", how="left"),
+        repeat,
+    )
+    print({"name": "pandas_merge_projected", "ms": round(projected * 1000, 1), "result_mb": megabytes(merged)})
+
+    base = orders[["revenue"]]
+    cold, (frame, report) = best_of(lambda: join_tables(session(), joins, columns, base), repeat)
+    print({"name": "join_cold", "ms": round(cold * 1000, 1), "result_mb": megabytes(frame), "unmatched": report["joins"][0]["unmatched"]})
+
+    warm_session = session()
+    join_tables(warm_session, joins, columns, base)
+    warm, (frame, report) = best_of(lambda: join_tables(warm_session, joins, columns, base), repeat)
+    print({"name": "join_warm", "ms": round(warm * 1000, 1), "result_mb": megabytes(frame), "cached": report["cached"]})
+    print({"speedup_vs_full_merge": round(full / warm, 1), "speedup_vs_projected_merge": round(projected / warm, 1)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.rows, args.customers, args.repeat)
@@ -0,0 +1,116 @@
+"""
+Latency benchmark for the async LLM client layer against the fake provider.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_llm_client --sessions 200 --requests 5
+
+Starts benchmarks.fake_llm_server on a local port, points both providers at
+it and reports p50/p99 latency and throughput per provider and for auto
+routing. With --gemini-latency-ms / --gemini-failure-rate Gemini gets its own
+fake server on port + 1, to see auto routing and hedging around a degraded
+provider:
+    python -m benchmarks.bench_llm_client --gemini-latency-ms 1500 --gemini-failure-rate 0.3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_fake_server(port: int, latency_ms: float, failure_rate: float) -> subprocess.Popen:
+    env = dict(os.environ, FAKE_LLM_LATENCY_MS=str(latency_ms), FAKE_LLM_FAILURE_RATE=str(failure_rate))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_llm_server:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    time.sleep(2)
+    return proc
+
+
+async def run_provider(model, sessions: int, requests_per_session: int):
+    from app.services.llm_service import query_llm
+
+    latencies = []
+    failures = 0
+
+    async def session():
+        nonlocal failures
+        for _ in range(requests_per_session):
+            start = time.perf_counter()
+            try:
+                await query_llm("benchmark prompt", model)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "model": model.value,
+        "requests": len(latencies),
+        "failures": failures,
+        "p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies), 1) if latencies else None,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+async def main(args):
+    from app.config.llm_models import ModelName
+    from app.services.llm_service import close_providers, llm_metrics
+
+    try:
+        for model in (ModelName.chatgpt, ModelName.gemini, ModelName.auto):
+            print(await run_provider(model, args.sessions, args.requests))
+        metrics = llm_metrics()
+        print({"routing": metrics["routing"], "breakers": {name: p["state"] for name, p in metrics["providers"].items()}})
+    finally:
+        await close_providers()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=None)
+    parser.add_argument("--gemini-failure-rate", type=float, default=None)
+    args = parser.parse_args()
+
+    separate_gemini = args.gemini_latency_ms is not None or args.gemini_failure_rate is not None
+    base = f"http://127.0.0.1:{args.port}"
+    gemini_base = f"http://127.0.0.1:{args.port + 1}" if separate_gemini else base
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{base}/v1",
+        "GEMINI_BASE_URL": gemini_base,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake"),
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "fake"),
+        "OPENAI_LLM_MODEL": os.getenv("OPENAI_LLM_MODEL", "fake-gpt"),
+        "GEMINI_LLM_MODEL": os.getenv("GEMINI_LLM_MODEL", "fake-gemini"),
+    })
+    servers = [start_fake_server(args.port, args.latency_ms, args.failure_rate)]
+    if separate_gemini:
+        servers.append(start_fake_server(
+            args.port + 1,
+            args.gemini_latency_ms if args.gemini_latency_ms is not None else args.latency_ms,
+            args.gemini_failure_rate if args.gemini_failure_rate is not None else args.failure_rate,
+        ))
+    try:
+        asyncio.run(main(args))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,78 @@
+"""
+PDF ingestion and question prompts for 10/100/1000-page documents: page text
+extraction serial versus on the worker processes, chunk index build time,
+and the context sent to the LLM for a question, whole document versus the
+retrieved chunks.
+
+Test PDFs are written with benchmarks.datasets.write_pdf (plain Helvetica
+text pages) and cached in --data-dir.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_pdf --pages 10 100 1000
+"""
+import argparse
+import os
+import time
+
+from benchmarks.datasets import write_pdf
+
+
+QUESTION = "What did the audit say about warranty compliance?"
+
+
+def main(pages_list, data_dir: str):
+    from app.config.environment_config import settings
+    from app.config.llm_models import ModelName
+    from app.services.ingest_service import read_pdf_text, shutdown_parse_pool
+    from app.services.text_search_service import TextIndex, chunk_text
+    from app.services.context_service import build_retrieved_context, estimate_tokens
+
+    os.makedirs(data_dir, exist_ok=True)
+    workers = settings.PARSE_PROCESSES
+    try:
+        for pages in pages_list:
+            path = os.path.join(data_dir, f"bench_{pages}p.pdf")
+            if not os.path.exists(path):
+                write_pdf(path, pages)
+
+            timings = {}
+            for label, pool_workers in (("serial", 1), ("parallel", workers)):
+                settings.PARSE_PROCESSES = pool_workers
+                # Best of two, so the parallel figure excludes starting the worker processes
+                best = float("inf")
+                for _ in range(2):
+                    with open(path, "rb") as f:
+                        start = time.perf_counter()
+                        text = read_pdf_text(f, 0)
+                        best = min(best, time.perf_counter() - start)
+                timings[f"extract_{label}_ms"] = round(best * 1000, 1)
+            settings.PARSE_PROCESSES = workers
+
+            start = time.perf_counter()
+            index = TextIndex(chunk_text(text))
+            timings["index_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            context = build_retrieved_context(text, index, QUESTION, ModelName.chatgpt, settings.TEXT_TOP_K_CHUNKS)
+            timings["retrieve_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            print({
+                "pages": pages,
+                "file_mb": round(os.path.getsize(path) / 1024 ** 2, 2),
+                "workers": workers,
+                **timings,
+                "chunks": len(index.chunks),
+                "whole_document_tokens": estimate_tokens(text),
+                "retrieved_context_tokens": estimate_tokens(context),
+            })
+    finally:
+        shutdown_parse_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--data-dir", default="/tmp/bench_pdf")
+    args = parser.parse_args()
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    main(args.pages, args.data_dir)
@@ -0,0 +1,74 @@
+"""
+Cached input tokens and cost for a series of questions about one dataset,
+with the old single-message prompt layout versus system / context / question
+sent as separate messages.
+
+Runs against benchmarks.fake_llm_server, whose usage numbers come from a
+simulated prefix cache (see its docstring). That checks the request layout
+and the accounting end to end; real hit rates depend on the provider.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_prompt_cache --questions 10
+"""
+import argparse
+import asyncio
+import os
+
+from benchmarks.bench_llm_client import start_fake_server
+from benchmarks.datasets import make_dataset
+
+
+QUESTIONS = [
+    "Which region has the highest revenue?",
+    "How many orders were placed in March?",
+    "What is the average number of units per order?",
+    "Which product sells best in the West?",
+    "Is revenue trending up over the year?",
+]
+
+
+async def main(questions: int, rows: int):
+    from app.config.llm_models import PROVIDER_MODELS
+    from app.config.prompts import Prompt, QUERY_ANSWER
+    from app.services.context_service import build_dataset_context
+    from app.services.llm_service import query_llm, close_providers, llm_metrics
+
+    df = make_dataset(rows)
+    try:
+        for model in PROVIDER_MODELS:
+            context = build_dataset_context(df, model)
+            for index in range(questions):
+                prompt = QUERY_ANSWER.render(context=context, query=QUESTIONS[index % len(QUESTIONS)])
+                # What the services sent before: everything glued into one user message
+                legacy = Prompt("legacy_single_message", "\n\n".join((prompt.system, prompt.context, prompt.user)))
+                await query_llm(legacy, model)
+                await query_llm(prompt, model)
+        for prompt_name, providers in llm_metrics()["usage"]["by_prompt"].items():
+            for provider, totals in providers.items():
+                print({"prompt": prompt_name, "provider": provider, **totals})
+    finally:
+        await close_providers()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{base}/v1",
+        "GEMINI_BASE_URL": base,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake"),
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "fake"),
+        "OPENAI_LLM_MODEL": os.getenv("OPENAI_LLM_MODEL", "fake-gpt"),
+        "GEMINI_LLM_MODEL": os.getenv("GEMINI_LLM_MODEL", "fake-gemini"),
+    })
+    server = start_fake_server(args.port, latency_ms=20, failure_rate=0.0)
+    try:
+        asyncio.run(main(args.questions, args.rows))
+    finally:
+        server.terminate()
+        server.wait()
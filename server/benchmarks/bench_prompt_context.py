@@ -0,0 +1,40 @@
+"""
+Prompt size and build time of the dataset context versus the old df.to_string() dump.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_prompt_context --rows 1000 10000 100000 200000
+"""
+import argparse
+import os
+import time
+
+from benchmarks.datasets import make_dataset
+
+
+def main(rows_list, include_to_string: bool):
+    from app.config.llm_models import ModelName
+    from app.services.context_service import build_dataset_context
+
+    for rows in rows_list:
+        df = make_dataset(rows)
+        result = {"rows": rows}
+        for model in ModelName:
+            start = time.perf_counter()
+            context = build_dataset_context(df, model)
+            result[f"{model.value}_bytes"] = len(context.encode("utf-8"))
+            result[f"{model.value}_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if include_to_string:
+            start = time.perf_counter()
+            result["to_string_bytes"] = len(df.to_string(index=False).encode("utf-8"))
+            result["to_string_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 200000])
+    parser.add_argument("--skip-to-string", action="store_true", help="Skip the slow baseline measurement")
+    args = parser.parse_args()
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    main(args.rows, not args.skip_to_string)
@@ -0,0 +1,74 @@
+"""
+Encode time and payload size of a line + scatter chart response:
+FastAPI's default path (jsonable_encoder + json.dumps on lists), orjson on
+lists, orjson on the NumPy arrays directly, and an Arrow IPC stream.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_serialization --points 10000 100000 1000000
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+
+
+def make_charts(points: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", periods=points, freq="min")
+    return {"charts": [
+        {
+            "chart_type": "line",
+            "data": {"labels": dates.astype(str).to_numpy(), "values": rng.normal(size=points).cumsum()},
+            "metadata": {"x_label": "date", "y_label": "value", "title": "value over date"},
+        },
+        {
+            "chart_type": "scatter",
+            "data": {"x": rng.normal(size=points), "y": rng.normal(size=points).astype(np.float32)},
+            "metadata": {"x_label": "a", "y_label": "b", "title": "b vs a"},
+        },
+    ]}
+
+
+def as_lists(payload: dict) -> dict:
+    return {"charts": [
+        {**chart, "data": {key: np.asarray(values).tolist() for key, values in chart["data"].items()}}
+        for chart in payload["charts"]
+    ]}
+
+
+def timed(encode, repeat: int):
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 1), len(body)
+
+
+def main(points_list, repeat: int):
+    from fastapi.encoders import jsonable_encoder
+    from app.utils.responses import ORJSONNumpyResponse, charts_to_arrow_stream
+    import orjson
+
+    for points in points_list:
+        payload = make_charts(points)
+        encoders = {
+            # tolist() is part of the old cost, the chart service used to do it
+            "fastapi_json": lambda: json.dumps(jsonable_encoder(as_lists(payload))).encode("utf-8"),
+            "orjson_lists": lambda: orjson.dumps(as_lists(payload)),
+            "orjson_numpy": lambda: ORJSONNumpyResponse(payload).body,
+            "arrow_ipc": lambda: charts_to_arrow_stream(payload["charts"]),
+        }
+        result = {"points": points}
+        for name, encode in encoders.items():
+            result[f"{name}_ms"], result[f"{name}_bytes"] = timed(encode, repeat)
+        print(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.points, args.repeat)
@@ -0,0 +1,89 @@
+"""
+Provider calls, tokens and cost for bursts of identical LLM requests, with
+and without single-flight coalescing: --bursts times, --clients concurrent
+callers ask the same question about the same dataset at once, as when a
+dashboard loads.
+
+Runs against benchmarks.fake_llm_server, started on --port.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_single_flight --clients 20 --bursts 10
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.bench_llm_client import start_fake_server
+from benchmarks.datasets import make_dataset
+
+
+async def run(clients: int, bursts: int, single_flight: bool) -> dict:
+    from app.config.environment_config import settings
+    from app.config.llm_models import ModelName
+    from app.config.prompts import QUERY_ANSWER
+    from app.services.context_service import build_dataset_context
+    from app.services.llm_service import query_llm, usage_tracker
+
+    settings.LLM_SINGLE_FLIGHT = single_flight
+    usage_tracker.totals.clear()
+    context = build_dataset_context(make_dataset(20000), ModelName.chatgpt)
+    latencies = []
+
+    async def client(prompt):
+        start = time.perf_counter()
+        await query_llm(prompt, ModelName.chatgpt)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for burst in range(bursts):
+        prompt = QUERY_ANSWER.render(context=context, query=f"Which region has the highest revenue? ({burst})")
+        await asyncio.gather(*(client(prompt) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    totals = list(usage_tracker.totals.values())
+    latencies.sort()
+    return {
+        "single_flight": single_flight,
+        "requests": clients * bursts,
+        "provider_calls": sum(t["requests"] for t in totals),
+        "input_tokens": sum(t["input_tokens"] for t in totals),
+        "cost_usd": round(sum(t["cost_usd"] for t in totals), 6),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "seconds": round(elapsed, 2),
+    }
+
+
+async def main(clients: int, bursts: int):
+    from app.services.llm_service import close_providers
+
+    try:
+        for single_flight in (False, True):
+            print(await run(clients, bursts, single_flight))
+    finally:
+        await close_providers()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{base}/v1",
+        "GEMINI_BASE_URL": base,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake"),
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "fake"),
+        "OPENAI_LLM_MODEL": os.getenv("OPENAI_LLM_MODEL", "fake-gpt"),
+        "GEMINI_LLM_MODEL": os.getenv("GEMINI_LLM_MODEL", "fake-gemini"),
+    })
+    server = start_fake_server(args.port, latency_ms=args.latency_ms, failure_rate=0.0)
+    try:
+        asyncio.run(main(args.clients, args.bursts))
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,112 @@
+"""
+Request throughput of the API with 1..N uvicorn worker processes sharing
+sessions through SESSION_BACKEND=shared: one upload, then concurrent
+drilldown requests (pandas work, no LLM calls) answered by whichever worker
+the kernel hands the connection to. Throughput can only scale up to the
+number of CPU cores on the machine.
+
+Usage (from the server/ directory):
+    python -m benchmarks.bench_workers --workers 1 2 4 --rows 200000 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.datasets import make_dataset
+
+
+DRILLDOWNS = [
+    {"column": "region", "measure": "revenue"},
+    {"column": "product", "measure": "units", "filters": {"region": ["North", "West"]}},
+    {"column": "product"},
+]
+
+
+def start_server(workers: int, port: int, shared_dir: str) -> subprocess.Popen:
+    env = {**os.environ, "SESSION_BACKEND": "shared", "SESSION_SHARED_DIR": shared_dir, "PROFILE_ON_UPLOAD": "false"}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient):
+    for _ in range(200):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def run(workers: int, csv: bytes, port: int, concurrency: int, seconds: float, shared_dir: str) -> dict:
+    server = start_server(workers, port, shared_dir)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            await wait_ready(client)
+            response = await client.post("/api/uploads/upload-file", files={"file": ("bench.csv", csv, "text/csv")})
+            session_id = response.json()["session_id"]
+            # Every worker maps the session once before the timed part
+            for _ in range(workers * 4):
+                await client.post("/api/charts/drilldown", json={"session_id": session_id, **DRILLDOWNS[0]})
+
+            done, errors, latencies = 0, 0, []
+            deadline = time.perf_counter() + seconds
+
+            async def user(number: int):
+                nonlocal done, errors
+                while time.perf_counter() < deadline:
+                    body = {"session_id": session_id, **DRILLDOWNS[(number + done) % len(DRILLDOWNS)]}
+                    start = time.perf_counter()
+                    response = await client.post("/api/charts/drilldown", json=body)
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200 or "error" in response.json():
+                        errors += 1
+                    done += 1
+
+            await asyncio.gather(*(user(number) for number in range(concurrency)))
+            # Fresh connections, since a kept-alive one always reaches the same worker
+            pids = {
+                (await client.get("/api/uploads/session-metrics", headers={"Connection": "close"})).json()["worker_pid"]
+                for _ in range(workers * 8)
+            }
+            latencies.sort()
+            return {
+                "workers": workers,
+                "requests_per_second": round(done / seconds, 1),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+                "errors": errors,
+                "workers_answering": len(pids),
+            }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(workers_list, rows: int, concurrency: int, seconds: float, port: int):
+    csv = make_dataset(rows).to_csv(index=False).encode("utf-8")
+    print({"rows": rows, "cpus": os.cpu_count(), "concurrency": concurrency})
+    for workers in workers_list:
+        with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as shared_dir:
+            print(asyncio.run(run(workers, csv, port, concurrency, seconds, shared_dir)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8077)
+    args = parser.parse_args()
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    main(args.workers, args.rows, args.concurrency, args.seconds, args.port)
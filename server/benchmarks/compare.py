@@ -0,0 +1,70 @@
+"""
+Compare two benchmark reports written by benchmarks.report, result by
+result (matched on "name"). Metrics where lower is better (times, latency
+percentiles, bytes, RSS) and higher is better (throughput) are told apart
+by name; a change beyond --threshold in the bad direction is flagged.
+
+Usage (from the server/ directory):
+    python -m benchmarks.compare benchmarks/.data/reports/suite-abc123.json benchmarks/.data/reports/suite-def456.json
+
+Exits with status 1 when anything regressed, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+# Request counts come from fixed-length load runs, so they are throughput too
+HIGHER_IS_BETTER = ("per_sec", "rps", "throughput", "speedup", "hit_rate", "requests")
+
+
+def higher_is_better(metric: str) -> bool:
+    return any(marker in metric for marker in HIGHER_IS_BETTER)
+
+
+def compare(old: dict, new: dict, threshold: float) -> tuple:
+    rows, regressions = [], 0
+    baseline = {result["name"]: result for result in old["results"]}
+    for result in new["results"]:
+        before = baseline.get(result["name"])
+        if before is None:
+            continue
+        for metric, value in result.items():
+            previous = before.get(metric)
+            if metric == "name" or isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(previous, (int, float)):
+                continue
+            if previous:
+                change = (value - previous) / previous
+            else:
+                # e.g. errors going from none to some
+                change = 0.0 if value == previous else float("inf") * (1 if value > previous else -1)
+            worse = -change if higher_is_better(metric) else change
+            flag = "REGRESSION" if worse > threshold else ("improved" if worse < -threshold else "")
+            regressions += flag == "REGRESSION"
+            rows.append((result["name"], metric, previous, value, f"{change:+.1%}", flag))
+    return rows, regressions
+
+
+def main(old_path: str, new_path: str, threshold: float) -> int:
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['environment']['commit']} -> {new['environment']['commit']} ({new['suite']})")
+    if old["environment"].get("cpus") != new["environment"].get("cpus"):
+        print("warning: reports come from machines with different CPU counts")
+    rows, regressions = compare(old, new, threshold)
+    widths = [max(len(str(row[i])) for row in rows + [("result", "metric", "before", "after", "change", "")]) for i in range(6)]
+    for row in [("result", "metric", "before", "after", "change", "")] + rows:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change treated as noise")
+    args = parser.parse_args()
+    sys.exit(main(args.old, args.new, args.threshold))
@@ -0,0 +1,150 @@
+"""
+Synthetic datasets for the benchmarks: an orders table with configurable
+size and cardinality (and a customers table it can be joined with), written
+as CSV, XLSX (one sheet per seed) or a text PDF. Everything is derived from the seed, so the same arguments always
+give the same bytes.
+
+Usage (from the server/ directory):
+    python -m benchmarks.datasets csv --rows 1000000 --products 5000 --out /tmp/orders.csv
+    python -m benchmarks.datasets xlsx --rows 50000 --sheets 4 --out /tmp/orders.xlsx
+    python -m benchmarks.datasets pdf --pages 100 --out /tmp/report.pdf
+"""
+import argparse
+import io
+import os
+import numpy as np
+import pandas as pd
+
+
+REGIONS = ["North", "South", "East", "West", "Central", "Overseas"]
+REGION_WEIGHTS = [0.4, 0.3, 0.2, 0.1]
+WORDS = (
+    "revenue quarter growth customer churn pipeline forecast margin supplier contract region "
+    "inventory shipment warranty compliance audit budget hiring retention pricing discount"
+).split()
+
+
+def make_dataset(rows: int, seed: int = 0, regions: int = 4, products: int = 40, comments: int = None) -> pd.DataFrame:
+    """
+    Orders with a skewed low-cardinality region, `products` product names,
+    a date, two numeric measures and a free-text comment with up to
+    `comments` distinct values (default: about one per row).
+    """
+    rng = np.random.default_rng(seed)
+    names = REGIONS[:regions] if regions <= len(REGIONS) else [f"Region {i}" for i in range(regions)]
+    weights = REGION_WEIGHTS if regions == len(REGION_WEIGHTS) else None
+    return pd.DataFrame({
+        "order_id": np.arange(rows),
+        "region": rng.choice(names, size=rows, p=weights),
+        "product": rng.choice([f"Product {i}" for i in range(products)], size=rows),
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, size=rows), unit="D"),
+        "units": rng.integers(1, 50, size=rows),
+        "revenue": rng.gamma(2.0, 150.0, size=rows).round(2),
+        "comment": [f"note {i}" for i in rng.integers(0, comments or rows, size=rows)],
+    })
+
+
+def make_customers(customers: int, seed: int = 0) -> pd.DataFrame:
+    """A customers table to join orders with, keyed by customer_id 0..customers-1."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer_id": np.arange(customers),
+        "segment": rng.choice(["Consumer", "Corporate", "Home Office", "Enterprise"], size=customers),
+        "country": rng.choice([f"Country {i}" for i in range(30)], size=customers),
+        "signup_date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, size=customers), unit="D"),
+        "credit_limit": rng.integers(1, 100, size=customers) * 500,
+    })
+
+
+def with_customers(orders: pd.DataFrame, customers: int, seed: int = 0) -> pd.DataFrame:
+    # Orders from customers 0..customers*1.1, so about a tenth reference no known customer
+    rng = np.random.default_rng(seed + 1)
+    return orders.assign(customer_id=rng.integers(0, int(customers * 1.1) + 1, size=len(orders)))
+
+
+def write_csv(path: str, rows: int, seed: int = 0, chunk_rows: int = 200_000, **cardinality):
+    # In chunks, so files larger than memory can be generated
+    with open(path, "w", newline="") as f:
+        for number, start in enumerate(range(0, rows, chunk_rows)):
+            chunk = make_dataset(min(chunk_rows, rows - start), seed=seed + number, **cardinality)
+            chunk["order_id"] += start
+            chunk.to_csv(f, header=number == 0, index=False)
+
+
+def csv_bytes(rows: int, seed: int = 0, **cardinality) -> bytes:
+    return make_dataset(rows, seed=seed, **cardinality).to_csv(index=False).encode("utf-8")
+
+
+def write_xlsx(path: str, rows: int, sheets: int = 1, **cardinality):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for number in range(sheets):
+        df = make_dataset(rows, seed=number, **cardinality)
+        sheet = workbook.create_sheet(f"Sheet{number + 1}")
+        sheet.append(list(df.columns))
+        for row in df.itertuples(index=False):
+            sheet.append([value.to_pydatetime() if hasattr(value, "to_pydatetime") else value for value in row])
+    workbook.save(path)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_bytes(pages: int, lines_per_page: int = 45, seed: int = 0) -> bytes:
+    """Minimal PDF writer: plain Helvetica text pages of random WORDS."""
+    rng = np.random.default_rng(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [" ".join(rng.choice(WORDS, size=12)) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 14 TL 50 760 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode("latin-1"))
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode("latin-1")
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode("latin-1")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return out.getvalue()
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 45, seed: int = 0):
+    with open(path, "wb") as f:
+        f.write(pdf_bytes(pages, lines_per_page, seed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("kind", choices=["csv", "xlsx", "pdf"])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--products", type=int, default=40)
+    parser.add_argument("--comments", type=int, default=None, help="Distinct comment values (default: about one per row)")
+    parser.add_argument("--sheets", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=100)
+    args = parser.parse_args()
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    cardinality = {"regions": args.regions, "products": args.products, "comments": args.comments}
+    if args.kind == "csv":
+        write_csv(args.out, args.rows, args.seed, **cardinality)
+    elif args.kind == "xlsx":
+        write_xlsx(args.out, args.rows, args.sheets, **cardinality)
+    else:
+        write_pdf(args.out, args.pages, seed=args.seed)
+    print({"path": args.out, "mb": round(os.path.getsize(args.out) / 1024 ** 2, 2)})
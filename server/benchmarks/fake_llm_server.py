@@ -0,0 +1,221 @@
+"""
+Local stand-in for the OpenAI and Gemini HTTP APIs.
+
+Run with:
+    uvicorn benchmarks.fake_llm_server:app --port 8099
+
+Latency and failures are controlled through environment variables:
+    FAKE_LLM_LATENCY_MS   mean response latency (default 200)
+    FAKE_LLM_JITTER_MS    uniform +/- jitter around the mean (default 50)
+    FAKE_LLM_FAILURE_RATE fraction of requests answered with HTTP 503 (default 0)
+    FAKE_LLM_TOKEN_DELAY_MS delay between streamed tokens (default 20)
+    FAKE_LLM_INVALID_RATE fraction of structured answers replaced by invalid JSON (default 0)
+    FAKE_LLM_SEED         seed of the latency, failure and invalid-answer draws (default 0),
+                          so a run with the same request sequence sees the same injections
+
+Requests with a response schema (OpenAI response_format, Gemini
+responseSchema) are answered with a minimal document matching the schema.
+
+Tests running the app in-process script individual requests per provider
+("openai", "gemini") through the module globals: `scripts` queues the
+outcome of the next requests (an HTTP error status, "invalid" for an
+invalid structured answer, or None for a normal answer), `extra_latency_ms`
+slows one provider down and `request_counts` counts what each received.
+
+Usage is reported with a simulated prefix cache that behaves like the real
+ones: everything before the last message (OpenAI) or the last part (Gemini)
+is a cacheable prefix, counted as cached input once it has been seen before
+and is at least CACHE_MIN_TOKENS long.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from collections import Counter, deque
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "50"))
+FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "20"))
+INVALID_RATE = float(os.getenv("FAKE_LLM_INVALID_RATE", "0"))
+rng = random.Random(int(os.getenv("FAKE_LLM_SEED", "0")))
+
+FAKE_ANSWER = '{"chart_types": ["bar"], "required_columns": [["region", "revenue"]]}'
+INVALID_ANSWER = 'Sure, here is the JSON: {"chart_types": ["histogram"], "required_columns": [["no_such_column"]]}'
+
+CHARS_PER_TOKEN = 4
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+seen_prefixes = set()
+
+scripts = {"openai": deque(), "gemini": deque()}
+extra_latency_ms = {"openai": 0.0, "gemini": 0.0}
+request_counts = Counter()
+
+app = FastAPI()
+
+
+def count_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def prompt_usage(prefix: str, rest: str) -> tuple:
+    """(input tokens, cached tokens) for a prompt split into its cacheable prefix and the rest."""
+    prefix_tokens = count_tokens(prefix) if prefix else 0
+    key = hashlib.blake2b(prefix.encode("utf-8"), digest_size=16).digest()
+    cached = 0
+    if prefix_tokens >= CACHE_MIN_TOKENS and key in seen_prefixes:
+        cached = prefix_tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+    seen_prefixes.add(key)
+    return prefix_tokens + count_tokens(rest), cached
+
+
+def example_from_schema(schema: dict):
+    kind = str(schema.get("type", "string")).lower()
+    if kind == "object":
+        return {name: example_from_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {}))]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    return {"integer": 1, "number": 1.0, "boolean": True}.get(kind, "text")
+
+
+def answer_for(schema: dict = None, invalid: bool = False) -> str:
+    if schema is None:
+        return FAKE_ANSWER
+    if rng.random() < INVALID_RATE or invalid:
+        return INVALID_ANSWER
+    return json.dumps(example_from_schema(schema))
+
+
+def openai_usage(body: dict, answer: str) -> dict:
+    texts = [str(message.get("content", "")) for message in body.get("messages", [])]
+    input_tokens, cached = prompt_usage("\n".join(texts[:-1]), texts[-1] if texts else "")
+    output_tokens = count_tokens(answer)
+    return {
+        "prompt_tokens": input_tokens,
+        "completion_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached},
+    }
+
+
+def gemini_usage(body: dict, answer: str) -> dict:
+    system = " ".join(part.get("text", "") for part in body.get("systemInstruction", {}).get("parts", []))
+    texts = [part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])]
+    input_tokens, cached = prompt_usage("\n".join([system] + texts[:-1]), texts[-1] if texts else "")
+    output_tokens = count_tokens(answer)
+    usage = {"promptTokenCount": input_tokens, "candidatesTokenCount": output_tokens, "totalTokenCount": input_tokens + output_tokens}
+    if cached:
+        usage["cachedContentTokenCount"] = cached
+    return usage
+
+
+async def simulate_latency(provider: str):
+    """Waits like the provider would. Returns an error response, "invalid" or None for a normal answer."""
+    request_counts[provider] += 1
+    # Both draws before sleeping, so they follow request arrival order
+    delay = max(0.0, LATENCY_MS + rng.uniform(-JITTER_MS, JITTER_MS)) / 1000
+    fail = rng.random() < FAILURE_RATE
+    scripted = scripts[provider].popleft() if scripts[provider] else None
+    await asyncio.sleep(delay + extra_latency_ms[provider] / 1000)
+    if scripted == "invalid":
+        return scripted
+    if fail or scripted is not None:
+        status = scripted or 503
+        return JSONResponse(status_code=status, content={"error": {"code": status, "message": "injected failure", "status": "UNAVAILABLE"}})
+    return None
+
+
+def answer_tokens(answer: str = FAKE_ANSWER):
+    return [answer[i:i + 8] for i in range(0, len(answer), 8)]
+
+
+async def sse(events):
+    for event in events:
+        yield f"data: {json.dumps(event)}\n\n"
+        await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+
+
+def openai_chunk(model: str, content: str = None, finish_reason: str = None) -> dict:
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+async def openai_stream(model: str, usage: dict = None):
+    events = [openai_chunk(model, token) for token in answer_tokens()] + [openai_chunk(model, finish_reason="stop")]
+    if usage is not None:
+        events.append({**openai_chunk(model), "choices": [], "usage": usage})
+    async for event in sse(events):
+        yield event
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = await simulate_latency("openai")
+    if isinstance(failure, JSONResponse):
+        return failure
+    schema = ((body.get("response_format") or {}).get("json_schema") or {}).get("schema")
+    answer = answer_for(schema, invalid=failure == "invalid")
+    usage = openai_usage(body, answer)
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        return StreamingResponse(openai_stream(body.get("model", "fake"), usage if include_usage else None), media_type="text/event-stream")
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": answer},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    body = await request.json()
+    failure = await simulate_latency("gemini")
+    if isinstance(failure, JSONResponse):
+        return failure
+    answer = answer_for(body.get("generationConfig", {}).get("responseSchema"), invalid=failure == "invalid")
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": answer}]},
+            "finishReason": "STOP",
+        }],
+        "usageMetadata": gemini_usage(body, answer),
+        "modelVersion": model,
+    }
+
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def stream_generate_content(model: str, request: Request):
+    body = await request.json()
+    failure = await simulate_latency("gemini")
+    if isinstance(failure, JSONResponse):
+        return failure
+    events = [
+        {"candidates": [{"content": {"role": "model", "parts": [{"text": token}]}}], "modelVersion": model}
+        for token in answer_tokens()
+    ]
+    events[-1]["usageMetadata"] = gemini_usage(body, FAKE_ANSWER)
+    return StreamingResponse(sse(events), media_type="text/event-stream")
@@ -0,0 +1,264 @@
+"""
+End-to-end load test of the API. Starts benchmarks.fake_llm_server (seeded,
+with configurable latency and failure injection) and the app under uvicorn
+pointed at it, uploads --sessions datasets, then keeps --concurrency closed-loop
+users busy for --seconds with a weighted mix of requests:
+
+    chart        POST /api/charts/generate-chart (LLM chart plan + charts)
+    query        POST /api/query/query-file (LLM answer)
+    plan         POST /api/query/query-file?mode=plan (LLM query plan, executed locally)
+    description  POST /api/charts/dataset-description
+    drilldown    POST /api/charts/drilldown (no LLM)
+    upload       POST /api/uploads/upload-file (a fresh small CSV)
+
+Questions are drawn from --distinct-queries variants, which sets how often
+plan caches can answer. Reports throughput, latency percentiles and errors
+per request kind, the server's peak RSS (all worker processes) and the mean
+time per span from /metrics, and saves it for benchmarks.compare.
+
+Usage (from the server/ directory):
+    python -m benchmarks.load_test --seconds 30 --concurrency 32
+    python -m benchmarks.load_test --mix chart=1,drilldown=3 --workers 2 --llm-latency-ms 800
+    python -m benchmarks.load_test --app-url http://staging:8000 --no-fake-llm   # existing deployment
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.datasets import csv_bytes
+from benchmarks.report import percentiles, process_peak_rss_mb, write_report
+
+
+QUESTIONS = [
+    "Show revenue by region",
+    "Which products sell the most units?",
+    "How does revenue change over time?",
+    "Compare units and revenue",
+    "What share of orders comes from each region?",
+    "Which region has the highest average revenue?",
+    "Plot revenue per product for the North region",
+    "Is there a relationship between units and revenue?",
+]
+DEFAULT_MIX = "chart=4,query=2,plan=1,description=1,drilldown=4"
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def start_process(module_app: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module_app, "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(url: str):
+    async with httpx.AsyncClient() as client:
+        for _ in range(300):
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def span_means(metrics_text: str) -> dict:
+    # Mean milliseconds per span from the qc_span_duration_seconds sums and counts
+    sums, counts = {}, {}
+    pattern = re.compile(r'qc_span_duration_seconds_(sum|count)\{span="([^"]*)",model="([^"]*)",chart_type="([^"]*)"\} (\S+)')
+    for kind, name, model, chart_type, value in pattern.findall(metrics_text):
+        key = "/".join(part for part in (name, model, chart_type) if part)
+        (sums if kind == "sum" else counts)[key] = (sums if kind == "sum" else counts).get(key, 0) + float(value)
+    return {key: round(sums[key] / counts[key] * 1000, 2) for key in sorted(sums) if counts.get(key)}
+
+
+class LoadDriver:
+    def __init__(self, client: httpx.AsyncClient, sessions: list, args):
+        self.client = client
+        self.sessions = sessions
+        self.args = args
+        self.rng = random.Random(args.seed)
+        mix = parse_mix(args.mix)
+        self.kinds, self.weights = list(mix), list(mix.values())
+        self.latencies = {kind: [] for kind in self.kinds}
+        self.errors = {kind: 0 for kind in self.kinds}
+
+    def question(self) -> str:
+        number = self.rng.randrange(self.args.distinct_queries)
+        suffix = f" (variant {number // len(QUESTIONS)})" if number >= len(QUESTIONS) else ""
+        return QUESTIONS[number % len(QUESTIONS)] + suffix
+
+    def request(self, kind: str) -> tuple:
+        session_id = self.rng.choice(self.sessions)
+        model = self.args.model
+        if kind == "chart":
+            return "POST", "/api/charts/generate-chart", {"params": {"query": self.question(), "session_id": session_id, "model": model}}
+        if kind == "query":
+            return "POST", "/api/query/query-file", {"params": {"query": self.question(), "session_id": session_id, "model": model}}
+        if kind == "plan":
+            return "POST", "/api/query/query-file", {"params": {"query": self.question(), "session_id": session_id, "model": model, "mode": "plan"}}
+        if kind == "description":
+            return "POST", "/api/charts/dataset-description", {"params": {"session_id": session_id, "model": model}}
+        if kind == "drilldown":
+            body = self.rng.choice([
+                {"column": "region", "measure": "revenue"},
+                {"column": "product", "measure": "units", "filters": {"region": ["North", "West"]}},
+                {"column": "product"},
+            ])
+            return "POST", "/api/charts/drilldown", {"json": {"session_id": session_id, **body}}
+        if kind == "upload":
+            payload = csv_bytes(self.args.upload_rows, seed=self.rng.randrange(1000))
+            return "POST", "/api/uploads/upload-file", {"files": {"file": ("load.csv", payload, "text/csv")}}
+        raise ValueError(f"Unknown request kind {kind!r}")
+
+    async def user(self, deadline: float, record: bool):
+        while time.perf_counter() < deadline:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            method, path, options = self.request(kind)
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **options)
+                failed = response.status_code != 200 or (
+                    response.headers.get("content-type", "").startswith("application/json") and "error" in response.json()
+                )
+            except httpx.HTTPError:
+                failed = True
+            if record:
+                self.latencies[kind].append(time.perf_counter() - start)
+                self.errors[kind] += failed
+
+    async def run(self, seconds: float, record: bool = True) -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(self.user(start + seconds, record) for _ in range(self.args.concurrency)))
+        return time.perf_counter() - start
+
+
+async def run_load(args, app_url: str, server_pid: int = None) -> list:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+        sessions = []
+        for number in range(args.sessions):
+            response = await client.post(
+                "/api/uploads/upload-file",
+                files={"file": (f"orders_{number}.csv", csv_bytes(args.rows, seed=number, products=args.products), "text/csv")},
+            )
+            sessions.append(response.json()["session_id"])
+
+        driver = LoadDriver(client, sessions, args)
+        if args.warmup:
+            await driver.run(args.warmup, record=False)
+        elapsed = await driver.run(args.seconds)
+
+        results = []
+        for kind in driver.kinds:
+            latencies = driver.latencies[kind]
+            results.append({
+                "name": f"load_{kind}",
+                "requests": len(latencies),
+                "errors": driver.errors[kind],
+                "rps": round(len(latencies) / elapsed, 2),
+                **percentiles(latencies),
+            })
+        everything = [value for values in driver.latencies.values() for value in values]
+        total = {
+            "name": "load_total",
+            "requests": len(everything),
+            "errors": sum(driver.errors.values()),
+            "rps": round(len(everything) / elapsed, 2),
+            **percentiles(everything),
+        }
+        if server_pid is not None:
+            total["server_peak_rss_mb"] = process_peak_rss_mb(server_pid)
+        results.append(total)
+        metrics = await client.get("/metrics")
+        if metrics.status_code == 200:
+            results.append({"name": "span_mean_ms", **span_means(metrics.text)})
+        return results
+
+
+def main(args):
+    processes = []
+    app_url = args.app_url
+    server_pid = None
+    try:
+        if not args.no_fake_llm:
+            fake_env = {
+                "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+                "FAKE_LLM_JITTER_MS": str(args.llm_jitter_ms),
+                "FAKE_LLM_FAILURE_RATE": str(args.llm_failure_rate),
+                "FAKE_LLM_SEED": str(args.seed),
+            }
+            processes.append(start_process("benchmarks.fake_llm_server:app", args.llm_port, fake_env))
+            asyncio.run(wait_ready(f"http://127.0.0.1:{args.llm_port}/docs"))
+
+        if app_url is None:
+            llm = f"http://127.0.0.1:{args.llm_port}"
+            app_env = {
+                "OPENAI_BASE_URL": f"{llm}/v1",
+                "GEMINI_BASE_URL": llm,
+                "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake"),
+                "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "fake"),
+                "OPENAI_LLM_MODEL": os.getenv("OPENAI_LLM_MODEL", "fake-gpt"),
+                "GEMINI_LLM_MODEL": os.getenv("GEMINI_LLM_MODEL", "fake-gemini"),
+                "LOG_LEVEL": "WARNING",
+            }
+            if args.workers > 1:
+                app_env["SESSION_BACKEND"] = "shared"
+                app_env["SESSION_SHARED_DIR"] = tempfile.mkdtemp(prefix="load_test_", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+            server = start_process("main:app", args.app_port, app_env, args.workers)
+            processes.append(server)
+            server_pid = server.pid
+            app_url = f"http://127.0.0.1:{args.app_port}"
+            asyncio.run(wait_ready(f"{app_url}/"))
+
+        results = asyncio.run(run_load(args, app_url, server_pid))
+        for result in results:
+            print(result)
+        parameters = {key: value for key, value in vars(args).items() if key not in ("out",)}
+        print(f"Report written to {write_report('load', parameters, results, args.out)}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3, help="Unrecorded seconds before the measurement")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="kind=weight,... over chart, query, plan, description, drilldown, upload")
+    parser.add_argument("--model", default="chatgpt", choices=["chatgpt", "gemini", "auto"])
+    parser.add_argument("--sessions", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--products", type=int, default=40)
+    parser.add_argument("--upload-rows", type=int, default=10000)
+    parser.add_argument("--distinct-queries", type=int, default=len(QUESTIONS))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-port", type=int, default=8099)
+    parser.add_argument("--app-port", type=int, default=8098)
+    parser.add_argument("--app-url", help="Load an already running app instead of starting one")
+    parser.add_argument("--no-fake-llm", action="store_true", help="Do not start the fake LLM server")
+    parser.add_argument("--out", help="Report path (default: benchmarks/.data/reports/load-<commit>.json)")
+    main(parser.parse_args())
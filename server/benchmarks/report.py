@@ -0,0 +1,91 @@
+"""
+Benchmark reports that can be compared across commits: every result is a
+dict with a "name" plus numeric metrics, saved as JSON together with the
+commit, library versions and machine they were measured on.
+
+Reports go to benchmarks/.data/reports/<suite>-<commit>.json unless --out
+is given; compare two with benchmarks.compare.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+
+
+REPORT_DIR = os.path.join("benchmarks", ".data", "reports")
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment() -> dict:
+    import numpy
+    import pandas
+    import pyarrow
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "pyarrow": pyarrow.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    # ru_maxrss is in KiB on Linux; for children it is the largest single child
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def process_peak_rss_mb(pid: int) -> float:
+    """Peak RSS of a running process and all its descendants (Linux /proc)."""
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("VmHWM:")), 0)
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending += [int(child) for child in f.read().split()]
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def percentiles(latencies: list) -> dict:
+    if not latencies:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(latencies)
+
+    def at(pct: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000, 2)
+    return {"p50_ms": at(50), "p90_ms": at(90), "p99_ms": at(99), "max_ms": round(ordered[-1] * 1000, 2)}
+
+
+def write_report(suite: str, parameters: dict, results: list, out: str = None) -> str:
+    report = {
+        "suite": suite,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "parameters": parameters,
+        "results": results,
+    }
+    if out is None:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        out = os.path.join(REPORT_DIR, f"{suite}-{report['environment']['commit']}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return out
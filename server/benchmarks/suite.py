@@ -0,0 +1,248 @@
+"""
+Micro-benchmark suite over the hot paths: ingestion (CSV, XLSX, PDF),
+chart computation (plain, with the aggregate index, drilldown), cross-table
+joins, response
+serialization, prompt context building and text retrieval. Inputs come from
+benchmarks.datasets with fixed seeds, so two runs at the same --scale
+measure the same work.
+
+Each benchmark runs in a fresh subprocess, so its peak RSS is its own. The
+best of --repeat timings is reported, and the report is saved for
+benchmarks.compare.
+
+Usage (from the server/ directory):
+    python -m benchmarks.suite --scale small
+    python -m benchmarks.suite --scale medium --only ingest_csv charts
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.report import peak_rss_mb, write_report
+
+
+SCALES = {
+    "small": {"rows": 100_000, "xlsx_rows": 20_000, "pages": 50, "points": 100_000},
+    "medium": {"rows": 1_000_000, "xlsx_rows": 100_000, "pages": 500, "points": 1_000_000},
+    "large": {"rows": 5_000_000, "xlsx_rows": 300_000, "pages": 2000, "points": 5_000_000},
+}
+CHART_PLAN = [
+    ("bar", ["region", "revenue"]),
+    ("bar", ["region", "units"]),
+    ("pie", ["region"]),
+    ("bar", ["product", "revenue"]),
+    ("line", ["date", "revenue"]),
+    ("scatter", ["units", "revenue"]),
+]
+QUESTION = "What did the audit say about warranty compliance?"
+
+
+def best_of(compute, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compute()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compact_frame(rows: int):
+    from benchmarks.datasets import make_dataset
+    from app.services.compaction_service import compact_dataframe
+
+    df, _ = compact_dataframe(make_dataset(rows))
+    return df
+
+
+def bench_ingest_csv(scale: dict, repeat: int, data_dir: str) -> dict:
+    from benchmarks.datasets import csv_bytes
+    from app.services.ingest_service import read_csv_stream
+    from app.services.compaction_service import compact_dataframe
+
+    payload = csv_bytes(scale["rows"])
+    seconds = best_of(lambda: compact_dataframe(read_csv_stream(io.BytesIO(payload), 0)), repeat)
+    return {"ms": round(seconds * 1000, 1), "rows_per_sec": round(scale["rows"] / seconds), "input_mb": round(len(payload) / 1024 ** 2, 1)}
+
+
+def bench_ingest_xlsx(scale: dict, repeat: int, data_dir: str) -> dict:
+    from benchmarks.datasets import write_xlsx
+    from app.services.ingest_service import read_excel_tables
+
+    path = os.path.join(data_dir, f"suite_{scale['xlsx_rows']}.xlsx")
+    if not os.path.exists(path):
+        write_xlsx(path, scale["xlsx_rows"])
+
+    def read():
+        with open(path, "rb") as f:
+            read_excel_tables(f, 0)
+    seconds = best_of(read, repeat)
+    return {"ms": round(seconds * 1000, 1), "rows_per_sec": round(scale["xlsx_rows"] / seconds)}
+
+
+def bench_ingest_pdf(scale: dict, repeat: int, data_dir: str) -> dict:
+    from benchmarks.datasets import pdf_bytes
+    from app.services.ingest_service import read_pdf_text, shutdown_parse_pool
+
+    payload = pdf_bytes(scale["pages"])
+    try:
+        seconds = best_of(lambda: read_pdf_text(io.BytesIO(payload), 0), repeat)
+    finally:
+        shutdown_parse_pool()
+    return {"ms": round(seconds * 1000, 1), "pages_per_sec": round(scale["pages"] / seconds, 1)}
+
+
+def bench_charts(scale: dict, repeat: int, data_dir: str) -> dict:
+    from app.services.chart_service import compute_charts
+
+    df = compact_frame(scale["rows"])
+    return {
+        "serial_ms": round(best_of(lambda: compute_charts(df, CHART_PLAN, parallel=False), repeat) * 1000, 1),
+        "parallel_ms": round(best_of(lambda: compute_charts(df, CHART_PLAN), repeat) * 1000, 1),
+    }
+
+
+def bench_charts_indexed(scale: dict, repeat: int, data_dir: str) -> dict:
+    from app.services.aggregate_service import build_aggregate_index, session_aggregates
+    from app.services.preprocessing_service import prepare_columns
+    from app.services.chart_service import compute_charts, compute_drilldown
+
+    df = compact_frame(scale["rows"])
+    start = time.perf_counter()
+    index = build_aggregate_index(df, "suite")
+    build = time.perf_counter() - start
+    session_data = {"dataframe": df, "data_version": "suite", "aggregates": index}
+    frame, _ = prepare_columns(session_data, ["region", "product", "units", "revenue", "date"])
+    view = session_aggregates(session_data)
+    plan = [spec for spec in CHART_PLAN if spec[0] in ("bar", "pie")]
+    filters = {"region": ["North", "West"]}
+    return {
+        "index_build_ms": round(build * 1000, 1),
+        "charts_ms": round(best_of(lambda: compute_charts(frame, plan, parallel=False, aggregates=view), repeat) * 1000, 2),
+        "drilldown_ms": round(best_of(lambda: compute_drilldown(frame, "product", "revenue", filters, view), repeat) * 1000, 2),
+    }
+
+
+def bench_joins(scale: dict, repeat: int, data_dir: str) -> dict:
+    from benchmarks.datasets import make_customers, make_dataset, with_customers
+    from app.schemas.join import Join
+    from app.services.compaction_service import compact_dataframe
+    from app.services.join_service import join_tables
+
+    customers = scale["rows"] // 10
+    orders, _ = compact_dataframe(with_customers(make_dataset(scale["rows"]), customers))
+    customer_table, _ = compact_dataframe(make_customers(customers))
+    session_data = {"dataframe": orders, "tables": {"orders": orders, "customers": customer_table}, "active_table": "orders", "data_version": "suite"}
+    joins = [Join(table="customers", left_on="customer_id", right_on="customer_id")]
+    base = orders[["revenue"]]
+    start = time.perf_counter()
+    join_tables(session_data, joins, ["revenue", "customers.segment"], base)
+    cold = time.perf_counter() - start
+    return {
+        "cold_ms": round(cold * 1000, 1),
+        "warm_ms": round(best_of(lambda: join_tables(session_data, joins, ["revenue", "customers.segment"], base), repeat) * 1000, 1),
+        "merge_ms": round(best_of(lambda: orders.merge(customer_table, on="customer_id", how="left"), repeat) * 1000, 1),
+    }
+
+
+def bench_serialization(scale: dict, repeat: int, data_dir: str) -> dict:
+    from benchmarks.bench_serialization import make_charts
+    from app.utils.responses import ORJSONNumpyResponse, charts_to_arrow_stream
+
+    payload = make_charts(scale["points"])
+    body = ORJSONNumpyResponse(payload).body
+    return {
+        "orjson_ms": round(best_of(lambda: ORJSONNumpyResponse(payload), repeat) * 1000, 1),
+        "arrow_ms": round(best_of(lambda: charts_to_arrow_stream(payload["charts"]), repeat) * 1000, 1),
+        "json_bytes": len(body),
+    }
+
+
+def bench_prompt_context(scale: dict, repeat: int, data_dir: str) -> dict:
+    from benchmarks.datasets import make_dataset
+    from app.config.llm_models import ModelName
+    from app.services.context_service import build_dataset_context
+
+    df = make_dataset(scale["rows"])
+    context = build_dataset_context(df, ModelName.chatgpt)
+    return {
+        "ms": round(best_of(lambda: build_dataset_context(df, ModelName.chatgpt), repeat) * 1000, 1),
+        "context_bytes": len(context.encode("utf-8")),
+    }
+
+
+def bench_text_retrieval(scale: dict, repeat: int, data_dir: str) -> dict:
+    from benchmarks.datasets import pdf_bytes
+    from app.services.ingest_service import read_pdf_text, shutdown_parse_pool
+    from app.services.text_search_service import TextIndex, chunk_text
+
+    try:
+        text = read_pdf_text(io.BytesIO(pdf_bytes(scale["pages"])), 0)
+    finally:
+        shutdown_parse_pool()
+    index = TextIndex(chunk_text(text))
+    return {
+        "index_ms": round(best_of(lambda: TextIndex(chunk_text(text)), repeat) * 1000, 1),
+        "search_ms": round(best_of(lambda: index.search(QUESTION, 8), repeat) * 1000, 2),
+    }
+
+
+BENCHMARKS = {
+    "ingest_csv": bench_ingest_csv,
+    "ingest_xlsx": bench_ingest_xlsx,
+    "ingest_pdf": bench_ingest_pdf,
+    "charts": bench_charts,
+    "charts_indexed": bench_charts_indexed,
+    "joins": bench_joins,
+    "serialization": bench_serialization,
+    "prompt_context": bench_prompt_context,
+    "text_retrieval": bench_text_retrieval,
+}
+
+
+def run_one(name: str, scale_name: str, repeat: int, data_dir: str) -> dict:
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+        os.environ.setdefault(key, "unused")
+    # Imports count towards the baseline, not the benchmark
+    import app.services.chart_service  # noqa: F401
+    baseline = peak_rss_mb()
+    result = BENCHMARKS[name](SCALES[scale_name], repeat, data_dir)
+    return {"name": name, **result, "peak_rss_mb": peak_rss_mb(), "baseline_rss_mb": baseline}
+
+
+def main(args) -> list:
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for name in args.only or BENCHMARKS:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", "--run", name, "--scale", args.scale,
+             "--repeat", str(args.repeat), "--data-dir", args.data_dir],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print({"name": name, "error": out.stderr.strip().splitlines()[-1:]})
+            continue
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(result)
+        results.append(result)
+    path = write_report(f"suite-{args.scale}", {"scale": args.scale, **SCALES[args.scale], "repeat": args.repeat}, results, args.out)
+    print(f"Report written to {path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", default=os.path.join("benchmarks", ".data"))
+    parser.add_argument("--out", help="Report path (default: benchmarks/.data/reports/suite-<scale>-<commit>.json)")
+    parser.add_argument("--run", choices=list(BENCHMARKS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(run_one(args.run, args.scale, args.repeat, args.data_dir)))
+    else:
+        main(args)
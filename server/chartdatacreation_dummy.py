@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any
-from app.controllers.uploadfile_controller import user_sessions
+from app.services.session_store import session_store
 
 def create_chart_data(session_id: str, chart_types: List[str], required_columns: List[List[str]]) -> Dict[str, Any]:
     """
@@ -16,12 +16,12 @@ def create_chart_data(session_id: str, chart_types: List[str], required_columns:
         Dict[str, Any]: JSON-compatible dictionary with chart data and metadata, or error message.
     """
     # Validate session
-    if session_id not in user_sessions:
+    session_data = session_store.get(session_id)
+    if session_data is None:
         return {"error": "Invalid or expired session"}
     
     try:
         # Retrieve preprocessed DataFrame
-        session_data = user_sessions[session_id]
         df = session_data["dataframe"]
         if df is None:
             return {"error": "No DataFrame available for this session"}
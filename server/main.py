@@ -1,8 +1,23 @@
 from fastapi import FastAPI
-from app.routes import uploadfile_routes, query_routes, generatechart_routes
+from contextlib import asynccontextmanager
+from app.config.logging_config import configure_logging
+from app.routes import uploadfile_routes, query_routes, generatechart_routes, metrics_routes
+from app.services.llm_service import close_providers
+from app.services.ingest_service import shutdown_parse_pool
+from app.services.metrics_service import RequestMetricsMiddleware
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener = configure_logging()
+    yield
+    await close_providers()
+    shutdown_parse_pool()
+    log_listener.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.get("/")
@@ -12,4 +27,5 @@ async def root():
 
 app.include_router(uploadfile_routes.router, prefix="/api/uploads", tags=["Uploads"])
 app.include_router(query_routes.router, prefix="/api/query", tags=["Query"])
-app.include_router(generatechart_routes.router, prefix="/api/charts", tags=["Charts"])
\ No newline at end of file
+app.include_router(generatechart_routes.router, prefix="/api/charts", tags=["Charts"])
+app.include_router(metrics_routes.router, tags=["Metrics"])
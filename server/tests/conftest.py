@@ -0,0 +1,68 @@
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+import uvicorn
+
+# The settings need provider credentials at import time; tests only call the fake provider
+for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "OPENAI_LLM_MODEL", "GEMINI_LLM_MODEL"):
+    os.environ.setdefault(key, "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def fake_llm_url():
+    """benchmarks.fake_llm_server, served from a thread of the test process so tests can script it."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config("benchmarks.fake_llm_server:app", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def fake_llm(fake_llm_url, monkeypatch):
+    """
+    Points both providers at the fake server with fast retries and a fresh
+    provider state, and returns the fake's module for scripting requests.
+    Run scenarios with run_llm, which closes the providers on its loop.
+    """
+    from app.config.environment_config import settings
+    from benchmarks import fake_llm_server as fake
+
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", f"{fake_llm_url}/v1")
+    monkeypatch.setattr(settings, "GEMINI_BASE_URL", fake_llm_url)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(settings, "LLM_BACKOFF_MAX_SECONDS", 0.01)
+    for name, value in (("LATENCY_MS", 5.0), ("JITTER_MS", 0.0), ("FAILURE_RATE", 0.0), ("INVALID_RATE", 0.0)):
+        monkeypatch.setattr(fake, name, value)
+    for queue in fake.scripts.values():
+        queue.clear()
+    monkeypatch.setattr(fake, "extra_latency_ms", {"openai": 0.0, "gemini": 0.0})
+    fake.request_counts.clear()
+    return fake
+
+
+@pytest.fixture
+def run_llm(fake_llm):
+    from app.services.llm_service import close_providers
+
+    def run(scenario):
+        async def main():
+            try:
+                return await scenario()
+            finally:
+                await close_providers()
+        return asyncio.run(main())
+    return run
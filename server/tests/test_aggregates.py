@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from app.services.aggregate_service import build_aggregate_index, extend_aggregate_index
+from app.services.compaction_service import append_frame, compact_dataframe
+
+
+def orders(rows: int, seed: int, regions: list, products: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "region": rng.choice(regions, rows),
+        "product": rng.choice([f"P{i}" for i in range(products)], rows),
+        "units": rng.integers(1, 50, rows),
+        "price": [f"${value:,.2f}" for value in rng.gamma(2, 500, rows)],
+        "code": rng.integers(0, 5, rows),
+    })
+
+
+def test_extended_index_equals_rebuilt_index():
+    old, _ = compact_dataframe(orders(5000, 0, ["North", " North ", "South", "n/a"], 30))
+    new = orders(700, 1, ["North", "South", "Mars"], 35)
+    new["code"] = new["code"] + 0.5  # promotes the column, which is then rebuilt in full
+    combined, changed = append_frame(old, new)
+
+    extended = extend_aggregate_index(build_aggregate_index(old, "old", 100), combined, len(old), changed, "new", 100)
+    rebuilt = build_aggregate_index(combined, "new", 100)
+
+    assert extended.plans == rebuilt.plans
+    assert extended.dims.keys() == rebuilt.dims.keys()
+    for name, (codes, uniques, counts) in rebuilt.dims.items():
+        extended_codes, extended_uniques, extended_counts = extended.dims[name]
+        assert list(extended_uniques) == list(uniques)
+        assert np.array_equal(extended_codes.astype(np.int64), codes.astype(np.int64))
+        assert np.array_equal(extended_counts, counts)
+    assert extended.sums.keys() == rebuilt.sums.keys()
+    for pair, sums in rebuilt.sums.items():
+        assert np.allclose(extended.sums[pair], sums)
@@ -0,0 +1,27 @@
+from app.services.cache_service import LRUCache
+
+
+def payload(points: int) -> dict:
+    return {"x": list(range(points)), "y": [float(i) for i in range(points)]}
+
+
+def test_byte_bound_evicts_least_recent_entries():
+    cache = LRUCache("test", max_entries=100, max_bytes=200_000)
+    for key in range(10):
+        cache.set(key, payload(1000))
+
+    metrics = cache.metrics()
+    assert metrics["bytes"] <= 200_000
+    assert metrics["evictions"] > 0
+    assert cache.get(9) is not None
+    assert cache.get(0) is None
+
+
+def test_payload_above_byte_bound_is_not_cached():
+    cache = LRUCache("test", max_entries=100, max_bytes=200_000)
+    cache.set("small", payload(10))
+    cache.set("huge", payload(100_000))
+
+    assert cache.get("huge") is None
+    assert cache.get("small") is not None
+    assert cache.metrics()["rejections"] == 1
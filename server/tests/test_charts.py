@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+from app.schemas.chart_plan import ChartPlan
+import app.controllers.generatechart_controller as generatechart_controller
+import main
+
+
+client = TestClient(main.app)
+ORDERS = b"order_id,customer_id,region,revenue\n1,10,North,5.5\n2,20,South,3\n3,10,North,2\n4,99,West,1\n"
+CUSTOMERS = b"customer_id,segment\n10,Retail\n20,Enterprise\n"
+
+
+def upload(name: str, payload: bytes, **params) -> dict:
+    return client.post("/api/uploads/upload-file", params=params, files={"file": (name, payload, "text/csv")}).json()
+
+
+def test_chart_plan_joins_another_table(monkeypatch):
+    async def chart_plan(prompt, model, schema_model, validation_context):
+        return ChartPlan.model_validate({
+            "chart_types": ["bar"],
+            "required_columns": [["customers.segment", "revenue"]],
+            "joins": [{"table": "customers", "left_on": "customer_id", "right_on": "customer_id", "how": "left"}],
+        }, context=validation_context)
+
+    monkeypatch.setattr(generatechart_controller, "query_structured", chart_plan)
+    session_id = upload("orders.csv", ORDERS)["session_id"]
+    upload("customers.csv", CUSTOMERS, session_id=session_id, table="customers")
+
+    response = client.post(
+        "/api/charts/generate-chart",
+        params={"query": "revenue by segment", "session_id": session_id, "model": "chatgpt"},
+        headers={"x-server-timing": "1"},
+    )
+
+    chart = response.json()["charts"][0]
+    assert dict(zip(chart["data"]["labels"], chart["data"]["values"])) == {"Retail": 7.5, "Enterprise": 3.0}
+    assert "join" in response.headers["server-timing"]
+    # Opened on a compute thread, still reported for the request
+    assert "chart_compute" in response.headers["server-timing"]
+
+
+def test_drilldown():
+    session_id = upload("orders.csv", ORDERS)["session_id"]
+
+    response = client.post("/api/charts/drilldown", json={"session_id": session_id, "column": "region", "measure": "revenue"})
+
+    data = response.json()["data"]
+    assert dict(zip(data["labels"], data["values"])) == {"North": 7.5, "South": 3.0, "West": 1.0}
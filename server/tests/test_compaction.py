@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from app.services.compaction_service import SchemaMismatchError, append_frame
+
+
+DATES = pd.DataFrame({"day": pd.to_datetime(["2024-01-01", "2024-01-02"])})
+
+
+def test_appended_dates_keep_the_column_dtype():
+    combined, changed = append_frame(DATES, pd.DataFrame({"day": ["2024-01-03", None]}))
+
+    assert combined["day"].dtype == DATES["day"].dtype
+    assert combined["day"].iloc[2] == pd.Timestamp("2024-01-03")
+    assert pd.isna(combined["day"].iloc[3])
+    assert changed == []
+
+
+@pytest.mark.parametrize("values, message", [
+    (["2024-01-03", "not a date"], "'not a date'"),
+    (["2024-01-03T00:00:00+01:00"], "without a time zone"),
+])
+def test_appended_values_that_are_not_naive_dates_are_rejected(values, message):
+    with pytest.raises(SchemaMismatchError, match=message):
+        append_frame(DATES, pd.DataFrame({"day": values}))
+
+
+def test_appended_dates_are_converted_to_the_column_time_zone():
+    utc = pd.DataFrame({"day": pd.to_datetime(["2024-01-01T00:00:00+00:00"])})
+
+    combined, _ = append_frame(utc, pd.DataFrame({"day": ["2024-01-03T00:00:00+01:00"]}))
+
+    assert combined["day"].iloc[1] == pd.Timestamp("2024-01-02T23:00:00+00:00")
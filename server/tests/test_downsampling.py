@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from app.schemas.chart_plan import ScatterMode
+from app.services.chart_service import compute_chart
+from app.services.downsampling_service import grid_bin, lttb_indices, sample_indices
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.sin(x / 500)
+    y[4321] = 50.0
+    y[7777] = -50.0
+
+    keep = lttb_indices(x, y, 200)
+
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert {4321, 7777} <= set(keep.tolist())
+
+
+def test_lttb_leaves_short_series_alone():
+    x = np.arange(50, dtype=np.float64)
+
+    assert np.array_equal(lttb_indices(x, x, 100), np.arange(50))
+
+
+def test_grid_bin_counts_every_point_within_max_points_cells():
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(size=50_000), rng.normal(size=50_000)
+
+    binned = grid_bin(x, y, 400)
+
+    assert len(binned["count"]) <= 400
+    assert binned["count"].sum() == len(x)
+    assert x.min() <= binned["x"].min() and binned["x"].max() <= x.max()
+
+
+def test_grid_bin_handles_a_constant_axis():
+    binned = grid_bin(np.ones(1000), np.arange(1000, dtype=np.float64), 100)
+
+    assert binned["count"].sum() == 1000
+    assert np.all(binned["x"] == binned["x"][0])
+
+
+def test_sample_indices_are_sorted_unique_and_stable():
+    first, second = sample_indices(100_000, 1000), sample_indices(100_000, 1000)
+
+    assert len(np.unique(first)) == 1000
+    assert np.all(np.diff(first) > 0)
+    assert np.array_equal(first, second)
+
+
+def test_charts_report_how_they_were_downsampled():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "day": pd.date_range("2020-01-01", periods=20_000, freq="h"),
+        "x": rng.normal(size=20_000),
+        "y": rng.normal(size=20_000),
+    })
+
+    line = compute_chart(df, "line", ["day", "y"], max_points=500)
+    binned = compute_chart(df, "scatter", ["x", "y"], max_points=500, scatter_mode=ScatterMode.bin)
+    sampled = compute_chart(df, "scatter", ["x", "y"], max_points=500)
+
+    assert line["metadata"]["downsampling"] == "lttb" and len(line["data"]["values"]) == 500
+    assert line["metadata"]["total_points"] == 20_000
+    assert binned["metadata"]["downsampling"] == "grid_bin" and binned["data"]["count"].sum() == 20_000
+    assert sampled["metadata"]["downsampling"] == "sample" and len(sampled["data"]["x"]) == 500
@@ -0,0 +1,6 @@
+from app.services.ingest_service import normalize_table_names
+
+
+def test_normalized_table_names_stay_unique():
+    tables = normalize_table_names({"Q1.2024": 1, "Q1_2024": 2, " ": 3})
+    assert list(tables) == ["Q1_2024", "Q1_2024_2", "table"]
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from app.config.llm_models import ModelName
+from app.services.llm_service import LLMServiceError, get_provider
+
+
+@pytest.mark.parametrize("model, provider", [(ModelName.chatgpt, "openai"), (ModelName.gemini, "gemini")])
+def test_transient_errors_are_retried(fake_llm, run_llm, model, provider):
+    fake_llm.scripts[provider].extend([503, 429])
+
+    async def scenario():
+        answer = await get_provider(model).complete("question")
+        return answer, get_provider(model).health.metrics()
+
+    answer, health = run_llm(scenario)
+
+    assert "chart_types" in answer
+    assert fake_llm.request_counts[provider] == 3
+    assert health["successes"] == 1 and health["failures"] == 0
+
+
+def test_exhausted_retries_count_against_the_provider(fake_llm, run_llm):
+    fake_llm.scripts["openai"].extend([503, 503, 503])
+
+    async def scenario():
+        with pytest.raises(LLMServiceError, match="request failed"):
+            await get_provider(ModelName.chatgpt).complete("question")
+        return get_provider(ModelName.chatgpt).health.metrics()
+
+    health = run_llm(scenario)
+
+    assert fake_llm.request_counts["openai"] == 3
+    assert health["failures"] == 1
+
+
+def test_rejected_requests_are_not_retried(fake_llm, run_llm):
+    fake_llm.scripts["openai"].append(400)
+
+    async def scenario():
+        with pytest.raises(LLMServiceError):
+            await get_provider(ModelName.chatgpt).complete("question")
+        return get_provider(ModelName.chatgpt).health.metrics()
+
+    health = run_llm(scenario)
+
+    # A bad request says nothing about the provider's health
+    assert fake_llm.request_counts["openai"] == 1
+    assert health["failures"] == 0 and health["consecutive_failures"] == 0
+
+
+def test_backoff_is_full_jitter_capped_at_the_maximum(fake_llm, run_llm):
+    async def scenario():
+        provider = get_provider(ModelName.chatgpt)
+        provider.backoff_base, provider.backoff_max = 0.5, 8.0
+        random.seed(0)
+        return [[provider._backoff(attempt) for _ in range(200)] for attempt in range(6)]
+
+    delays = run_llm(scenario)
+
+    for attempt, samples in enumerate(delays):
+        ceiling = min(8.0, 0.5 * 2 ** attempt)
+        assert all(0 <= delay <= ceiling for delay in samples)
+        assert max(samples) > ceiling * 0.9
+
+
+def test_stream_is_retried_before_its_first_token(fake_llm, run_llm):
+    fake_llm.scripts["openai"].append(503)
+
+    async def scenario():
+        return "".join([token async for token in get_provider(ModelName.chatgpt).stream("question")])
+
+    assert run_llm(scenario) == fake_llm.FAKE_ANSWER
+    assert fake_llm.request_counts["openai"] == 2
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from app.config.environment_config import settings
+from app.config.llm_models import ModelName
+from app.services.llm_service import LLMServiceError, get_provider, query_llm, rank_providers, routing_counters
+
+
+@pytest.fixture
+def routing(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "LLM_ROUTING_MIN_SAMPLES", 3)
+    monkeypatch.setattr(settings, "LLM_HEDGE_REQUESTS", True)
+    return fake_llm
+
+
+def prime(model: ModelName, seconds: float):
+    health = get_provider(model).health
+    for _ in range(settings.LLM_ROUTING_MIN_SAMPLES):
+        health.record_success(seconds)
+
+
+def test_breaker_opens_then_lets_one_trial_through(routing, run_llm):
+    routing.scripts["openai"].extend([503, 503])
+
+    async def scenario():
+        provider = get_provider(ModelName.chatgpt)
+        for _ in range(2):
+            with pytest.raises(LLMServiceError, match="request failed"):
+                await provider.complete("question")
+        with pytest.raises(LLMServiceError, match="circuit breaker is open"):
+            await provider.complete("question")
+        opened = provider.health.state
+
+        await asyncio.sleep(0.06)
+        routing.extra_latency_ms["openai"] = 50
+        trial = asyncio.create_task(provider.complete("question"))
+        await asyncio.sleep(0.01)
+        # Half-open: the trial is in flight, everything else is still turned away
+        with pytest.raises(LLMServiceError, match="circuit breaker is open"):
+            await provider.complete("question")
+        await trial
+        return opened, provider.health.state
+
+    opened, closed = run_llm(scenario)
+
+    assert (opened, closed) == ("open", "closed")
+    assert routing.request_counts["openai"] == 3
+
+
+def test_failed_trial_reopens_the_breaker(routing, run_llm):
+    routing.scripts["openai"].extend([503, 503, 503])
+
+    async def scenario():
+        provider = get_provider(ModelName.chatgpt)
+        for _ in range(2):
+            with pytest.raises(LLMServiceError):
+                await provider.complete("question")
+        await asyncio.sleep(0.06)
+        with pytest.raises(LLMServiceError, match="request failed"):
+            await provider.complete("question")
+        return provider.health.state, provider.health.available()
+
+    assert run_llm(scenario) == ("open", False)
+
+
+def test_auto_prefers_the_faster_available_provider(routing, run_llm):
+    async def scenario():
+        prime(ModelName.chatgpt, 2.0)
+        prime(ModelName.gemini, 1.0)
+        faster_first = rank_providers()
+        answer = await query_llm("question", ModelName.auto)
+        get_provider(ModelName.gemini).health.record_failure()
+        get_provider(ModelName.gemini).health.record_failure()
+        return faster_first, answer, rank_providers()
+
+    faster_first, answer, gemini_open = run_llm(scenario)
+
+    assert faster_first == [ModelName.gemini, ModelName.chatgpt]
+    assert answer and routing.request_counts == {"gemini": 1}
+    assert gemini_open == [ModelName.chatgpt, ModelName.gemini]
+
+
+def test_unmeasured_provider_is_tried_before_measured_ones(routing, run_llm):
+    async def scenario():
+        prime(ModelName.gemini, 0.01)
+        return rank_providers()
+
+    assert run_llm(scenario) == [ModelName.chatgpt, ModelName.gemini]
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled(routing, run_llm):
+    routing.extra_latency_ms["gemini"] = 1000
+    before = dict(routing_counters)
+
+    async def scenario():
+        # Gemini ranks first, but this request takes far longer than its p90
+        prime(ModelName.gemini, 0.02)
+        prime(ModelName.chatgpt, 0.5)
+        answer = await query_llm("question", ModelName.auto)
+        await asyncio.sleep(0.01)
+        return answer, get_provider(ModelName.gemini).health.metrics()
+
+    answer, gemini = run_llm(scenario)
+
+    assert answer
+    assert routing_counters["hedges"] - before["hedges"] == 1
+    assert routing_counters["hedge_wins"] - before["hedge_wins"] == 1
+    assert gemini["cancelled"] == 1 and gemini["failures"] == 0
+
+
+def test_failed_primary_falls_back_to_the_next_provider(routing, run_llm):
+    routing.scripts["gemini"].append(503)
+    before = dict(routing_counters)
+
+    async def scenario():
+        prime(ModelName.gemini, 1.0)
+        prime(ModelName.chatgpt, 2.0)
+        return await query_llm("question", ModelName.auto)
+
+    assert run_llm(scenario)
+    assert routing_counters["fallbacks"] - before["fallbacks"] == 1
+    assert routing.request_counts == {"gemini": 1, "openai": 1}
+
+
+def test_rejected_answer_falls_back_to_the_next_provider(routing, run_llm):
+    checked = []
+    before = dict(routing_counters)
+
+    def reject_first(response: str):
+        checked.append(response)
+        if len(checked) == 1:
+            raise ValueError("not the expected document")
+
+    async def scenario():
+        prime(ModelName.gemini, 1.0)
+        prime(ModelName.chatgpt, 2.0)
+        return await query_llm("question", ModelName.auto, validate=reject_first)
+
+    assert run_llm(scenario)
+    assert routing_counters["fallbacks"] - before["fallbacks"] == 1
+    assert routing.request_counts == {"gemini": 1, "openai": 1}
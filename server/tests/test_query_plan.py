@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from app.schemas.query_plan import QueryPlan
+from app.services.queryplan_service import QueryPlanError, execute_plan, plan_columns
+
+
+DF = pd.DataFrame({"r": ["North", "South", "North", "West"], "v": [5.0, 3.0, 2.0, 9.0]})
+
+
+def plan(**fields) -> QueryPlan:
+    return QueryPlan.model_validate(fields)
+
+
+def test_group_by_plan_sorts_by_count():
+    result = execute_plan(DF, plan(group_by=["r"], sort=[{"column": "count"}]))
+
+    assert result.to_dict("list") == {"r": ["North", "South", "West"], "count": [2, 1, 1]}
+    assert plan_columns(plan(group_by=["r"], sort=[{"column": "count"}]), DF) == ["r"]
+
+
+def test_select_plan_sorts_by_a_column_it_does_not_show():
+    result = execute_plan(DF, plan(select=["r"], sort=[{"column": "v"}]))
+
+    assert result["r"].tolist() == ["West", "North", "South", "North"]
+
+
+def test_grouped_plan_rejects_sort_by_a_column_not_in_its_result():
+    grouped = plan(group_by=["r"], aggregations=[{"func": "sum", "column": "v"}], sort=[{"column": "v"}])
+
+    with pytest.raises(QueryPlanError, match="Unknown sort columns"):
+        execute_plan(DF, grouped)
+
+
+def test_filter_value_that_does_not_fit_the_column_is_a_plan_error():
+    with pytest.raises(QueryPlanError, match="'ten'.*'v'"):
+        execute_plan(DF, plan(filters=[{"column": "v", "op": ">", "value": "ten"}]))
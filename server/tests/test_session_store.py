@@ -0,0 +1,34 @@
+import uuid
+import pandas as pd
+from app.services.session_store import DiskSpillSessionStore
+
+
+def spill(store: DiskSpillSessionStore, session_data: dict) -> str:
+    # max_bytes=1: storing a second session evicts the first to disk
+    session_id = str(uuid.uuid4())
+    store.set(session_id, session_data)
+    store.set(str(uuid.uuid4()), {"raw_text": "other"})
+    assert store.metrics()["spilled_sessions"] == 1
+    return session_id
+
+
+def test_spilled_frames_reload(tmp_path):
+    store = DiskSpillSessionStore(1, 0, str(tmp_path))
+    df = pd.DataFrame({"region": ["North", "South"], "revenue": [1.5, 2.0]})
+    session_id = spill(store, {"dataframe": df, "tables": {"orders": df}, "active_table": "orders"})
+
+    session_data = store.get(session_id)
+    pd.testing.assert_frame_equal(session_data["dataframe"], df)
+    assert session_data["tables"]["orders"] is session_data["dataframe"]
+
+
+def test_frames_feather_cannot_write_reload_from_pickle(tmp_path):
+    store = DiskSpillSessionStore(1, 0, str(tmp_path))
+    # Mixed int/str object columns (as calamine reads some Excel columns) make Arrow fail
+    df = pd.DataFrame({"code": [1, "A-2", 3], "units": [1, 2, 3]})
+    session_id = spill(store, {"dataframe": df, "tables": {"Sheet1": df}, "active_table": "Sheet1"})
+
+    session_data = store.get(session_id)
+    assert session_data is not None
+    pd.testing.assert_frame_equal(session_data["dataframe"], df)
+    assert session_data["tables"]["Sheet1"] is session_data["dataframe"]
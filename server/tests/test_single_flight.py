@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.config.environment_config import settings
+from app.config.llm_models import ModelName
+from app.services.llm_service import SingleFlight, llm_single_flight, query_llm
+
+
+def test_one_cancelled_waiter_leaves_the_result_to_the_others():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        waiters = [asyncio.create_task(flight.run("key", answer)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == ["answer", "answer"]
+    assert calls == [1]
+    assert flight.counters == {"calls": 1, "coalesced": 2, "cancelled": 0}
+    assert flight.in_flight() == 0
+
+
+def test_caller_after_last_cancellation_starts_a_new_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        first = asyncio.create_task(flight.run("key", answer))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # The cancelled call has not finished unwinding yet
+        second = await flight.run("key", answer)
+        return flight, calls, second
+
+    flight, calls, second = asyncio.run(scenario())
+
+    assert second == "answer"
+    assert calls == [1, 1]
+    assert flight.counters["cancelled"] == 1
+    assert flight.in_flight() == 0
+
+
+def test_identical_concurrent_queries_share_one_provider_call(fake_llm, run_llm, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SINGLE_FLIGHT", True)
+    fake_llm.extra_latency_ms["openai"] = 50
+    before = dict(llm_single_flight.counters)
+
+    async def scenario():
+        same = [query_llm("which region sells most?", ModelName.chatgpt) for _ in range(5)]
+        other = query_llm("which region sells least?", ModelName.chatgpt)
+        return await asyncio.gather(*same, other)
+
+    answers = run_llm(scenario)
+
+    assert len(set(answers)) == 1
+    assert fake_llm.request_counts["openai"] == 2
+    assert llm_single_flight.counters["coalesced"] - before["coalesced"] == 4
+    assert llm_single_flight.in_flight() == 0
+
+
+def test_failures_reach_every_waiter_and_are_not_kept(fake_llm, run_llm, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SINGLE_FLIGHT", True)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 0)
+    fake_llm.scripts["openai"].append(503)
+
+    async def scenario():
+        failed = await asyncio.gather(*(query_llm("question", ModelName.chatgpt) for _ in range(3)), return_exceptions=True)
+        return failed, await query_llm("question", ModelName.chatgpt)
+
+    failed, retried = run_llm(scenario)
+
+    assert all(isinstance(result, Exception) for result in failed)
+    assert retried
+    assert fake_llm.request_counts["openai"] == 2
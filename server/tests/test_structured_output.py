@@ -0,0 +1,67 @@
+import pytest
+from pydantic import ValidationError
+
+from app.config.llm_models import ModelName
+from app.config.prompts import CHART_PLAN
+from app.schemas.chart_plan import ChartPlan
+from app.services.llm_service import query_structured, sanitize_llm_json, structured_counters, usage_tracker
+
+
+COLUMNS = ["region", "revenue"]
+
+
+def plan_prompt():
+    return CHART_PLAN.render(context="- region\n- revenue", query="revenue by region", response_schema=ChartPlan.response_schema(COLUMNS))
+
+
+def prompt_names(count: int) -> list:
+    return [entry["prompt"] for entry in list(usage_tracker.recent)[-count:]]
+
+
+def test_sanitize_ignores_fences_and_surrounding_text():
+    assert sanitize_llm_json('```json\n{"a": [1, 2]}\n```') == {"a": [1, 2]}
+    assert sanitize_llm_json('Here you go: [{"a": 1}] Anything else?') == [{"a": 1}]
+
+
+def test_valid_answer_needs_no_repair(fake_llm, run_llm):
+    before = dict(structured_counters)
+
+    async def scenario():
+        return await query_structured(plan_prompt(), ModelName.chatgpt, ChartPlan, {"columns": COLUMNS})
+
+    plan = run_llm(scenario)
+
+    assert plan.required_columns == [["region"]]
+    assert structured_counters["repairs"] == before["repairs"]
+    assert fake_llm.request_counts["openai"] == 1
+
+
+@pytest.mark.parametrize("model, provider", [(ModelName.chatgpt, "openai"), (ModelName.gemini, "gemini")])
+def test_invalid_answer_is_repaired_once(fake_llm, run_llm, model, provider):
+    fake_llm.scripts[provider].append("invalid")
+    before = dict(structured_counters)
+
+    async def scenario():
+        return await query_structured(plan_prompt(), model, ChartPlan, {"columns": COLUMNS})
+
+    plan = run_llm(scenario)
+
+    assert plan.chart_types[0].value == "bar"
+    assert structured_counters["repairs"] - before["repairs"] == 1
+    # The repair request sends back the invalid output, not the original prompt
+    assert prompt_names(2) == ["chart_plan", "json_repair"]
+    assert fake_llm.request_counts[provider] == 2
+
+
+def test_answer_still_invalid_after_repair_raises(fake_llm, run_llm):
+    fake_llm.scripts["openai"].extend(["invalid", "invalid"])
+    before = dict(structured_counters)
+
+    async def scenario():
+        with pytest.raises(ValidationError):
+            await query_structured(plan_prompt(), ModelName.chatgpt, ChartPlan, {"columns": COLUMNS})
+
+    run_llm(scenario)
+
+    assert structured_counters["repair_failures"] - before["repair_failures"] == 1
+    assert fake_llm.request_counts["openai"] == 2
@@ -0,0 +1,30 @@
+from app.services.append_service import append_text
+from app.services.profiling_service import profile_session
+from app.services.text_search_service import PAGE_BREAK, TextIndex, chunk_text
+
+
+FIRST = "Revenue grew in the north region. " * 40 + PAGE_BREAK + "Costs fell after the migration. " * 30
+SECOND = "The south region missed its target. " * 50 + PAGE_BREAK + "Revenue in the south recovered in March. " * 20
+
+
+def test_extended_index_matches_rebuilt_index():
+    full = TextIndex(chunk_text(FIRST + PAGE_BREAK + SECOND))
+    extended = TextIndex(chunk_text(FIRST)).extended(chunk_text(SECOND, first_page=3))
+
+    assert extended.chunks == full.chunks
+    assert extended.average_length == full.average_length
+    for query in ("south region revenue", "migration costs", "march"):
+        assert extended.search(query, 5) == full.search(query, 5)
+
+
+def test_append_text_extends_profile_and_drops_descriptions():
+    session = {"raw_text": FIRST, "data_version": "v1", "descriptions": {"gpt": "old"}}
+    session["profile"] = profile_session(session)
+
+    updated, stats = append_text(session, SECOND)
+
+    assert stats["text_index_extended"]
+    assert updated["descriptions"] == {}
+    assert updated["profile"]["data_version"] == updated["data_version"]
+    assert updated["profile"]["text_index"].chunks == profile_session(updated)["text_index"].chunks
+    assert session["profile"]["text_index"].chunks == chunk_text(FIRST)
@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+from benchmarks.datasets import pdf_bytes
+from app.services.session_store import session_store
+import main
+
+
+client = TestClient(main.app)
+ORDERS = b"order_id,customer_id,revenue\n1,10,5.5\n2,20,3\n"
+
+
+def upload(name: str, payload: bytes, content_type: str = "text/csv", **params) -> dict:
+    return client.post("/api/uploads/upload-file", params=params, files={"file": (name, payload, content_type)}).json()
+
+
+def test_named_upload_of_a_document_keeps_the_session():
+    session_id = upload("orders.csv", ORDERS, table="orders")["session_id"]
+
+    response = upload("report.pdf", pdf_bytes(1), "application/pdf", session_id=session_id, table="report")
+
+    assert response == {"error": "Only tabular files can be added as tables"}
+    assert list(session_store[session_id]["tables"]) == ["orders"]
+
+
+def test_named_upload_into_a_text_session_is_rejected():
+    session_id = upload("report.pdf", pdf_bytes(1), "application/pdf")["session_id"]
+
+    response = upload("orders.csv", ORDERS, session_id=session_id, table="orders")
+
+    assert "error" in response
+    assert session_store[session_id]["raw_text"]
+
+
+def test_table_names_never_contain_dots():
+    response = upload("orders.v2.csv", ORDERS)
+    assert response["tables"] == ["orders_v2"]
+
+    response = upload("customers.csv", b"customer_id,segment\n10,Retail\n", session_id=response["session_id"], table="crm.customers")
+    assert response["tables"] == ["orders_v2", "crm_customers"]